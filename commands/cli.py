@@ -282,10 +282,12 @@ def comments():
 @dj.command()
 def all():
     """Django: import all data from wordpress"""
-    subprocess.call(["dj", "authors"])
-    subprocess.call(["dj", "categories"])
-    subprocess.call(["dj", "tags"])
-    subprocess.call(["dj", "pages"])
-    subprocess.call(["dj", "posts"])
-    subprocess.call(["dj", "media"])
-    subprocess.call(["dj", "comments"])
+    subprocess.run(
+        [
+            "python",
+            "manage.py",
+            "import_all",
+            WORDPRESS_URL,
+        ],
+        cwd=ROOT,
+    )
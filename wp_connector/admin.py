@@ -1,14 +1,51 @@
+from functools import partial
+
 from django.apps import apps
 from django.conf import settings
 from django.contrib import admin
+from django.http import HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 from django.utils.safestring import mark_safe
 from wagtail.contrib.redirects.models import Redirect
 from wagtail.models import Page
 
-from wp_connector.richtext_field_processor import FieldProcessor
+from wp_connector.batch_exporter import BatchExporter, order_by_parent
+from wp_connector.richtext_field_processor import (
+    FieldProcessor,
+    get_page_ids,
+    rewrite_anchor_links,
+)
+from wp_connector.transform import TransformPool
+
+from .exporter import (
+    Exporter,
+    ExportSession,
+    get_streamdata_for,
+    get_wagtail_fingerprint,
+)
+from .models import (
+    ExportJob,
+    ImportState,
+    WPAuthor,
+    WPCategory,
+    WPComment,
+    WPMedia,
+    WPPage,
+    WPPost,
+    WPTag,
+)
+
+
+def get_export_jobs_enabled():
+    """
+    Return True if the export actions are run by a worker instead of the request.
 
-from .exporter import Exporter
-from .models import WPAuthor, WPCategory, WPComment, WPMedia, WPPage, WPPost, WPTag
+    Settings:
+        WPC_EXPORT_JOBS: True to enqueue the actions as jobs for the export_worker command
+    """
+    return getattr(settings, "WPC_EXPORT_JOBS", False)
 
 
 class ImportAdmin(admin.AdminSite):
@@ -47,11 +84,20 @@ class BaseAdmin(admin.ModelAdmin):
         "wagtail_model",
         "wp_cleaned_content",
         "wp_block_content",
+        "wp_content_hash",
+        "wp_fingerprint",
+        "wagtail_fingerprint",
         # add any other field you need to protect from editing
     ]
 
     list_per_page = 25
 
+    # the actions that can be run by a worker, see enqueue_export_job
+    export_job_actions = [action for action, _ in ExportJob.ACTION_CHOICES]
+
+    # the job the actions are run for, set by the worker
+    job = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -99,6 +145,9 @@ class BaseAdmin(admin.ModelAdmin):
             "wp_many_to_many_keys",
             "wp_cleaned_content",
             "wp_block_content",
+            "wp_content_hash",
+            "wp_fingerprint",
+            "wagtail_fingerprint",
             "wagtail_model",
             "author_avatar_urls",
             "avatar_urls",
@@ -343,8 +392,42 @@ class BaseAdmin(admin.ModelAdmin):
             message (str): The message to display
             level (str): The level of the message
         """
+        if self.job is not None:
+            # run by a worker, there's no request to message
+            self.job.add_message(message, level)
+            return
         self.message_user(request, message, level=level)
 
+    def heartbeat(self):
+        """Keep the job claimed by its worker while a long action runs."""
+        if self.job is not None:
+            self.job.heartbeat()
+
+    def enqueue_export_job(self, action, admin, request, queryset):
+        """
+        Enqueue a job for a worker to run the action on the selected objects
+
+        The new pages are created parents first so the objects are saved
+        in that order. Redirects to the job's status page.
+        """
+        objects = queryset.only(
+            "pk", *(["parent"] if hasattr(self.model, "parent") else [])
+        )
+        if action == "create_wagtail_page":
+            objects = [obj for level in order_by_parent(list(objects)) for obj in level]
+        job = ExportJob.enqueue(action, self.model, [obj.pk for obj in objects])
+
+        self.handle_message_user(
+            request,
+            f"{job} has been queued, run the export_worker command to run it",
+            level="SUCCESS",
+        )
+        return HttpResponseRedirect(
+            reverse(
+                f"{self.admin_site.name}:wp_connector_exportjob_status", args=[job.pk]
+            )
+        )
+
     def move_page_to_parent(self, object):
         """
         Move a wagtail page to a new parent page
@@ -359,14 +442,15 @@ class BaseAdmin(admin.ModelAdmin):
         # the page which is about to be moved
         page = Page.objects.get(id=object.wagtail_page_id)
 
-        # move the page
-        page.move(parent_page, pos="last-child")
+        # move the page, unless it's already there
+        if page.get_parent().id != parent_page.id:
+            page.move(parent_page, pos="last-child")
 
     def create_wagtail_page(self, admin, request, queryset):
         """
         Loop through the selected wordpress objects and create a wagtail page
 
-        If the wordpress object has a parent, move the created page to the parent
+        If the wordpress object has a parent, the page is created under the parent's page
         The queryset can only contain wordpress pages of either type 'page' or 'post'
         If it contains a mix of both types return a user message
         """
@@ -379,6 +463,7 @@ class BaseAdmin(admin.ModelAdmin):
             )
             return
 
+        to_create = []
         for obj in queryset:
             if obj.wagtail_page_id:
                 # skip objects that already have a wagtail_page_id
@@ -388,37 +473,14 @@ class BaseAdmin(admin.ModelAdmin):
                     level="WARNING",
                 )
                 continue
+            to_create.append(obj)
 
-            exporter = Exporter(admin, request, obj)
-
-            if hasattr(exporter, "post_init_messages"):
-                # return the first message as the error message
-                # if there are more errors we don't need to show them yet
-                self.handle_message_user(
-                    request,
-                    exporter.post_init_messages["message"],
-                    level=exporter.post_init_messages["level"],
-                )
-                if exporter.post_init_messages.get("skip", False):
-                    continue
-
-            # create the wagtail page
-            result = exporter.do_create_wagtail_page()
-
+        # the pages are created a batch at a time, parents first,
+        # each one directly under its parent page
+        exporter = BatchExporter(admin, request, heartbeat=self.heartbeat)
+        for result in exporter.create_pages(to_create):
             self.handle_message_user(request, result["message"], level=result["level"])
 
-        # refresh the queryset to pick up the wagtial_page_id's
-        # so the page heirarchy can be updated next
-        queryset = self.model.objects.filter(
-            id__in=queryset.values_list("id", flat=True)
-        )
-
-        for obj in queryset:
-            if hasattr(obj, "parent") and obj.parent:
-                # operate on records that have a parent indictaed in the wordpress data
-                # parent field, it's a foreign key to the same model
-                self.move_page_to_parent(obj)
-
     def update_wagtail_page(self, admin, request, queryset):
         """
         Loop through the selected wordpress objects and update the wagtail page
@@ -434,7 +496,28 @@ class BaseAdmin(admin.ModelAdmin):
             )
             return
 
-        for obj in queryset:
+        # convert the html of the pages to update on the transform pool
+        # the pages that are up to date are skipped by the exporter
+        objects = list(queryset)
+        # the authors, tags and categories are looked up once for all the pages
+        session = ExportSession()
+        session.prepare(objects)
+        to_update = [
+            obj
+            for obj in objects
+            if obj.wagtail_page_id
+            and get_wagtail_fingerprint(obj) != obj.wagtail_fingerprint
+        ]
+        with TransformPool() as pool:
+            streamdata = dict(
+                zip(
+                    [obj.pk for obj in to_update],
+                    get_streamdata_for(to_update, pool),
+                )
+            )
+
+        for obj in objects:
+            self.heartbeat()
             if not obj.wagtail_page_id:
                 # skip objects that do not have a wagtail_page_id
                 self.handle_message_user(
@@ -444,7 +527,13 @@ class BaseAdmin(admin.ModelAdmin):
                 )
                 continue
 
-            exporter = Exporter(admin, request, obj)
+            exporter = Exporter(
+                admin,
+                request,
+                obj,
+                streamdata=streamdata.get(obj.pk),
+                session=session,
+            )
 
             if hasattr(exporter, "post_init_messages"):
                 # return the first message as the error message
@@ -486,8 +575,9 @@ class BaseAdmin(admin.ModelAdmin):
                     # get the first parent page
                     parent_page = parent_page_model.objects.first()
 
-                    # move the page
-                    page.move(parent_page, pos="last-child")
+                    # move the page, unless it's already there
+                    if page.get_parent().id != parent_page.id:
+                        page.move(parent_page, pos="last-child")
 
     def delete_wagtail_page_id(self, admin, request, queryset):
         """
@@ -537,6 +627,7 @@ class BaseAdmin(admin.ModelAdmin):
         Redirect.objects.all().delete()
 
         for obj in queryset:
+            self.heartbeat()
             if obj.wagtail_page_id:
                 wagtail_page = Page.objects.get(id=obj.wagtail_page_id)
                 if not obj.slug == wagtail_page.url_path.strip("/"):
@@ -555,9 +646,23 @@ class BaseAdmin(admin.ModelAdmin):
         Update the anchor links in the richtext fields
         and/or streamfields of the selected wordpress objects
         """
-        for obj in queryset:
-            richtext_processor = FieldProcessor(obj)
-            richtext_processor.process_fields()
+        # one lookup of the wagtail pages for all the objects
+        page_ids = get_page_ids()
+        processors = [FieldProcessor(obj, page_ids=page_ids) for obj in queryset]
+
+        # rewrite the anchors of all the objects on the transform pool
+        contents = [p.get_field_contents() for p in processors]
+        with TransformPool() as pool:
+            results = iter(
+                pool.map(
+                    partial(rewrite_anchor_links, page_ids=page_ids),
+                    [content for obj_contents in contents for content in obj_contents],
+                )
+            )
+
+        for richtext_processor, obj_contents in zip(processors, contents):
+            self.heartbeat()
+            richtext_processor.process_fields([next(results) for _ in obj_contents])
 
         self.handle_message_user(request, "Anchor Links Updated", level="SUCCESS")
 
@@ -611,6 +716,15 @@ class BaseAdmin(admin.ModelAdmin):
                 "delete_selected",
                 "Delete Wordpress Records from selected",
             )
+
+            if get_export_jobs_enabled():
+                for action in self.export_job_actions:
+                    _, name, description = actions[action]
+                    actions[action] = (
+                        partial(self.enqueue_export_job, action),
+                        name,
+                        description,
+                    )
         return actions
 
     # set the column names
@@ -627,6 +741,112 @@ class BaseAdmin(admin.ModelAdmin):
     get_renamed_id.short_description = "Import ID"
 
 
+class ImportStateAdmin(admin.ModelAdmin):
+    """
+    Admin class to inspect the import state of each wordpress model
+    """
+
+    list_display = [
+        "model_name",
+        "modified_gmt",
+        "modified",
+        "checkpoint_phase",
+        "checkpoint_page",
+        "checkpoint_offset",
+        "checkpoint_pk",
+        "updated_at",
+    ]
+    readonly_fields = [
+        "model_name",
+        "modified_gmt",
+        "modified",
+        "checkpoint_url",
+        "checkpoint_phase",
+        "checkpoint_page",
+        "checkpoint_offset",
+        "checkpoint_pk",
+        "updated_at",
+    ]
+
+
+class ExportJobAdmin(admin.ModelAdmin):
+    """
+    Admin class to follow the export jobs run by the workers
+    """
+
+    list_display = [
+        "__str__",
+        "status",
+        "get_progress",
+        "successes",
+        "warnings",
+        "errors",
+        "worker",
+        "created_at",
+        "finished_at",
+    ]
+    list_filter = ["status", "action"]
+    readonly_fields = [
+        field.name for field in ExportJob._meta.fields if field.name != "id"
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/status/",
+                self.admin_site.admin_view(self.status_view),
+                name="wp_connector_exportjob_status",
+            ),
+        ] + super().get_urls()
+
+    def get_progress(self, obj):
+        link = reverse(
+            f"{self.admin_site.name}:wp_connector_exportjob_status", args=[obj.pk]
+        )
+        return mark_safe(f'<a href="{link}">{obj.processed}/{obj.total}</a>')
+
+    def status_view(self, request, pk):
+        """
+        The progress of a job, polled by the page until the job is finished
+
+        Responds with the progress as json when requested with ?format=json
+        """
+        job = get_object_or_404(ExportJob, pk=pk)
+        status = {
+            "status": job.status,
+            "status_display": job.get_status_display(),
+            "is_finished": job.is_finished,
+            "processed": job.processed,
+            "total": job.total,
+            "percent": job.percent,
+            "successes": job.successes,
+            "warnings": job.warnings,
+            "errors": job.errors,
+            "error": job.error,
+            "messages": job.messages,
+        }
+        if request.GET.get("format") == "json":
+            return JsonResponse(status)
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": str(job),
+            "opts": self.model._meta,
+            "job": job,
+            "status": status,
+        }
+        request.current_app = self.admin_site.name
+        return TemplateResponse(request, "wp_connector/export_job_status.html", context)
+
+    get_progress.short_description = "Progress"
+
+
 import_admin.register(WPPage, BaseAdmin)
 import_admin.register(WPCategory, BaseAdmin)
 import_admin.register(WPTag, BaseAdmin)
@@ -634,3 +854,5 @@ import_admin.register(WPAuthor, BaseAdmin)
 import_admin.register(WPPost, BaseAdmin)
 import_admin.register(WPComment, BaseAdmin)
 import_admin.register(WPMedia, BaseAdmin)
+import_admin.register(ImportState, ImportStateAdmin)
+import_admin.register(ExportJob, ExportJobAdmin)
@@ -0,0 +1,438 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, prefetch_related_objects
+from django.utils import timezone
+from django.utils.text import slugify
+from modelcluster.models import get_all_child_m2m_relations, get_all_child_relations
+from wagtail.models import Page, PageLogEntry, Revision
+from wagtail.signals import page_published
+
+from wp_connector.exporter import (
+    Exporter,
+    ExportSession,
+    get_streamdata_for,
+    get_wagtail_fingerprint,
+)
+from wp_connector.transform import TransformPool
+
+
+def get_unique_slug(title, slugs):
+    """Return a slug from the title that isn't one of the slugs, like Page.full_clean."""
+    allow_unicode = getattr(settings, "WAGTAIL_ALLOW_UNICODE_SLUGS", True)
+    base_slug = slugify(title, allow_unicode=allow_unicode) or "page"
+    slug, suffix = base_slug, 1
+    while slug in slugs:
+        suffix += 1
+        slug = f"{base_slug}-{suffix}"
+    return slug
+
+
+def order_by_parent(objects):
+    """
+    Return the wordpress objects in levels, each object's parent in an earlier level.
+
+    The pages of a level are created under the pages of the levels before
+    it, so every page is created under its final parent and never moved.
+    The objects without a parent field are all in the first level.
+    """
+    by_pk = {obj.pk: obj for obj in objects}
+    depths = {}
+    for obj in objects:
+        # walk up to the first ancestor outside the objects
+        chain = []
+        pk = obj.pk
+        while pk in by_pk and pk not in depths and pk not in chain:
+            chain.append(pk)
+            pk = getattr(by_pk[pk], "parent_id", None)
+        # a parent loop is cut where it closes
+        depth = depths.get(pk, -1)
+        for pk in reversed(chain):
+            depth += 1
+            depths[pk] = depth
+
+    levels = {}
+    for obj in objects:
+        levels.setdefault(depths[obj.pk], []).append(obj)
+    return [levels[depth] for depth in sorted(levels)]
+
+
+class BatchExporter:
+    """
+    Create the wagtail pages of many wordpress objects at once.
+
+    The pages are the same as the ones Exporter.do_create_wagtail_page
+    creates one at a time, but the pages under the same parent are created
+    a batch at a time in a single transaction:
+
+    - the parent pages are looked up once and cached
+    - the wordpress pages are sorted so each parent is created before its
+      children, which are created directly under it instead of being moved
+    - the tree paths of a batch are allocated in memory after the last
+      child of the parent, and the parent's numchild is updated once
+    - the slugs are made unique against the sibling slugs, loaded once
+      for each batch
+    - the authors, tags and categories are looked up in an ExportSession,
+      the missing ones are created and the pages tagged and categorised
+      a batch at a time
+    - the pages are inserted as published and their revisions and
+      log entries are written with bulk_create
+    - the wagtail page ids of the wordpress objects are saved with bulk_update
+
+    The html of each batch is converted to stream data on the transform pool.
+
+    Args:
+        admin (object): The admin class, passed on to the Exporter
+        request (object): The request object, passed on to the Exporter
+        batch_size (int): The number of pages created in each transaction
+        processes (int): The number of processes to convert the html with,
+            defaults to WPC_TRANSFORM_WORKERS
+        session (ExportSession): The lookups to use, a new session by default
+        positions (dict): The (last, end) tree positions reserved for the
+            pages under each parent page, by parent id, the pages are created
+            after last up to end. Those parents aren't locked while the pages
+            are created, see export_shards.plan_shards.
+        reserved_slugs (dict): The slugs of the pages created under the parents
+            with reserved positions, by wordpress object pk, made unique
+            across all the exports under those parents
+        heartbeat (callable): Called before each batch, e.g. to keep an export
+            job claimed, an exception it raises stops the export
+
+    Usage:
+        results = BatchExporter().create_pages(WPPost.objects.filter(wagtail_page_id=None))
+    """
+
+    def __init__(
+        self,
+        admin=None,
+        request=None,
+        batch_size=100,
+        processes=None,
+        session=None,
+        positions=None,
+        reserved_slugs=None,
+        heartbeat=None,
+    ):
+        self.admin = admin
+        self.request = request
+        self.batch_size = batch_size
+        self.processes = processes
+        self.session = session
+        # the positions left under the parent pages with reserved positions,
+        # by parent id, the pages of other parents are added after the last child
+        self.positions = positions or {}
+        # the slugs of the pages created under those parents, by wordpress object pk
+        self.reserved_slugs = reserved_slugs or {}
+        self.heartbeat = heartbeat
+        # the parent page of each WAGTAIL_PAGE_MODEL_PARENT
+        self.parents = {}
+        # the slugs of the children of each parent page, by parent id,
+        # reloaded for each batch unless the parent has reserved positions
+        self.sibling_slugs = {}
+        # the wagtail page id of each wordpress parent, by wordpress id
+        self.parent_page_ids = {}
+        # the wagtail parent pages of the wordpress parents, by page id
+        self.pages = {}
+
+    def get_parent_page(self, exporter):
+        """
+        Return the page to create the exporter's page under, or None.
+
+        A wordpress page with a parent is created under the parent's wagtail
+        page, the others under the WAGTAIL_PAGE_MODEL_PARENT page.
+        """
+        parent_id = getattr(exporter.obj, "parent_id", None)
+        page_id = self.parent_page_ids.get(parent_id)
+        if page_id:
+            if page_id not in self.pages:
+                self.pages[page_id] = Page.objects.filter(pk=page_id).first()
+            if self.pages[page_id] is not None:
+                return self.pages[page_id]
+
+        parent_model = exporter.wagtail_page_model_parent
+        if parent_model not in self.parents:
+            self.parents[parent_model] = exporter.parent_page
+        return self.parents[parent_model]
+
+    def get_sibling_slugs(self, parent):
+        if parent.pk not in self.sibling_slugs:
+            self.sibling_slugs[parent.pk] = set(
+                parent.get_children().values_list("slug", flat=True)
+            )
+        return self.sibling_slugs[parent.pk]
+
+    def load_parent_page_ids(self, objects):
+        """Load the wagtail page ids of the parents of the objects outside them."""
+        pks = {obj.pk for obj in objects}
+        outside = {
+            parent_id
+            for obj in objects
+            if (parent_id := getattr(obj, "parent_id", None)) and parent_id not in pks
+        }
+        if outside:
+            self.parent_page_ids.update(
+                type(objects[0])
+                .objects.filter(pk__in=outside)
+                .values_list("pk", "wagtail_page_id")
+            )
+
+    def create_pages(self, objects):
+        """
+        Create a wagtail page for each wordpress object.
+
+        Args:
+            objects (iterable): The wordpress objects
+
+        Returns:
+            list: A {"message": ..., "level": ...} dict for each object
+                  created or skipped, like Exporter.do_create_wagtail_page
+        """
+        results = []
+        if self.session is None:
+            self.session = ExportSession()
+        exporters = []
+        for obj in objects:
+            if obj.wagtail_page_id:
+                results.append(
+                    {
+                        "message": f"Wagtail page already created. {obj.title}",
+                        "level": "WARNING",
+                    }
+                )
+                continue
+
+            exporter = Exporter(self.admin, self.request, obj, session=self.session)
+            if hasattr(exporter, "post_init_messages"):
+                results.append(
+                    {
+                        "message": exporter.post_init_messages["message"],
+                        "level": exporter.post_init_messages["level"],
+                    }
+                )
+                if exporter.post_init_messages.get("skip", False):
+                    continue
+            exporters.append(exporter)
+
+        if not exporters:
+            return results
+
+        exporters = {exporter.obj.pk: exporter for exporter in exporters}
+        objects = [exporter.obj for exporter in exporters.values()]
+        self.load_parent_page_ids(objects)
+        with TransformPool(self.processes) as pool:
+            for level in order_by_parent(objects):
+                # the exporters to create the pages with, grouped by parent page
+                groups = {}
+                for exporter in [exporters[obj.pk] for obj in level]:
+                    parent = self.get_parent_page(exporter)
+                    if parent is None:
+                        results.append(
+                            {
+                                "message": f"There's no {exporter.wagtail_page_model_parent} page "
+                                f"to create {exporter.obj} under",
+                                "level": "ERROR",
+                            }
+                        )
+                        continue
+                    groups.setdefault(parent.pk, (parent, []))[1].append(exporter)
+
+                for parent, group in groups.values():
+                    for start in range(0, len(group), self.batch_size):
+                        end = start + self.batch_size
+                        batch = group[start:end]
+                        if self.heartbeat:
+                            self.heartbeat()
+                        self.session.prepare([e.obj for e in batch])
+                        streamdata = get_streamdata_for([e.obj for e in batch], pool)
+                        for exporter, obj_streamdata in zip(batch, streamdata):
+                            exporter.streamdata = obj_streamdata
+                        results.extend(self.create_batch(parent, batch))
+
+        return results
+
+    def create_batch(self, parent, exporters):
+        """Create the pages of the exporters under the parent in one transaction."""
+        results = []
+        created = []
+        now = timezone.now()
+
+        with transaction.atomic():
+            end = None
+            if parent.pk in self.positions:
+                # the positions were reserved for this export,
+                # the other exports under the parent use other ones
+                step, end = self.positions[parent.pk]
+            else:
+                # locked so pages added to the parent at the same time
+                # by another export can't be given the same paths
+                parent = Page.objects.select_for_update().get(pk=parent.pk)
+                last_child = parent.get_last_child()
+                step = last_child._get_lastpos_in_path() if last_child else 0
+                # reloaded with the lock held, the pages added by the other
+                # exports since the last batch have taken their slugs
+                self.sibling_slugs.pop(parent.pk, None)
+            slugs = self.get_sibling_slugs(parent)
+
+            for exporter in exporters:
+                reserved = exporter.obj.pk in self.reserved_slugs
+                if end is not None and (step >= end or not reserved):
+                    results.append(
+                        {
+                            "message": f"There's no position reserved under {parent} for {exporter.obj}, "
+                            "create its page again",
+                            "level": "ERROR",
+                        }
+                    )
+                    continue
+                page = exporter.wagtail_page_model()
+                exporter.set_fields(page)
+                exporter.set_author(page)
+                if end is not None and not page.slug:
+                    page.slug = self.reserved_slugs[exporter.obj.pk]
+                self.place_page(page, parent, step + 1, slugs, now)
+                try:
+                    # the related objects were just looked up or created,
+                    # checking that they exist costs a query for each one
+                    page.clean_fields(
+                        exclude=[f.name for f in page._meta.fields if f.is_relation]
+                    )
+                except ValidationError as e:
+                    slugs.discard(page.slug)
+                    results.append(
+                        {
+                            "message": f"Could not create a wagtail page for {exporter.obj}. {e}",
+                            "level": "ERROR",
+                        }
+                    )
+                    continue
+                step += 1
+
+                # the tree fields are already set, add_child isn't needed
+                page.save_base()
+                for relation in get_all_child_relations(page):
+                    getattr(page, relation.get_accessor_name()).commit()
+                for field in get_all_child_m2m_relations(page):
+                    getattr(page, field.name).commit()
+                created.append((exporter, page))
+
+            if end is not None:
+                self.positions[parent.pk] = (step, end)
+            if not created:
+                return results
+
+            # the tags and categories require the page ids
+            self.session.attach_tags(
+                [(page, exporter.get_tag_names()) for exporter, page in created]
+            )
+            self.session.attach_categories(
+                [(page, exporter.get_category_names()) for exporter, page in created]
+            )
+
+            pages = [page for _, page in created]
+            # the revisions are made from the pages and their child objects
+            prefetch_related_objects(
+                pages,
+                *[rel.get_accessor_name() for rel in get_all_child_relations(pages[0])],
+            )
+            self.publish_pages(pages, now)
+            Page.objects.filter(pk=parent.pk).update(
+                numchild=F("numchild") + len(created)
+            )
+
+            # save the wagtail page ID to the wordpress models
+            # so they can be matched later if required
+            wp_objects = []
+            for exporter, page in created:
+                exporter.obj.wagtail_page_id = page.id
+                self.parent_page_ids[exporter.obj.pk] = page.id
+                self.pages[page.id] = page
+                exporter.obj.wagtail_fingerprint = get_wagtail_fingerprint(exporter.obj)
+                wp_objects.append(exporter.obj)
+            type(wp_objects[0]).objects.bulk_update(
+                wp_objects, ["wagtail_page_id", "wagtail_fingerprint"]
+            )
+
+        for exporter, page in created:
+            page_published.send(
+                sender=page.specific_class,
+                instance=page,
+                revision=page.live_revision,
+            )
+            results.append(
+                {
+                    "message": f"Created wagtail page ID:{page.id}",
+                    "level": "SUCCESS",
+                }
+            )
+        return results
+
+    def place_page(self, page, parent, step, slugs, now):
+        """Set the tree, slug and publishing fields of a new page under the parent."""
+        page.depth = parent.depth + 1
+        page.path = Page._get_path(parent.path, page.depth, step)
+        page.numchild = 0
+        page.locale_id = parent.locale_id
+
+        if not page.slug:
+            page.slug = get_unique_slug(page.title, slugs)
+        slugs.add(page.slug)
+        page.set_url_path(parent)
+        page.draft_title = page.title
+
+        # published, the revisions are added by publish_pages
+        page.live = True
+        page.has_unpublished_changes = False
+        page.first_published_at = now
+        page.last_published_at = now
+        page.latest_revision_created_at = now
+
+    def publish_pages(self, pages, now):
+        """Write the revisions and log entries of the new pages."""
+        revisions = Revision.objects.bulk_create(
+            [
+                Revision(
+                    content_type_id=page.content_type_id,
+                    base_content_type=page.get_base_content_type(),
+                    object_id=str(page.pk),
+                    created_at=now,
+                    object_str=str(page),
+                    content=page.serializable_data(),
+                )
+                for page in pages
+            ]
+        )
+        # not every database returns the primary keys from bulk_create
+        if any(revision.pk is None for revision in revisions):
+            pks = dict(
+                Revision.objects.filter(
+                    base_content_type=revisions[0].base_content_type,
+                    object_id__in=[revision.object_id for revision in revisions],
+                    created_at=now,
+                ).values_list("object_id", "pk")
+            )
+            for revision in revisions:
+                revision.pk = pks[revision.object_id]
+
+        for page, revision in zip(pages, revisions):
+            page.latest_revision = revision
+            page.live_revision = revision
+        Page.objects.bulk_update(pages, ["latest_revision", "live_revision"])
+
+        PageLogEntry.objects.bulk_create(
+            [
+                PageLogEntry(
+                    content_type_id=page.content_type_id,
+                    label=page.get_admin_display_title(),
+                    action=action,
+                    timestamp=now,
+                    page=page,
+                    revision=revision,
+                    content_changed=True,
+                )
+                for page in pages
+                for action, revision in [
+                    ("wagtail.create", None),
+                    ("wagtail.publish", page.live_revision),
+                ]
+            ]
+        )
@@ -0,0 +1,207 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+# The response headers needed to page through an endpoint
+# or revalidate a response, all others are not stored
+CACHED_HEADERS = [
+    "Content-Type",
+    "ETag",
+    "Last-Modified",
+    "Link",
+    "X-WP-Total",
+    "X-WP-TotalPages",
+]
+
+
+# a week
+DEFAULT_MAX_AGE = 60 * 60 * 24 * 7
+# 500MB
+DEFAULT_MAX_SIZE = 500 * 1024 * 1024
+
+
+def get_response_cache():
+    """Return a ResponseCache configured from the settings.
+
+    Settings:
+        WPC_CACHE_PATH: The path of the cache database file
+        WPC_CACHE_MAX_AGE: The maximum age of an entry in seconds
+        WPC_CACHE_MAX_SIZE: The maximum size of the cache in bytes
+    """
+    path = getattr(
+        settings,
+        "WPC_CACHE_PATH",
+        Path(getattr(settings, "BASE_DIR", ".")) / ".wp_connector_cache.sqlite3",
+    )
+    return ResponseCache(
+        path,
+        max_age=getattr(settings, "WPC_CACHE_MAX_AGE", DEFAULT_MAX_AGE),
+        max_size=getattr(settings, "WPC_CACHE_MAX_SIZE", DEFAULT_MAX_SIZE),
+    )
+
+
+class ResponseCache:
+    """An on-disk cache of REST API responses stored in a SQLite database.
+
+    Only responses with an ETag or Last-Modified header are stored, they are
+    revalidated by the client with the If-None-Match / If-Modified-Since
+    headers so an unchanged page costs a 304 response instead of the full body.
+
+    Args:
+        path (str): The path of the SQLite database file
+        max_age (int): Entries stored longer ago than this (seconds) are evicted
+        max_size (int): The least recently used entries are evicted until
+            the total size of the stored bodies (bytes) is below this
+
+    Methods:
+        get: Get the cached entry for a URL
+        set: Store a response
+        request_headers: The conditional request headers for a cached entry
+        restore: Turn a 304 response into the cached 200 response
+        refresh: Restart the age of an entry revalidated by a 304 response
+        evict: Evict entries by age and size
+        clear: Remove all entries
+    """
+
+    def __init__(self, path, max_age=None, max_size=None):
+        self.path = path
+        self.max_age = max_age
+        self.max_size = max_size
+        # the client may fetch pages from several threads
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                headers TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+        self.evict()
+
+    def get(self, url):
+        """Return the cached entry for the url as a dict, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, headers FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if not row:
+                return None
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE url = ?",
+                (time.time(), url),
+            )
+            self._connection.commit()
+        return {"body": row[0], "headers": json.loads(row[1])}
+
+    def set(self, url, response):
+        """Store the response for the url if it can be revalidated."""
+        headers = {
+            header: response.headers[header]
+            for header in CACHED_HEADERS
+            if header in response.headers
+        }
+        if "ETag" not in headers and "Last-Modified" not in headers:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    response.content,
+                    json.dumps(headers),
+                    len(response.content),
+                    now,
+                    now,
+                ),
+            )
+            self._connection.commit()
+
+    @staticmethod
+    def request_headers(entry):
+        """Return the conditional request headers to revalidate the entry."""
+        headers = {}
+        if etag := entry["headers"].get("ETag"):
+            headers["If-None-Match"] = etag
+        if last_modified := entry["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    @staticmethod
+    def restore(response, entry):
+        """Turn a 304 Not Modified response into the cached 200 response."""
+        response.status_code = 200
+        response._content = entry["body"]
+        for header, value in entry["headers"].items():
+            response.headers.setdefault(header, value)
+        return response
+
+    def refresh(self, url, response, entry):
+        """
+        Restart the age of the entry for the url after a 304 response, the
+        body is still current. New validators sent with the 304 replace the
+        stored ones.
+        """
+        headers = dict(entry["headers"])
+        for header in ["ETag", "Last-Modified"]:
+            if header in response.headers:
+                headers[header] = response.headers[header]
+
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "UPDATE responses SET headers = ?, stored_at = ?, accessed_at = ? "
+                "WHERE url = ?",
+                (json.dumps(headers), now, now, url),
+            )
+            self._connection.commit()
+
+    def evict(self):
+        """Evict entries older than max_age then the least recently used
+        entries until the cache is smaller than max_size."""
+        with self._lock:
+            if self.max_age:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE stored_at < ?",
+                    (time.time() - self.max_age,),
+                )
+            if self.max_size:
+                total = 0
+                rows = self._connection.execute(
+                    "SELECT url, size FROM responses ORDER BY accessed_at DESC"
+                )
+                evicted = []
+                for url, size in rows.fetchall():
+                    total += size
+                    if total > self.max_size:
+                        evicted.append((url,))
+                self._connection.executemany(
+                    "DELETE FROM responses WHERE url = ?", evicted
+                )
+            self._connection.commit()
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+            self._connection.execute("VACUUM")
+
+    @property
+    def count(self):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()[0]
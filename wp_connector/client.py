@@ -1,6 +1,22 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import urlencode
+
 import requests
+from django.conf import settings
 
 from wp_connector.messages import ClientExitException, ClientMessage
+from wp_connector.retry import RETRY_STATUS_CODES, AdaptiveLimiter, get_retry_policy
+
+# The maximum number of items WordPress will return for a single page
+MAX_PER_PAGE = 100
+# The number of items WordPress returns when per_page isn't sent
+DEFAULT_PER_PAGE = 10
+# The number of seconds to wait for WordPress to respond
+DEFAULT_TIMEOUT = 60
 
 
 class Client:
@@ -11,44 +27,273 @@ class Client:
     - is_paged: True if the endpoint is paged, False otherwise.
     - total_pages: The total number of pages.
     - total_results: The total number of results.
-    - paged_endpoints: A list of URLs that can be fetched.
+    - paged_endpoints: A list of URLs that can be fetched, including
+      the per_page and _fields parameters when they are set.
 
     Calling the get() method will return the JSON response from the endpoint.
+    Calling the get_pages() method will return the JSON response for each
+    page of the endpoint, and iter_items() each item of those pages, both
+    are generators so pages are only fetched as they are consumed.
+
+    Args:
+        url (str): The endpoint URL
+        workers (int): The number of pages to fetch at the same time
+        per_page (int): The number of items per page, up to 100
+        fields (list): The fields to request with the _fields parameter
+        cache (ResponseCache): An optional on-disk cache of the responses
+        params (dict): Any other query parameters to send, e.g. modified_after
+        start_page (int): The page to start from, e.g. to resume an import
+        retry (RetryPolicy): How failed requests are retried, see get_retry_policy
+
+    Settings:
+        WPC_REQUEST_TIMEOUT: The number of seconds to wait for a response
+
+    Attributes:
+        page (int): The number of the last page yielded by get_pages
     """
 
-    def __init__(self, url):
+    def __init__(
+        self,
+        url,
+        workers=1,
+        per_page=None,
+        fields=None,
+        cache=None,
+        params=None,
+        start_page=1,
+        retry=None,
+    ):
         self.client_exception = ClientExitException()
         self.client_message = ClientMessage()
         self.url = url
+        self.workers = max(1, int(workers))
+        self.cache = cache
+        self.start_page = max(1, int(start_page))
+        self.page = None
+        self.retry = retry or get_retry_policy()
+        self.timeout = getattr(settings, "WPC_REQUEST_TIMEOUT", DEFAULT_TIMEOUT)
+        # fewer pages are fetched at the same time when the host struggles
+        self.limiter = AdaptiveLimiter(self.workers) if self.workers > 1 else None
+
+        # query parameters sent with every request to the endpoint
+        self.params = dict(params or {})
+        if per_page:
+            self.params["per_page"] = min(int(per_page), MAX_PER_PAGE)
+        if fields:
+            self.params["_fields"] = ",".join(fields)
+
         self._session = requests.Session()
+        self._local = threading.local()
+        self._local.session = self._session
 
         # Fetch the first page of the endpoint and
         # set the data for the class properties
-        try:
-            self.response = self._session.get(self.url)
-            if self.response.status_code != 200:  # pragma: no cover
-                self.client_exception.error_message(
-                    f"Could not connect to {self.url} the status code is {self.response.status_code}"
-                )
-            self.client_message.success_message(f"Connected to {self.url}")
-        except ClientExitException as e:  # pragma: no cover
-            self.client_exception.error_message(
-                f"Could not connect to {self.url} the error is {e}"
-            )
+        params = self.params
+        if self.start_page > 1:
+            params = {"page": self.start_page, **self.params}
+        self.response = self.fetch(self.url, params=params)
+        self.client_message.success_message(f"Connected to {self.url}")
 
-    def get(self, url):
+    @property
+    def session(self):
+        """Return a requests session for the current thread.
+        requests.Session is not guaranteed to be thread safe so each
+        worker thread gets its own session (and connection pool).
+        """
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def fetch(self, url, params=None):
+        """Return the response for the url, exit if it's not a 200 response.
+
+        With a cache the cached response is revalidated and returned
+        if WordPress replies with 304 Not Modified.
+
+        Busy hosts (429 and 5xx responses) and connection errors are
+        retried with backoff, see RetryPolicy.
+        """
         try:
-            response = self._session.get(url)
+            headers, entry = {}, None
+            if self.cache:
+                # the full URL including the query string is the cache key
+                prepared = requests.PreparedRequest()
+                prepared.prepare_url(url, params)
+                url, params = prepared.url, None
+                entry = self.cache.get(url)
+                if entry:
+                    headers = self.cache.request_headers(entry)
+
+            response = self.send(url, params, headers)
+
+            if entry and response.status_code == 304:
+                self.cache.refresh(url, response, entry)
+                response = self.cache.restore(response, entry)
+            elif self.cache and response.status_code == 200:
+                self.cache.set(url, response)
+
             if response.status_code != 200:  # pragma: no cover
                 self.client_exception.error_message(
                     f"Could not connect to {url} the status code is {response.status_code}"
                 )
-            return response.json()
+            return response
         except ClientExitException as e:  # pragma: no cover
             self.client_exception.error_message(
                 f"Could not connect to {url} the error is {e}"
             )
 
+    def send(self, url, params, headers):
+        """Send the request, retrying it while the retry policy allows."""
+        attempt = 0
+        while True:
+            response, error = None, None
+            try:
+                with self.limiter or nullcontext():
+                    # the time waited for the limiter doesn't count
+                    start = time.monotonic()
+                    response = self.session.get(
+                        url, params=params, headers=headers, timeout=self.timeout
+                    )
+            except requests.RequestException as e:
+                error = e
+
+            failed = error is not None or response.status_code in RETRY_STATUS_CODES
+            if self.limiter:
+                self.limiter.record(time.monotonic() - start, failed=failed)
+
+            if not self.retry.should_retry(attempt, response, error):
+                if error is not None:
+                    self.client_exception.error_message(
+                        f"Could not connect to {url} the error is {error}"
+                    )
+                return response
+
+            delay = self.retry.get_delay(attempt, response)
+            reason = error or f"status code {response.status_code}"
+            self.client_message.info_message(
+                f"Retrying {url} in {delay:.1f}s ({reason})"
+            )
+            self.retry.sleep(delay)
+            attempt += 1
+
+    def get(self, url):
+        return self.fetch(url).json()
+
+    @property
+    def per_page(self):
+        """Return the number of items WordPress will return for a full page."""
+        return self.params.get("per_page", DEFAULT_PER_PAGE)
+
+    def page_url(self, page):
+        """Return the URL for a page of the endpoint."""
+        return f"{self.url}?{urlencode({'page': page, **self.params}, safe=',')}"
+
+    def is_short_page(self, json_response):
+        """Return True if the page has less than per_page items, so is the last page."""
+        return not isinstance(json_response, list) or len(json_response) < self.per_page
+
+    def next_page_urls(self, response, page, next_page, limit):
+        """Return the (page, url) of the pages to request after the response.
+
+        The page after the response is the one its Link rel="next" header
+        points to when WordPress sends one. The pages after that are
+        requested ahead up to the X-WP-TotalPages header. Both are read from
+        the latest response so posts published during a long import are
+        not missed. Used by every way of paging through the endpoint.
+
+        Args:
+            response (Response): The response of the latest page consumed
+            page (int): The page of the response
+            next_page (int): The first page that hasn't been requested yet
+            limit (int): The most pages to return
+
+        Returns:
+            list: (page, url) tuples, empty when there are no more pages
+        """
+        urls = []
+        total_pages = int(response.headers.get("X-WP-TotalPages", 0))
+        next_link = response.links.get("next")
+        if next_link and next_page == page + 1 and limit > 0:
+            urls.append((next_page, next_link["url"]))
+            next_page += 1
+        while next_page <= total_pages and len(urls) < limit:
+            urls.append((next_page, self.page_url(next_page)))
+            next_page += 1
+        return urls
+
+    def get_pages(self):
+        """Yield the JSON response for each page of the endpoint, in order.
+
+        The first page is the response fetched when the client was created.
+        Paging stops at the last page or at the first page that has less
+        than per_page items.
+
+        With more than one worker the pages are fetched in a thread pool so
+        the network round-trips overlap. At most `workers * 2` pages are held
+        in memory waiting to be consumed.
+        """
+        if self.workers == 1:
+            yield from self._get_pages_sequential()
+        else:
+            yield from self._get_pages_concurrent()
+
+    def _get_pages_sequential(self):
+        response, page = self.response, self.start_page
+        while True:
+            json_response = response.json()
+            # checked before yielding as the consumer may empty the list
+            is_last_page = self.is_short_page(json_response)
+            self.page = page
+            yield json_response
+            if is_last_page:
+                return
+            if not (urls := self.next_page_urls(response, page, page + 1, 1)):
+                return
+            (page, next_url), *_ = urls
+            response = self.fetch(next_url)
+
+    def _get_pages_concurrent(self):
+        next_page = self.start_page + 1
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            response, page = self.response, self.start_page
+            while True:
+                json_response = response.json()
+                is_last_page = self.is_short_page(json_response)
+                self.page = page
+                yield json_response
+                if is_last_page:
+                    break
+
+                for next_page, url in self.next_page_urls(
+                    response, page, next_page, self.workers * 2 - len(pending)
+                ):
+                    pending.append((next_page, executor.submit(self.fetch, url)))
+                    next_page += 1
+
+                if not pending:
+                    break
+                page, future = pending.popleft()
+                response = future.result()
+
+            for page, future in pending:
+                future.cancel()
+
+    def iter_items(self):
+        """Yield each item of each page of the endpoint, one at a time.
+
+        Items are popped from the page as they are consumed so they can be
+        garbage collected while the rest of the page is processed.
+        """
+        for json_response in self.get_pages():
+            if not isinstance(json_response, list):
+                yield json_response
+                continue
+            json_response.reverse()
+            while json_response:
+                yield json_response.pop()
+
     @property
     def is_paged(self):
         """Return True if the endpoint is paged, False otherwise."""
@@ -79,4 +324,4 @@ class Client:
 
         total_pages = self.get_total_pages
 
-        return [f"{self.url}?page={index}" for index in range(1, total_pages + 1)]
+        return [self.page_url(index) for index in range(1, total_pages + 1)]
@@ -0,0 +1,110 @@
+import os
+import socket
+import time
+import traceback
+
+from django.conf import settings
+
+from wp_connector.admin import import_admin
+from wp_connector.models import ExportJob, ExportJobLost
+
+# the actions that must see all the objects at once,
+# the redirects are all deleted before they're created again
+UNCHUNKED_ACTIONS = {"create_wagtail_redirects"}
+
+
+def get_export_job_chunk_size():
+    """
+    Return the number of objects an export job runs its action on at a time.
+
+    Settings:
+        WPC_EXPORT_JOB_CHUNK_SIZE: The number of objects, the progress is
+            saved after each chunk
+    """
+    return getattr(settings, "WPC_EXPORT_JOB_CHUNK_SIZE", 100)
+
+
+def get_worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_job(job, chunk_size=None):
+    """
+    Run the admin action of a claimed job, a chunk of objects at a time.
+
+    The action is run by a new instance of the model's admin class with the
+    job attached, so its messages are recorded on the job instead of being
+    sent to a request. A job that was taken over carries on after the last
+    chunk saved.
+
+    Args:
+        job (ExportJob): The job, claimed by this worker
+        chunk_size (int): The number of objects in each chunk,
+            defaults to WPC_EXPORT_JOB_CHUNK_SIZE
+
+    The job is only saved while this worker owns it, if it was taken over
+    by another worker the run stops and the job is left to that worker.
+
+    Returns:
+        ExportJob: The finished job
+    """
+    if job.action in UNCHUNKED_ACTIONS:
+        chunk_size = max(job.total, 1)
+    else:
+        chunk_size = chunk_size or get_export_job_chunk_size()
+
+    try:
+        model = job.model
+        model_admin = type(import_admin._registry[model])(model, import_admin)
+        model_admin.job = job
+        action = getattr(model_admin, job.action)
+        for start in range(job.processed, job.total, chunk_size):
+            end = min(start + chunk_size, job.total)
+            object_ids = job.object_ids[start:end]
+            # checked before each chunk, e.g. the redirects are all deleted first
+            job.heartbeat(force=True)
+            action(model_admin, None, model.objects.filter(pk__in=object_ids))
+            job.save_progress(end)
+        job.finish()
+    except ExportJobLost:
+        return job
+    except Exception:
+        try:
+            job.finish(error=traceback.format_exc())
+        except ExportJobLost:
+            pass
+    return job
+
+
+def run_worker(worker=None, once=False, poll_interval=2.0, stdout=None):
+    """
+    Claim and run the export jobs until stopped.
+
+    Any number of workers can run at the same time, in one or more
+    processes or hosts sharing the database, see ExportJob.claim.
+
+    Args:
+        worker (str): The name the jobs are claimed with, defaults to host:pid
+        once (bool): Stop when there are no jobs to run instead of polling
+        poll_interval (float): The seconds to wait for new jobs
+        stdout (OutputWrapper): Where to write the progress, e.g. a command's stdout
+    """
+    worker = worker or get_worker_name()
+    while True:
+        job = ExportJob.claim(worker)
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        if stdout:
+            stdout.write(f"Running {job}: {job.total} objects")
+        run_job(job)
+        if stdout and not job.is_finished:
+            stdout.write(f"Stopped {job}, it was taken over by another worker")
+        elif stdout:
+            stdout.write(
+                f"{job.get_status_display()} {job}: {job.successes} successes, "
+                f"{job.warnings} warnings, {job.errors} errors"
+            )
@@ -0,0 +1,193 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections
+from wagtail.models import Page
+
+from wp_connector.batch_exporter import BatchExporter, get_unique_slug
+from wp_connector.exporter import Exporter, ExportSession
+from wp_connector.transform import setup_worker
+
+
+def get_roots(objects):
+    """Return the top most ancestor of each object among the objects, by pk."""
+    by_pk = {obj.pk: obj for obj in objects}
+    roots = {}
+    for obj in objects:
+        root, seen = obj, {obj.pk}
+        while (parent_id := getattr(root, "parent_id", None)) in by_pk:
+            if parent_id in seen:
+                # a parent loop is cut where it closes
+                break
+            seen.add(parent_id)
+            root = by_pk[parent_id]
+        roots[obj.pk] = root
+    return roots
+
+
+def plan_shards(objects, shards):
+    """
+    Split the wordpress objects into shards that can be exported at the same time.
+
+    The objects are split by subtree, each page is in the same shard as its
+    ancestors among the objects, so the pages created under the new pages
+    belong to a single shard. The top pages of the subtrees are created under
+    existing pages shared by the shards. Each shard is given its own range
+    of tree positions under those pages, and the slugs of its top pages are
+    made unique here against all the siblings, so the shards can't clash.
+    The subtrees are given to the smallest shard, largest first.
+
+    Args:
+        objects (list): The wordpress objects without a wagtail page
+        shards (int): The most shards to split the objects into
+
+    Returns:
+        list: A {"object_ids": [...], "positions": {...}, "reserved_slugs": {...}}
+              dict for each shard, the positions and slugs are passed on to
+              the shard's BatchExporter
+    """
+    exporter = BatchExporter()
+    exporter.load_parent_page_ids(objects)
+    roots = get_roots(objects)
+
+    # the objects of each subtree, by its top page
+    subtrees = {}
+    for obj in objects:
+        subtrees.setdefault(roots[obj.pk], []).append(obj)
+
+    plan = [{"object_ids": [], "roots": {}} for _ in range(max(shards, 1))]
+    for root, subtree in sorted(
+        subtrees.items(), key=lambda subtree: len(subtree[1]), reverse=True
+    ):
+        shard = min(plan, key=lambda shard: len(shard["object_ids"]))
+        shard["object_ids"].extend(obj.pk for obj in subtree)
+        parent = exporter.get_parent_page(Exporter(None, None, root))
+        if parent is not None:
+            shard["roots"].setdefault(parent.pk, []).append(root)
+    plan = [shard for shard in plan if shard["object_ids"]]
+
+    # the positions are reserved after the last child of each parent
+    # and the slugs are made unique against the existing children
+    parents = Page.objects.filter(
+        pk__in={pk for shard in plan for pk in shard["roots"]}
+    )
+    last_positions = {}
+    sibling_slugs = {}
+    for page in parents:
+        last_child = page.get_last_child()
+        last_positions[page.pk] = last_child._get_lastpos_in_path() if last_child else 0
+        sibling_slugs[page.pk] = set(page.get_children().values_list("slug", flat=True))
+
+    for shard in plan:
+        shard["positions"] = {}
+        shard["reserved_slugs"] = {}
+        for parent_id, parent_roots in shard.pop("roots").items():
+            if parent_id not in last_positions:
+                continue
+            last = last_positions[parent_id]
+            shard["positions"][parent_id] = (last, last + len(parent_roots))
+            last_positions[parent_id] = last + len(parent_roots)
+            for root in parent_roots:
+                slug = get_unique_slug(root.title, sibling_slugs[parent_id])
+                sibling_slugs[parent_id].add(slug)
+                shard["reserved_slugs"][root.pk] = slug
+    return plan
+
+
+def export_shard(
+    model_label, object_ids, positions, reserved_slugs, batch_size=100, session=None
+):
+    """
+    Create the pages of a shard, in a worker process, and time it.
+
+    The session is a copy of the one export_pages created the authors, tags
+    and categories of all the shards with, so the shard only looks them up.
+    """
+    start = time.perf_counter()
+    model = apps.get_model(model_label)
+    results = BatchExporter(
+        batch_size=batch_size,
+        processes=1,
+        session=session,
+        positions=positions,
+        reserved_slugs=reserved_slugs,
+    ).create_pages(model.objects.filter(pk__in=object_ids))
+    return {
+        "objects": len(object_ids),
+        "created": sum(result["level"] == "SUCCESS" for result in results),
+        "results": results,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def export_pages(objects, processes=None, batch_size=100):
+    """
+    Create the wagtail pages of the wordpress objects on a pool of processes.
+
+    The objects are split into a shard for each process by plan_shards and
+    each process creates the pages of its shard with a BatchExporter and
+    its own database connection. With one process the shard is exported in
+    this process.
+
+    The authors, tags and categories of all the objects are created here
+    before the shards start and the session is passed on to each shard,
+    two shards creating the same new tag or category would break its
+    unique slug and roll back one of the shards.
+
+    Args:
+        objects (iterable): The wordpress objects without a wagtail page
+        processes (int): The number of processes, defaults to the number of
+            CPUs, or 1 with SQLite which locks the database for each write
+        batch_size (int): The number of pages created in each transaction
+
+    Returns:
+        list: A report for each shard, with the number of objects and
+              pages created, the export_shard results and the seconds taken
+    """
+    objects = list(objects)
+    if not objects:
+        return []
+    if processes is None:
+        sqlite = connections[DEFAULT_DB_ALIAS].vendor == "sqlite"
+        processes = 1 if sqlite else os.cpu_count() or 1
+    model_label = objects[0]._meta.label
+    session = ExportSession()
+    session.prepare(objects)
+    shards = [
+        (
+            model_label,
+            shard["object_ids"],
+            shard["positions"],
+            shard["reserved_slugs"],
+            batch_size,
+            session,
+        )
+        for shard in plan_shards(objects, processes)
+    ]
+    if len(shards) <= 1:
+        return [export_shard(*shard) for shard in shards]
+
+    # the forked processes mustn't share this process's connections
+    connections.close_all()
+    reports = []
+    with ProcessPoolExecutor(
+        max_workers=len(shards), initializer=setup_worker
+    ) as executor:
+        futures = [executor.submit(export_shard, *shard) for shard in shards]
+        for shard, future in zip(shards, futures):
+            try:
+                reports.append(future.result())
+            except Exception as e:
+                reports.append(
+                    {
+                        "objects": len(shard[1]),
+                        "created": 0,
+                        "results": [
+                            {"message": f"The shard failed. {e}", "level": "ERROR"}
+                        ],
+                        "seconds": 0,
+                    }
+                )
+    return reports
@@ -1,10 +1,13 @@
+import json
 from dataclasses import dataclass
 
 from django.apps import apps
+from django.db.models import prefetch_related_objects
 from taggit.models import Tag
 
 from blog.models import Author, BlogCategory, BlogPageCategory
-from wp_connector.streamfieldable import StreamFieldable
+from wp_connector.models.abstract import make_fingerprint
+from wp_connector.streamfieldable import StreamFieldable, clean_content, get_streamdata
 
 
 @dataclass
@@ -41,6 +44,13 @@ class Exporter:
                 The required fields for the Wagtail page model
         field_mapping (dict):
                 The mapping between the wordpress object fields and the wagtail page model fields
+        streamdata (dict):
+                The stream data of each stream field, worked out ahead of time by get_streamdata_for.
+                Any field not in it uses the blocks built at import time if the content hasn't
+                changed since, otherwise it's converted when the fields are set.
+        session (ExportSession):
+                The authors, tags and categories looked up once for many pages,
+                without one they're looked up for each page
     """
 
     # Args
@@ -60,6 +70,9 @@ class Exporter:
     # it will also need an entry in the field_mapping
     stream_field_mapping: dict = None
 
+    streamdata: dict = None
+    session: object = None
+
     def __post_init__(self):
         self.wagtail_page_model = apps.get_model(
             self.obj.WAGTAIL_PAGE_MODEL.split(".")[0],
@@ -69,13 +82,15 @@ class Exporter:
         self.field_mapping = self.obj.FIELD_MAPPING
         self.stream_field_mapping = self.obj.get_streamfield_mapping()
 
-        if hasattr(self.obj, "author"):
+        # checked on the model so the author isn't fetched yet
+        field_names = {f.name for f in self.obj._meta.get_fields()}
+        if "author" in field_names:
             self.wagtail_page_model_has_author = True
 
-        if hasattr(self.obj, "tags"):
+        if "tags" in field_names:
             self.wagtail_page_model_has_tags = True
 
-        if hasattr(self.obj, "categories"):
+        if "categories" in field_names:
             self.wagtail_page_model_has_categories = True
 
         # Wagtail always requires a title field value and that field should
@@ -107,18 +122,29 @@ class Exporter:
         for wp_field, wagtail_field in self.field_mapping.items():
             if self.stream_field_mapping and wp_field in self.stream_field_mapping:
                 stream_field = self.stream_field_mapping[wp_field]
-                streamdata = StreamFieldable(
-                    obj=self.obj,  # for error messages
-                    content=getattr(self.obj, wp_field),
-                )
-                setattr(wagtail_page, stream_field, streamdata.streamdata)
+                setattr(wagtail_page, stream_field, self.get_streamdata(wp_field))
             else:
                 setattr(wagtail_page, wagtail_field, getattr(self.obj, wp_field))
 
+    def get_streamdata(self, wp_field):
+        if self.streamdata and wp_field in self.streamdata:
+            return self.streamdata[wp_field]
+
+        streamdata = get_cached_streamdata(self.obj, wp_field)
+        if streamdata is None:
+            streamdata = StreamFieldable(
+                obj=self.obj,  # for error messages
+                content=get_block_source(self.obj, wp_field),
+            ).streamdata
+        return streamdata
+
     def set_author(self, wagtail_page):
         if self.wagtail_page_model_has_author:
             # some don't have an author
             if obj_author := self.obj.author:
+                if self.session:
+                    wagtail_page.author_id = self.session.get_author_id(obj_author.name)
+                    return
                 # is the author already a snippet?
                 author_snippet, created = Author.objects.get_or_create(
                     name=obj_author.name,
@@ -131,6 +157,9 @@ class Exporter:
             if obj_tags := self.obj.tags.all():
                 if clear:
                     wagtail_page.tags.clear()
+                if self.session:
+                    wagtail_page.tags.add(*self.session.get_tags(self.get_tag_names()))
+                    return
                 for obj_tag in obj_tags:
                     # is the tag already available in the Tag model?
                     if tag := Tag.objects.filter(name=obj_tag.name).first():
@@ -146,6 +175,11 @@ class Exporter:
                 # remove all previous linked categories
                 if clear:
                     BlogPageCategory.objects.filter(page=wagtail_page).delete()
+                if self.session:
+                    self.session.attach_categories(
+                        [(wagtail_page, self.get_category_names())]
+                    )
+                    return
                 for obj_category in obj_categories:
                     # is the category already available in the Category model?
                     if category := BlogCategory.objects.filter(
@@ -164,6 +198,20 @@ class Exporter:
                             category=category,
                         )
 
+    def get_tag_names(self):
+        if not self.wagtail_page_model_has_tags:
+            return []
+        return [obj_tag.name for obj_tag in self.obj.tags.all()]
+
+    def get_category_names(self):
+        """The (name, slug) of each category."""
+        if not self.wagtail_page_model_has_categories:
+            return []
+        return [
+            (obj_category.name, obj_category.slug)
+            for obj_category in self.obj.categories.all()
+        ]
+
     def do_create_wagtail_page(self):
         # The worpress model instance
         wp_instance = self.obj
@@ -202,6 +250,7 @@ class Exporter:
         # Save the wagtail page ID to the wordpress model
         # so it can be matched later if required
         wp_instance.wagtail_page_id = wagtail_page.id
+        wp_instance.wagtail_fingerprint = get_wagtail_fingerprint(wp_instance)
         wp_instance.save()
 
         return {
@@ -215,6 +264,15 @@ class Exporter:
         if not wp_instance.wagtail_page_id:
             return f"Wagtail page not created. {wp_instance.wagtail_page_id}"
 
+        # Skip the page if nothing it's made from has changed
+        # since it was last exported, no new revision is published
+        fingerprint = get_wagtail_fingerprint(wp_instance)
+        if fingerprint == wp_instance.wagtail_fingerprint:
+            return {
+                "message": f"Wagtail page ID:{wp_instance.wagtail_page_id} is up to date",
+                "level": "INFO",
+            }
+
         # Update the wagtail page
         wagtail_page = self.wagtail_page_model.objects.get(
             id=wp_instance.wagtail_page_id,
@@ -239,7 +297,259 @@ class Exporter:
         revision = wagtail_page.save_revision()
         revision.publish()
 
+        # Save the fingerprint of what was exported
+        wp_instance.__class__.objects.filter(pk=wp_instance.pk).update(
+            wagtail_fingerprint=fingerprint
+        )
+        wp_instance.wagtail_fingerprint = fingerprint
+
         return {
             "message": f"Updated wagtail page ID:{wagtail_page.id}",
             "level": "SUCCESS",
         }
+
+
+class ExportSession:
+    """
+    The authors, tags and categories the wagtail pages are linked to,
+    looked up once for an export instead of for every term of every page.
+
+    The name (or slug) -> pk dictionaries are loaded when the session is
+    created. prepare() loads the authors, tags and categories of a batch of
+    wordpress objects and creates the missing ones with bulk_create, then
+    the pages are linked to them from the dictionaries. attach_tags and
+    attach_categories write the rows linking many pages at once.
+
+    The snippets and tags are matched the same way as the Exporter does
+    without a session: authors and tags by name, categories by slug.
+
+    Usage:
+        session = ExportSession()
+        session.prepare(objects)
+        exporter = Exporter(admin, request, obj, session=session)
+    """
+
+    def __init__(self):
+        # the first one wins if there's more than one with the same name
+        self.author_ids = {}
+        for pk, name in Author.objects.order_by("-pk").values_list("pk", "name"):
+            self.author_ids[name] = pk
+        self.tags = {tag.name: tag for tag in Tag.objects.all()}
+        self.tag_slugs = {tag.slug for tag in self.tags.values()}
+        self.category_ids = dict(BlogCategory.objects.values_list("slug", "pk"))
+
+    def prepare(self, objects):
+        """
+        Load the authors, tags and categories of the wordpress objects with one
+        query each and create the snippets and tags that don't exist yet.
+        """
+        objects = list(objects)
+        if not objects:
+            return
+        field_names = {f.name for f in objects[0]._meta.get_fields()}
+        relations = [f for f in ["author", "tags", "categories"] if f in field_names]
+        prefetch_related_objects(objects, *relations)
+
+        if "author" in relations:
+            self.add_authors({obj.author.name for obj in objects if obj.author})
+        if "tags" in relations:
+            self.add_tags({tag.name for obj in objects for tag in obj.tags.all()})
+        if "categories" in relations:
+            self.add_categories(
+                {
+                    (category.name, category.slug)
+                    for obj in objects
+                    for category in obj.categories.all()
+                }
+            )
+
+    def add_authors(self, names):
+        missing = sorted(set(names) - self.author_ids.keys())
+        if not missing:
+            return
+        created = Author.objects.bulk_create([Author(name=name) for name in missing])
+        self.author_ids.update(get_pks(Author, created, "name"))
+
+    def add_tags(self, names):
+        missing = sorted(set(names) - self.tags.keys())
+        if not missing:
+            return
+        tags = []
+        for name in missing:
+            tag = Tag(name=name)
+            # a unique slug, the same way as Tag.save
+            tag.slug = tag.slugify(name)
+            i = 1
+            while tag.slug in self.tag_slugs:
+                tag.slug = tag.slugify(name, i)
+                i += 1
+            self.tag_slugs.add(tag.slug)
+            tags.append(tag)
+        created = Tag.objects.bulk_create(tags)
+        pks = get_pks(Tag, created, "name")
+        for tag in created:
+            tag.pk = pks[tag.name]
+            self.tags[tag.name] = tag
+
+    def add_categories(self, categories):
+        """Create the categories of the (name, slug) tuples that don't exist yet."""
+        missing = {
+            slug: name for name, slug in categories if slug not in self.category_ids
+        }
+        if not missing:
+            return
+        created = BlogCategory.objects.bulk_create(
+            [
+                BlogCategory(name=name, slug=slug)
+                for slug, name in sorted(missing.items())
+            ]
+        )
+        self.category_ids.update(get_pks(BlogCategory, created, "slug"))
+
+    def get_author_id(self, name):
+        self.add_authors([name])
+        return self.author_ids[name]
+
+    def get_tags(self, names):
+        self.add_tags(names)
+        return [self.tags[name] for name in names]
+
+    def attach_tags(self, pages):
+        """
+        Tag many saved pages at once.
+
+        Args:
+            pages (list): (wagtail page, tag names) tuples
+        """
+        pages = [(page, names) for page, names in pages if names]
+        if not pages:
+            return
+        self.add_tags({name for _, names in pages for name in names})
+        through = pages[0][0]._meta.get_field("tags").through
+        through.objects.bulk_create(
+            [
+                through(content_object_id=page.pk, tag_id=self.tags[name].pk)
+                for page, names in pages
+                for name in dict.fromkeys(names)
+            ]
+        )
+
+    def attach_categories(self, pages):
+        """
+        Add the categories of many saved pages at once.
+
+        Args:
+            pages (list): (wagtail page, (name, slug) tuples) tuples
+        """
+        self.add_categories(
+            {category for _, categories in pages for category in categories}
+        )
+        BlogPageCategory.objects.bulk_create(
+            [
+                BlogPageCategory(page_id=page.pk, category_id=self.category_ids[slug])
+                for page, categories in pages
+                for slug in dict.fromkeys(slug for _, slug in categories)
+            ]
+        )
+
+
+def get_pks(model, objects, field):
+    """
+    Return the {field: pk} of objects written with bulk_create,
+    not every database returns the primary keys.
+    """
+    if all(obj.pk is not None for obj in objects):
+        return {getattr(obj, field): obj.pk for obj in objects}
+    return dict(
+        model.objects.filter(
+            **{f"{field}__in": [getattr(obj, field) for obj in objects]}
+        ).values_list(field, "pk")
+    )
+
+
+def get_wagtail_fingerprint(obj):
+    """
+    Return a fingerprint of everything the wagtail page is made from.
+
+    The mapped fields and the author, tags and categories, so a page only
+    needs to be updated when the fingerprint has changed.
+    """
+    value = {field: getattr(obj, field) for field in obj.FIELD_MAPPING}
+    if hasattr(obj, "author"):
+        value["author"] = obj.author.name if obj.author else None
+    # .all() so the prefetched tags and categories are used, see ExportSession.prepare
+    if hasattr(obj, "tags"):
+        value["tags"] = sorted(tag.name for tag in obj.tags.all())
+    if hasattr(obj, "categories"):
+        value["categories"] = sorted(
+            (category.name, category.slug) for category in obj.categories.all()
+        )
+    return make_fingerprint(value)
+
+
+def get_block_source(obj, wp_field):
+    """
+    Return the content the blocks of a stream field are built from.
+
+    The cleaned content if the field is cleaned and built into blocks
+    at import time (see WordpressModel.get_content_fields), so the blocks
+    are the same whether they were cached or not.
+    """
+    content = getattr(obj, wp_field)
+    for source, cleaned, blocks in obj.get_content_fields():
+        if source == wp_field and blocks:
+            return clean_content(content)
+    return content
+
+
+def get_cached_streamdata(obj, wp_field):
+    """
+    Return the stream data of the blocks built at import time, or None if
+    there are none or the content has changed since they were built.
+    """
+    for source, cleaned, blocks in obj.get_content_fields():
+        if source == wp_field and blocks:
+            block_content = getattr(obj, blocks)
+            if (
+                block_content is not None
+                and obj.wp_content_hash
+                and obj.wp_content_hash == obj.get_content_hash()
+            ):
+                return json.dumps(block_content)
+    return None
+
+
+def get_streamdata_for(objects, pool):
+    """
+    Convert the stream fields of the wordpress objects on the transform pool.
+
+    The blocks built at import time are used for any content that hasn't
+    changed since, only the rest is converted.
+
+    Args:
+        objects (list): The wordpress objects
+        pool (TransformPool): The pool to run the conversions on
+
+    Returns:
+        list: A {wp_field: streamdata} dict for each object, in the same order
+    """
+    streamdata = []
+    to_convert = []
+    for obj in objects:
+        stream_field_mapping = obj.get_streamfield_mapping() or {}
+        obj_streamdata = {}
+        for wp_field in obj.FIELD_MAPPING:
+            if wp_field not in stream_field_mapping:
+                continue
+            obj_streamdata[wp_field] = get_cached_streamdata(obj, wp_field)
+            if obj_streamdata[wp_field] is None:
+                to_convert.append(
+                    (obj_streamdata, wp_field, get_block_source(obj, wp_field))
+                )
+        streamdata.append(obj_streamdata)
+
+    results = pool.map(get_streamdata, [content for _, _, content in to_convert])
+    for (obj_streamdata, wp_field, _), result in zip(to_convert, results):
+        obj_streamdata[wp_field] = result
+
+    return streamdata
@@ -0,0 +1,172 @@
+import threading
+from dataclasses import dataclass, field
+
+import jmespath
+from django.apps import apps
+
+
+@dataclass
+class ImportPlan:
+    """
+    Everything the importer needs to know about a model to transform an item
+    of the json response, worked out once for each model and then reused.
+
+    Use ImportPlan.for_model(model) to get the cached plan of a model.
+
+    Args:
+        model (object):
+                The wordpress model
+
+    Attributes:
+        import_fields (list):
+                The fields copied from the item, see include_fields_initial_import
+        rest_fields (list):
+                The _fields projection, see include_fields_rest_request
+        processed_fields (list):
+                (field, compiled jmespath expression) for each process_fields entry
+        foreign_keys (list):
+                (key, related model name, related field) for each foreign key
+        many_to_many_keys (list):
+                (key, related model name, related field) for each many to many key
+        content_fields (list):
+                (source, cleaned field, block field) built at import time,
+                see WordpressModel.get_content_fields
+        embedded_keys (list):
+                (_embed key, related model name, taxonomy) for each
+                process_embedded_keys entry, the taxonomy can be None
+    """
+
+    model: object
+
+    import_fields: list = field(init=False)
+    rest_fields: list = field(init=False)
+    processed_fields: list = field(init=False)
+    foreign_keys: list = field(init=False)
+    many_to_many_keys: list = field(init=False)
+    content_fields: list = field(init=False)
+    embedded_keys: list = field(init=False)
+
+    _plans = {}
+    _lock = threading.Lock()
+
+    def __post_init__(self):
+        self.import_fields = self.model.include_fields_initial_import(self.model)
+        self.rest_fields = self.model.include_fields_rest_request()
+
+        self.processed_fields = [
+            (key, jmespath.compile(expression))
+            for process_field in self.model.process_fields()
+            for key, expression in process_field.items()
+        ]
+
+        # self = a foreign key to the current model
+        # or it's a foreign key to another model
+        self.foreign_keys = [
+            (
+                key,
+                (
+                    self.model.__name__
+                    if value["model"] == "self"
+                    else apps.get_model("wp_connector", value["model"]).__name__
+                ),
+                value["field"],
+            )
+            for foreign_key in self.model.process_foreign_keys()
+            for key, value in foreign_key.items()
+        ]
+
+        # assuming all many to many keys are to other models
+        self.many_to_many_keys = [
+            (
+                key,
+                apps.get_model("wp_connector", value["model"]).__name__,
+                value["field"],
+            )
+            for many_to_many_key in self.model.process_many_to_many_keys()
+            for key, value in many_to_many_key.items()
+        ]
+
+        self.content_fields = self.model.get_content_fields()
+
+        self.embedded_keys = [
+            (
+                key,
+                apps.get_model("wp_connector", value["model"]).__name__,
+                value.get("taxonomy"),
+            )
+            for embedded_key in self.model.process_embedded_keys()
+            for key, value in embedded_key.items()
+        ]
+
+    @classmethod
+    def for_model(cls, model):
+        """Return the plan for the model, built the first time it's asked for."""
+        with cls._lock:
+            if model not in cls._plans:
+                cls._plans[model] = cls(model)
+            return cls._plans[model]
+
+    @property
+    def embed(self):
+        """The _embed parameter value, e.g. author,wp:term"""
+        return ",".join(dict.fromkeys(key for key, _, _ in self.embedded_keys))
+
+    def get_data(self, item):
+        """
+        Return the field values for the model from the item.
+
+        Some data is nested in the json response so the compiled
+        jmespath expressions are used to get to it.
+        """
+        data = {field: item[field] for field in self.import_fields if field in item}
+        for key, expression in self.processed_fields:
+            data[key] = expression.search(item)
+        return data
+
+    def get_foreign_key_data(self, item):
+        """
+        e.g.
+        INPUT:     "parent": {"model": "self", "field": "wp_id"},
+        OUTPUT:    [{"parent": {"model": "WPCategory", "where": "wp_id", "value": 38}}]
+        """
+        return [
+            {key: {"model": model_name, "where": where, "value": item[key]}}
+            for key, model_name, where in self.foreign_keys
+            if item[key]  # some are just 0 so ignore them
+        ]
+
+    def get_many_to_many_data(self, item):
+        """
+        e.g.
+        INPUT:     "categories": {"model": "WPCategory", "field": "wp_id"},
+        OUTPUT:    [{"categories": {"model": "WPCategory", "where": "wp_id", "value": [38]}}]
+        """
+        return [
+            {key: {"model": model_name, "where": where, "value": item[key]}}
+            for key, model_name, where in self.many_to_many_keys
+            if item[key]  # some are empty lists so ignore them
+        ]
+
+    def get_embedded_data(self, item):
+        """
+        Return the embedded related items grouped by model.
+
+        Items without an id are left out, e.g. WordPress embeds an error
+        for an author that isn't public.
+
+        e.g.
+        INPUT:     "_embedded": {"author": [{"id": 1}], "wp:term": [[{"id": 38, "taxonomy": "category"}], []]}
+        OUTPUT:    {"WPAuthor": [{"id": 1}], "WPCategory": [{"id": 38, "taxonomy": "category"}]}
+        """
+        embedded = item.get("_embedded") or {}
+        data = {}
+        for key, model_name, taxonomy in self.embedded_keys:
+            for value in embedded.get(key) or []:
+                # wp:term is a list of terms for each taxonomy
+                for related in value if isinstance(value, list) else [value]:
+                    if not isinstance(related, dict) or "id" not in related:
+                        continue
+                    if taxonomy and related.get("taxonomy") != taxonomy:
+                        continue
+                    data.setdefault(model_name, []).append(related)
+        return data
@@ -1,23 +1,424 @@
-from urllib.parse import urlparse
+import html
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone as dt_timezone
+from functools import partial
+from urllib.parse import urlencode, urlparse
 
-import jmespath
-from bs4 import BeautifulSoup as bs
 from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from wp_connector.client import Client
+from wp_connector.import_plan import ImportPlan
 from wp_connector.messages import ClientExitException, ClientMessage
+from wp_connector.models import ImportState
+from wp_connector.models.abstract import WordpressModel, make_fingerprint
+from wp_connector.streamfieldable import prepare_content
+from wp_connector.transform import TransformPool
+from wp_connector.wxr import WXRSource
+
+
+class WpIdMaps:
+    """
+    A cache of {wp_id: pk} maps, one for each referenced model.
+
+    Each map is built with a single query the first time it's needed.
+    One instance can be shared by importers running in different threads
+    so a model imported earlier is only queried once.
+    """
+
+    def __init__(self):
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def get(self, model, where="wp_id"):
+        key = (model.__name__, where)
+        with self._lock:
+            if key not in self._maps:
+                self._maps[key] = dict(model.objects.values_list(where, "pk"))
+            return self._maps[key]
+
+    def update(self, model, wp_id_map, where="wp_id"):
+        """Add objects to the map of a model if it's been built."""
+        with self._lock:
+            if (model.__name__, where) in self._maps:
+                self._maps[(model.__name__, where)].update(wp_id_map)
+
+    def invalidate(self, model):
+        """Forget the maps of a model, e.g. after objects were created."""
+        with self._lock:
+            for key in [key for key in self._maps if key[0] == model.__name__]:
+                del self._maps[key]
+
+
+def get_import_levels(models):
+    """
+    Group the models so each model only depends on models in earlier groups.
+
+    The dependencies are the models named by process_foreign_keys and
+    process_many_to_many_keys, a foreign key to the model itself is not
+    a dependency. The models in a group can be imported at the same time.
+
+    Args:
+        models (list): The models to import
+
+    Returns:
+        list: A list of lists of models
+
+    Raises:
+        ValueError: If the dependencies are circular
+    """
+    names = {model.__name__ for model in models}
+    dependencies = {}
+    for model in models:
+        dependencies[model] = {
+            value["model"]
+            for field in model.process_foreign_keys()
+            + model.process_many_to_many_keys()
+            for value in field.values()
+            if value["model"] in names and value["model"] != model.__name__
+        }
+
+    levels = []
+    imported = set()
+    remaining = list(models)
+    while remaining:
+        level = [model for model in remaining if dependencies[model] <= imported]
+        if not level:
+            raise ValueError(
+                f"Circular dependencies between {[model.__name__ for model in remaining]}"
+            )
+        levels.append(level)
+        imported.update(model.__name__ for model in level)
+        remaining = [model for model in remaining if model not in level]
+
+    return levels
+
+
+def import_models(site_url, models=None, jobs=None, **kwargs):
+    """
+    Import several models from a site in dependency order.
+
+    The models in each level of get_import_levels are imported at the
+    same time in a thread pool, then the next level is imported. All the
+    importers share the same WpIdMaps.
+
+    Args:
+        site_url (str): The url of the WordPress site e.g. http://localhost:8888
+        models (list): The models to import, defaults to all the wordpress models
+        jobs (int): The number of models to import at the same time,
+            defaults to the number of models in the level, or 1 with SQLite
+            which locks the database for each write
+        kwargs: Passed on to each Importer
+    """
+    if models is None:
+        models = [
+            model
+            for model in apps.get_app_config("wp_connector").get_models()
+            if issubclass(model, WordpressModel)
+        ]
+
+    if jobs is None and connections[DEFAULT_DB_ALIAS].vendor == "sqlite":
+        jobs = 1
+
+    wp_id_maps = WpIdMaps()
+
+    def run(model):
+        try:
+            Importer(
+                url=f"{site_url.rstrip('/')}{model.SOURCE_URL}",
+                model_name=model.__name__,
+                wp_id_maps=wp_id_maps,
+                **kwargs,
+            ).import_data()
+        finally:
+            # each thread has its own database connection
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+
+    for level in get_import_levels(models):
+        ClientMessage().info_message(
+            f"Importing {', '.join(model.__name__ for model in level)}"
+        )
+        if jobs == 1 or len(level) == 1:
+            for model in level:
+                run(model)
+            continue
+        with ThreadPoolExecutor(max_workers=jobs or len(level)) as executor:
+            # list() raises the first exception of any importer
+            list(executor.map(run, level))
+
+
+# comments are matched first so anchors inside them are left alone
+ANCHOR_TAG = re.compile(
+    r"""<!--.*?-->|<a(?=[\s/>])(?:[^>"']|"[^"]*"|'[^']*')*>""",
+    re.IGNORECASE | re.DOTALL,
+)
+TAG_ATTRIBUTE = re.compile(
+    r"""([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+)))?"""
+)
+
+
+def make_absolute_link(href, netloc):
+    """
+    Return the absolute version of href, or None if it's left as it is.
+
+    Empty links are ignored as are links that are already absolute,
+    either to the site or to anything with a dotted domain.
+    """
+    if not href:
+        return None
+    if href.startswith("http://") or href.startswith("https://"):
+        if netloc in href or "." in href:
+            return None
+
+    # replace http://
+    if href.startswith("http://"):
+        href = href.replace("http://", "")
+    # replace https://
+    if href.startswith("https://"):
+        href = href.replace("https://", "")
+    # prepend the netloc
+    return f"http://{netloc}/{href.strip('/')}"
+
+
+def make_absolute_links(content, netloc):
+    """
+    Rewrite the relative href attributes of the anchors in content.
+
+    Only the href values are touched, the rest of the markup is kept as it is.
+    Unlike a BeautifulSoup round trip, the entities (&nbsp;, &#8217;),
+    boolean attributes, attribute order, void tags (<img />) and blank lines
+    are left as they were.
+
+    Args:
+        content (str): The html to process
+        netloc (str): The site's netloc, e.g. localhost:8888
+
+    Returns:
+        str: The content, the same string if there was nothing to rewrite
+    """
+    if not content or ("<a" not in content and "<A" not in content):
+        return content
+
+    def rewrite_anchor(match):
+        tag = match.group(0)
+        if tag.startswith("<!--"):
+            return tag
+        # like the html parser, the last href wins if there's more than one
+        attribute = None
+        for match in TAG_ATTRIBUTE.finditer(tag, 2, len(tag) - 1):
+            if match.group(1).lower() == "href":
+                attribute = match
+        if not attribute or attribute.lastindex == 1:
+            return tag
+        value = next(v for v in attribute.groups()[1:] if v is not None)
+        href = make_absolute_link(html.unescape(value), netloc)
+        if href is None:
+            return tag
+        href = html.escape(href, quote=False).replace('"', "&quot;")
+        return f'{tag[: attribute.start()]}href="{href}"{tag[attribute.end() :]}'
+
+    rewritten = ANCHOR_TAG.sub(rewrite_anchor, content)
+    return content if rewritten == content else rewritten
+
+
+def write_objects(model, batch):
+    """
+    Update or create a batch of objects in a single transaction.
+
+    The existing objects are found with one query by wp_id, new objects
+    are written with bulk_create and existing objects with bulk_update.
+    Existing objects only have the fields in the response updated, the
+    same as update_or_create(wp_id=..., defaults=data) would.
+
+    Args:
+        model (Model): The model of the objects
+        batch (list): (object, fields to write) tuples
+
+    Returns:
+        list: The (object, fields) tuples written, with their primary keys set
+    """
+    # the same item can be on two pages if the data changed
+    # while paging, the last one wins
+    batch = list({obj.wp_id: (obj, fields) for obj, fields in batch}.values())
+
+    with transaction.atomic():
+        existing = dict(
+            model.objects.filter(
+                wp_id__in=[obj.wp_id for obj, fields in batch]
+            ).values_list("wp_id", "pk")
+        )
+
+        created = [obj for obj, fields in batch if obj.wp_id not in existing]
+        model.objects.bulk_create(created)
+
+        # group the updates by the fields to write
+        updates = {}
+        for obj, fields in batch:
+            if obj.wp_id in existing:
+                obj.pk = existing[obj.wp_id]
+                obj._state.adding = False
+                updates.setdefault(tuple(f for f in fields if f != "wp_id"), []).append(
+                    obj
+                )
+        for fields, objs in updates.items():
+            model.objects.bulk_update(objs, fields)
+
+    # not every database returns the primary keys from bulk_create
+    if missing := [obj for obj in created if obj.pk is None]:
+        pks = dict(
+            model.objects.filter(wp_id__in=[obj.wp_id for obj in missing]).values_list(
+                "wp_id", "pk"
+            )
+        )
+        for obj in missing:
+            obj.pk = pks[obj.wp_id]
+            obj._state.adding = False
+
+    return batch
 
 
 class Importer:
-    def __init__(self, url, model_name):
-        self.client = Client(url)
-        self.netloc = urlparse(url).netloc
-        self.model = apps.get_model("wp_connector", model_name)
-        self.one_to_many = []
-        self.many_to_many = []
-        self.import_fields = self.model.include_fields_initial_import(self.model)
+    def __init__(
+        self,
+        url,
+        model_name,
+        workers=1,
+        per_page=None,
+        all_fields=False,
+        cache=None,
+        incremental=False,
+        batch_size=100,
+        wp_id_maps=None,
+        processes=None,
+        force=False,
+        resume=False,
+        embed=False,
+        wxr=None,
+    ):
         self.client_exception = ClientExitException()
         self.client_message = ClientMessage()
+        self.netloc = urlparse(url).netloc
+        self.model = apps.get_model("wp_connector", model_name)
+        self.plan = ImportPlan.for_model(self.model)
+        # the items are read from a WXR file instead of the REST API
+        self.source = WXRSource(wxr, model_name) if wxr else None
+
+        # the high-water mark of the modified_gmt values imported
+        self.import_state, _ = ImportState.objects.get_or_create(
+            model_name=self.model.__name__
+        )
+        params = {}
+        if incremental:
+            if self.source:
+                self.client_message.info_message(
+                    f"A WXR file can't be imported incrementally, importing all the {self.model.__name__} items"
+                )
+            elif not self.supports_incremental:
+                self.client_message.info_message(
+                    f"{self.model.__name__} has no modified_gmt field, importing everything"
+                )
+            elif self.import_state.modified:
+                self.client_message.info_message(
+                    f"Importing {self.model.__name__} modified after {self.import_state.modified}"
+                )
+                params["modified_after"] = self.import_state.modified
+
+        # the related objects come with each page and are linked batch by batch
+        self.embed = embed and bool(self.plan.embedded_keys) and not self.source
+        fields = self.plan.rest_fields
+        if self.embed:
+            params["_embed"] = self.plan.embed
+            fields = [*fields, "_links", "_embedded"]
+        elif embed:
+            self.client_message.info_message(
+                f"{self.model.__name__} has no embedded keys, importing without _embed"
+            )
+
+        # a checkpoint is only resumed for the same endpoint, page size and parameters
+        self.checkpoint_url = (
+            f"{self.source.url}?{urlencode({'model': model_name})}"
+            if self.source
+            else f"{url}?{urlencode(sorted({**params, 'per_page': per_page}.items()))}"
+        )
+        self.resume_phase = None
+        if resume:
+            self.resume_phase = self.get_resume_phase()
+
+        self.client = None
+        if self.source:
+            # it reads the items the same way as the client
+            self.client = self.source
+        elif self.resume_phase in (None, ImportState.PHASE_ITEMS):
+            self.client = Client(
+                url,
+                workers=workers,
+                per_page=per_page,
+                # only request the fields the model will use
+                fields=None if all_fields else fields,
+                cache=cache,
+                params=params,
+                start_page=(
+                    self.import_state.checkpoint_page if self.resume_phase else 1
+                ),
+            )
+        self.batch_size = batch_size
+        # only the primary keys of the imported objects are kept, the foreign
+        # and many to many keys are stored on the objects in the database
+        self.imported_pks = []
+        # the fingerprints of the written objects by primary key, saved once
+        # their relations are linked so an item is only skipped when it's complete
+        self.fingerprints = {}
+        self.wp_id_maps = wp_id_maps or WpIdMaps()
+        # the link rewriting runs on a pool of processes
+        self.transform_pool = TransformPool(processes)
+        # write every item, even if it hasn't changed since the last import
+        self.force = force
+        self.skipped = 0
+
+    def get_resume_phase(self):
+        """Return the phase to resume the import from, or None to start from the beginning."""
+        state = self.import_state
+        name = self.model.__name__
+        if not state.can_resume(self.checkpoint_url):
+            self.client_message.info_message(
+                f"No checkpoint to resume for {name}, importing from the beginning"
+            )
+            return None
+
+        if state.checkpoint_phase == ImportState.PHASE_ITEMS:
+            self.client_message.info_message(
+                f"Resuming {name} from page {state.checkpoint_page} "
+                f"after {state.checkpoint_offset} items"
+            )
+        elif state.checkpoint_phase == ImportState.PHASE_RELATIONS:
+            self.client_message.info_message(
+                f"Resuming {name} relations after id={state.checkpoint_pk}"
+            )
+        else:
+            self.client_message.info_message(
+                f"The last import of {name} finished, there's nothing to resume"
+            )
+        return state.checkpoint_phase
+
+    @property
+    def supports_incremental(self):
+        """Return True if the model has a modified_gmt field to use as a watermark."""
+        return any(f.name == "modified_gmt" for f in self.model._meta.fields)
+
+    def update_watermark(self, item):
+        """Move the watermark forward to the item's modified_gmt value."""
+        if not self.supports_incremental or not item.get("modified_gmt"):
+            return
+        modified_gmt = parse_datetime(item["modified_gmt"])
+        if settings.USE_TZ and timezone.is_naive(modified_gmt):
+            modified_gmt = timezone.make_aware(modified_gmt, dt_timezone.utc)
+        self.import_state.update_watermark(modified_gmt, item.get("modified"))
 
     def import_data(self):
         """
@@ -28,196 +429,506 @@ class Importer:
 
         There are 2 stages that happen here:
 
-        Stage 1:
-        1. Get the data from the endpoint
+        Stage 1 (import_items):
+        1. Stream each item from the endpoint, page by page
         2. Rename the id field to wp_id
         3. Get the data we need from the json response
-        4. Update or create the model with the data
-        5. Make all relative links absolute
+        4. Track the newest modified_gmt value for incremental imports
+        5. Skip the items that haven't changed since the last import
+        6. Make all relative links absolute, a batch at a time
+        7. Clean the changed content and build its blocks, a batch at a time
+        8. Update or create the models with the data, a batch at a time
 
-        Stage 2:
+        Stage 2 (import_relations):
         1. Process the foreign keys
         2. Process the many to many keys
+
+        With embed the related objects embedded in each item are written
+        and linked with each batch in stage 1, so there's no stage 2.
+
+        A checkpoint is saved after each batch so an import can be resumed.
         """
 
         self.client_message.info_message(f"Importing data for {self.model.__name__}...")
 
-        for endpoint in self.client.paged_endpoints:
-            json_response = self.client.get(endpoint)
-
-            for item in json_response:
-                # rename the id field to wp_id
-                item["wp_id"] = item.pop("id")
-                data = {
-                    field: item[field] for field in self.import_fields if field in item
-                }
-
-                # some data is nested in the json response
-                # so use jmespath to get to it and update the value
-                if hasattr(self.model, "process_fields"):
-                    for field in self.model.process_fields():
-                        for key, value in field.items():
-                            data.update({key: jmespath.search(value, item)})
-
-                # create or update the model with data we have so far
-                obj, created = self.model.objects.update_or_create(
-                    wp_id=item["wp_id"], defaults=data
-                )
+        if self.resume_phase == ImportState.PHASE_DONE:
+            return
+
+        if self.resume_phase != ImportState.PHASE_RELATIONS:
+            self.import_items()
+
+        if not self.embed:
+            self.import_relations()
+
+        # only saved once everything is imported so a failed
+        # import is imported again by the next incremental import
+        self.import_state.checkpoint_phase = ImportState.PHASE_DONE
+        self.import_state.save()
+
+    def import_items(self):
+        """Stage 1, see import_data."""
+        state = self.import_state
+        start_page, skip = 1, 0
+        if self.resume_phase == ImportState.PHASE_ITEMS:
+            start_page, skip = state.checkpoint_page, state.checkpoint_offset
+        else:
+            state.save_checkpoint(
+                ImportState.PHASE_ITEMS, checkpoint_url=self.checkpoint_url
+            )
+
+        with self.transform_pool:
+            for batch, page, offset in self.iter_batches(start_page, skip):
+                self.save_batch(batch)
+                state.save_checkpoint(ImportState.PHASE_ITEMS, page, offset)
+
+        if self.skipped:
+            self.client_message.info_message(
+                f"Skipped {self.skipped} unchanged {self.model.__name__} items"
+            )
+
+    def iter_batches(self, start_page=1, skip=0):
+        """
+        Yield (batch, page, offset) for each batch of items of the endpoint.
 
-                self.make_absolute_links(obj)
+        The page and offset are the position of the last item of the batch,
+        the number of items of the page read so far, saved as the checkpoint.
 
-                # foreign keys
-                # cache each object for later processing
-                self.one_to_many.append(obj)
-                obj.wp_foreign_keys = self.get_foreign_key_data(
-                    self.model.process_foreign_keys, self.model, item
-                )
+        Args:
+            start_page (int): The page the client started from
+            skip (int): The number of items of the start page to skip
+        """
+        batch = []
+        page, offset = start_page, 0
+
+        for item in self.client.iter_items():
+            if self.client.page != page:
+                page, offset = self.client.page, 0
+            offset += 1
+            if page == start_page and offset <= skip:
+                # imported before the checkpoint was saved
+                continue
+
+            batch.append(self.build_object(item))
+            if len(batch) >= self.batch_size:
+                yield batch, page, offset
+                batch = []
+
+        if batch:
+            yield batch, page, offset
+
+    def build_object(self, item):
+        """
+        Return the unsaved object for the item and the fields to write.
 
-                # many to many keys
-                # cache each object for later processing
-                self.many_to_many.append(obj)
-                obj.wp_many_to_many_keys = self.get_many_to_many_data(
-                    self.model.process_many_to_many_keys, item
-                )
+        Only the fields in the response are updated on an existing object.
+        """
+        # rename the id field to wp_id
+        item["wp_id"] = item.pop("id")
+        # some data is nested in the json response
+        # so the plan uses jmespath to get to it
+        data = self.plan.get_data(item)
+
+        self.update_watermark(item)
+
+        obj = self.model(**data)
+
+        # foreign keys
+        # stored on the object for later processing
+        obj.wp_foreign_keys = self.plan.get_foreign_key_data(item)
+
+        # many to many keys
+        # stored on the object for later processing
+        obj.wp_many_to_many_keys = self.plan.get_many_to_many_data(item)
+
+        # the related items embedded with _embed, grouped by model
+        obj.wp_embedded = self.plan.get_embedded_data(item) if self.embed else {}
+
+        # the data and the relation ids, to find the unchanged items
+        obj.wp_fingerprint = make_fingerprint(
+            [data, obj.wp_foreign_keys, obj.wp_many_to_many_keys]
+        )
+
+        return obj, [*data, "wp_foreign_keys", "wp_many_to_many_keys", "wp_fingerprint"]
+
+    def import_relations(self):
+        """Stage 2, see import_data."""
+        after_pk = 0
+        if self.resume_phase == ImportState.PHASE_RELATIONS:
+            after_pk = self.import_state.checkpoint_pk
+        self.import_state.save_checkpoint(ImportState.PHASE_RELATIONS, pk=after_pk)
+
+        # any map of this model built before the import is now out of date
+        self.wp_id_maps.invalidate(self.model)
 
         # processing foreign keys here as we have access to all the data now
-        self.process_one_to_many(self.one_to_many)
-        self.process_many_to_many(self.many_to_many)
-
-    @staticmethod
-    def get_many_to_many_data(process_many_to_many_keys, item):
-        many_to_many_data = []
-
-        for field in process_many_to_many_keys():
-            # each field to process
-            for key, value in field.items():
-                if item[key]:  # some are empty lists so ignore them
-                    """
-                    TRANSFORM: [key] = {[value] = {model: "WPCategory", field: "wp_id"}}
-                    OUTPUT:    [{"categories": {"model": "WPCategory", "where": "wp_id", "value": 38}}]
-                    """
-
-                    # assuming all many to many keys are to other models
-                    model = apps.get_model("wp_connector", value["model"])
+        # the objects are loaded back a chunk at a time to keep memory flat
+        self.client_message.info_message(
+            "Processing foreign keys and many to many keys..."
+        )
+        for objects in self.iter_imported_objects(after_pk):
+            self.process_relations(objects)
+            self.import_state.save_checkpoint(
+                ImportState.PHASE_RELATIONS, pk=objects[-1].pk
+            )
+
+    def save_batch(self, batch):
+        """Transform the content of a batch then write it to the database."""
+        if self.embed:
+            # written even if the items are unchanged, e.g. a renamed author
+            self.save_embedded([obj for obj, fields in batch])
+
+        if not self.force:
+            batch = self.skip_unchanged(batch)
+            if not batch:
+                return
+
+        self.make_absolute_links([obj for obj, fields in batch])
+        self.prepare_content(batch)
+        self.write_batch(batch)
+
+        if self.embed:
+            self.process_relations([obj for obj, fields in batch])
+
+    def process_relations(self, objects):
+        """
+        Link the foreign and many to many keys of the objects, then save the
+        fingerprints of the objects whose relations were all found.
+
+        The fingerprint is what skip_unchanged compares, an object is left
+        without one until it's complete so the next import writes it and
+        links it again, e.g. when the import stopped before this stage or
+        the related objects weren't imported yet.
+        """
+        unresolved = self.process_one_to_many(objects)
+        unresolved |= self.process_many_to_many(objects)
+
+        complete = []
+        for obj in objects:
+            fingerprint = self.fingerprints.pop(obj.pk, None)
+            if fingerprint and obj.pk not in unresolved:
+                obj.wp_fingerprint = fingerprint
+                complete.append(obj)
+        self.model.objects.bulk_update(
+            complete, ["wp_fingerprint"], batch_size=self.batch_size
+        )
+
+    def save_embedded(self, objects):
+        """
+        Update or create the related objects embedded in the objects' items.
+
+        Only the fields in the embedded items are written, WordPress embeds
+        fewer fields than the related endpoints return, e.g. no count or
+        parent for the terms. The new objects are added to the wp_id maps.
+        """
+        related = {}
+        for obj in objects:
+            for model_name, items in obj.wp_embedded.items():
+                for item in items:
+                    # the last one wins, the same as write_batch
+                    related.setdefault(model_name, {})[item["id"]] = item
+
+        for model_name, items in related.items():
+            model = apps.get_model("wp_connector", model_name)
+            plan = ImportPlan.for_model(model)
+            batch = []
+            for item in items.values():
+                data = plan.get_data({**item, "wp_id": item["id"]})
+                batch.append((model(**data), list(data)))
+            write_objects(model, batch)
+            self.wp_id_maps.update(model, {obj.wp_id: obj.pk for obj, _ in batch})
+
+    def skip_unchanged(self, batch):
+        """
+        Return the items of the batch that are new or have changed.
 
-                    # values = item.data[key]
-                    many_to_many_data.append(
-                        {
-                            key: {
-                                "model": model.__name__,
-                                "where": value["field"],
-                                "value": item[key],
-                            },
-                        }
-                    )
-
-        return many_to_many_data
-
-    @staticmethod
-    def get_foreign_key_data(process_foreign_keys, current_model, item):
-        foreign_key_data = []
-
-        for field in process_foreign_keys():
-            # get each field to process
-            for key, value in field.items():
-                if item[key]:  # some are just 0 so ignore them
-                    """e.g.
-                    INPUT:     "parent": {"model": "self", "field": "wp_id"},
-                    TRANSFORM: [key] = {[value] = {model: "self", field: "wp_id"}}
-                    OUTPUT:    {"parent": {"model": "WPCategory", "where": "wp_id", "value": 38}}
-                    """
-                    # self = a foreign key to the current model
-                    # or it's a foreign key to another model
-                    model = (
-                        current_model
-                        if value["model"] == "self"
-                        else apps.get_model("wp_connector", value["model"])
-                    )
-
-                    foreign_key_data.append(
-                        {
-                            key: {
-                                "model": model.__name__,
-                                "where": value["field"],
-                                "value": item[key],
-                            },
-                        }
-                    )
-
-        return foreign_key_data
-
-    def make_absolute_links(self, obj):
+        An item is unchanged if its fingerprint is the same as the one stored
+        with the existing object. Unchanged items aren't written and their
+        relations aren't processed again.
+        """
+        stored_fingerprints = dict(
+            self.model.objects.filter(
+                wp_id__in=[obj.wp_id for obj, fields in batch]
+            ).values_list("wp_id", "wp_fingerprint")
+        )
+        changed = [
+            (obj, fields)
+            for obj, fields in batch
+            if stored_fingerprints.get(obj.wp_id) != obj.wp_fingerprint
+        ]
+        self.skipped += len(batch) - len(changed)
+        return changed
+
+    def prepare_content(self, batch):
+        """
+        Fill in the cleaned and block content fields of the batch.
+
+        The content hash of each object is compared to the one stored with
+        the existing object, only new or changed content is processed.
+        The fields that are set are added to the fields to write.
+
+        Args:
+            batch (list): The (object, fields) tuples to process
+
+        Returns:
+            None
+        """
+        content_fields = self.plan.content_fields
+        if not content_fields:
+            return
+
+        for obj, fields in batch:
+            obj.wp_content_hash = obj.get_content_hash()
+
+        stored_hashes = dict(
+            self.model.objects.filter(
+                wp_id__in=[obj.wp_id for obj, fields in batch]
+            ).values_list("wp_id", "wp_content_hash")
+        )
+        changed = [
+            (obj, fields)
+            for obj, fields in batch
+            if stored_hashes.get(obj.wp_id) != obj.wp_content_hash
+        ]
+
+        contents = [
+            getattr(obj, source)
+            for obj, fields in changed
+            for source, cleaned, blocks in content_fields
+        ]
+        results = iter(self.transform_pool.map(prepare_content, contents))
+
+        for obj, fields in changed:
+            fields.append("wp_content_hash")
+            for source, cleaned, blocks in content_fields:
+                cleaned_content, block_content = next(results)
+                setattr(obj, cleaned, cleaned_content)
+                fields.append(cleaned)
+                if blocks:
+                    setattr(obj, blocks, block_content)
+                    fields.append(blocks)
+
+    def write_batch(self, batch):
+        """
+        Update or create a batch of objects in a single transaction,
+        see write_objects.
+
+        Args:
+            batch (list): (object, fields to write) tuples
+
+        Returns:
+            None
+        """
+        # the fingerprints are saved once the relations are linked,
+        # see process_relations, by object as write_objects drops the
+        # objects repeated in the batch
+        fingerprints = {id(obj): obj.wp_fingerprint for obj, fields in batch}
+        for obj, fields in batch:
+            obj.wp_fingerprint = None
+
+        batch = write_objects(self.model, batch)
+
+        # keep each object's primary key for processing the
+        # foreign and many to many keys later
+        self.imported_pks.extend(obj.pk for obj, fields in batch)
+        for obj, fields in batch:
+            self.fingerprints[obj.pk] = fingerprints[id(obj)]
+
+    def iter_imported_objects(self, after_pk=0):
+        """
+        Yield the imported objects a chunk of batch_size at a time in primary
+        key order, loading only the fields needed to process the relations.
+
+        After a resume the objects imported before it aren't known, so every
+        object of the model after after_pk is yielded instead.
+        """
+        fields = ["wp_foreign_keys", "wp_many_to_many_keys"]
+        # the field used by __str__ in the messages
+        fields += [
+            f.name
+            for f in self.model._meta.fields
+            if f.name in ["title", "name", "author_name"]
+        ]
+
+        if self.resume_phase:
+            while objects := list(
+                self.model.objects.filter(pk__gt=after_pk)
+                .order_by("pk")
+                .only(*fields)[: self.batch_size]
+            ):
+                yield objects
+                after_pk = objects[-1].pk
+            return
+
+        pks = sorted(pk for pk in set(self.imported_pks) if pk > after_pk)
+        for start in range(0, len(pks), self.batch_size):
+            end = start + self.batch_size
+            yield list(
+                self.model.objects.filter(pk__in=pks[start:end])
+                .order_by("pk")
+                .only(*fields)
+            )
+
+    def make_absolute_links(self, objects):
         """
         Make all relative links absolute.
         This isn't neccessarily required as long as you now all internal links are absolute.
         I've found that on occassions they are not.
 
+        The content of the whole batch is sent to the transform pool at once.
+
         Args:
-            obj (object): The object to process
+            objects (list): The objects to process
 
         Returns:
             None
 
         """
-        if hasattr(obj, "FIELD_MAPPING"):
-            for field in obj.FIELD_MAPPING.keys():
-                # in testing with the wordpress theme data the content here can be flagged by BeautifulSoup
-                # as looking like a url, it can be ignored. This should be the case with other data too.
-                # e.g. MarkupResemblesLocatorWarning: "***" looks like a URL.
-                soup = bs(getattr(obj, field), "html.parser")
-                for link in soup.find_all("a"):
-                    if not link.get("href"):
-                        # ignore empty links
-                        continue
-                    if link.get("href").startswith("http://") or link.get(
-                        "href"
-                    ).startswith("https://"):
-                        if self.netloc in link.get("href") or "." in link.get("href"):
-                            # ignore already absolute links and have a dotted domain
-                            continue
-
-                    href = link.get("href")
-                    # replace http://
-                    if href.startswith("http://"):
-                        href = href.replace("http://", "")
-                    # replace https://
-                    if href.startswith("https://"):
-                        href = href.replace("https://", "")
-                    # prepend the netloc
-                    link["href"] = f"http://{self.netloc}/{href.strip('/')}"
-                    self.client_message.success_message(f"Links made absolute {obj}")
-
-                setattr(obj, field, str(soup))
+        if not hasattr(self.model, "FIELD_MAPPING"):
+            return
+
+        fields = list(self.model.FIELD_MAPPING.keys())
+        contents = [getattr(obj, field) for obj in objects for field in fields]
+        rewritten = iter(
+            self.transform_pool.map(
+                partial(make_absolute_links, netloc=self.netloc), contents
+            )
+        )
+
+        for obj in objects:
+            changed = False
+            for field in fields:
+                content = next(rewritten)
+                if content != getattr(obj, field):
+                    setattr(obj, field, content)
+                    changed = True
+
+            if changed:
+                self.client_message.success_message(f"Links made absolute {obj}")
+
+    def get_wp_id_map(self, model, where="wp_id"):
+        """
+        Return a {wp_id: pk} map for the model, built with one query
+        the first time it's needed and then reused.
+
+        Args:
+            model (Model): The referenced model
+            where (str): The field holding the wordpress id
+
+        Returns:
+            dict: The primary key of each object keyed by the where field
+        """
+        return self.wp_id_maps.get(model, where)
 
     def process_one_to_many(self, objects):
-        self.client_message.info_message("Processing foreign keys...")
+        """Set the foreign keys of the objects, return the pks of the objects with missing ones."""
+        # objects to update grouped by the foreign key fields set on them
+        updates = {}
+        unresolved = set()
+
         for obj in objects:
-            for relation in obj.wp_foreign_keys:
+            fields = []
+            for relation in obj.wp_foreign_keys or []:
                 for field, value in relation.items():
-                    try:
-                        model = apps.get_model("wp_connector", value["model"])
-                        where = value["where"]
-                        value = value["value"]
-                        setattr(obj, field, model.objects.get(**{where: value}))
-                    except model.DoesNotExist:
+                    model = apps.get_model("wp_connector", value["model"])
+                    where = value["where"]
+                    value = value["value"]
+                    pk = self.get_wp_id_map(model, where).get(value)
+                    if pk is None:
                         self.client_message.info_message(
                             f"Could not find {model.__name__} with {where}={value}. {obj} with id={obj.id}"
                         )
-                obj.save()
+                        unresolved.add(obj.pk)
+                        continue
+                    # set the id directly, there's no need to fetch the object
+                    attname = self.model._meta.get_field(field).attname
+                    setattr(obj, attname, pk)
+                    fields.append(attname)
+            if fields:
+                updates.setdefault(tuple(fields), []).append(obj)
+
+        for fields, objs in updates.items():
+            self.model.objects.bulk_update(objs, fields, batch_size=self.batch_size)
+        return unresolved
 
     def process_many_to_many(self, objects):
-        self.client_message.info_message("Processing many to many keys...")
-        for obj in objects:
-            for relation in obj.wp_many_to_many_keys:
-                related_objects = []
-                for field, value in relation.items():
+        """
+        Link the objects to their many to many related objects.
+
+        The related objects are found in the wp_id maps and the rows of the
+        auto-created through tables are written with bulk_create. Links that
+        are no longer in the wordpress data are removed so a re-import
+        leaves the same links as a fresh import.
+
+        Returns the pks of the objects with related objects that weren't found.
+        """
+        unresolved = set()
+        fields = [
+            key for field in self.model.process_many_to_many_keys() for key in field
+        ]
+
+        for field in fields:
+            # the wanted related primary keys for every object, some are empty
+            links = {obj.pk: set() for obj in objects}
+            for obj in objects:
+                for relation in obj.wp_many_to_many_keys or []:
+                    if field not in relation:
+                        continue
+                    value = relation[field]
                     model = apps.get_model("wp_connector", value["model"])
-                    filter = f"""{value["where"]}__in"""
-                    related_objects = model.objects.filter(**{filter: value["value"]})
-                    if len(related_objects) != len(value["value"]):
+                    wp_id_map = self.get_wp_id_map(model, value["where"])
+                    related_pks = {
+                        wp_id_map[wp_id]
+                        for wp_id in value["value"]
+                        if wp_id in wp_id_map
+                    }
+                    if len(related_pks) != len(value["value"]):
                         self.client_message.info_message(
                             f"""Some {model.__name__} objects could not be found. {obj} with id={obj.id}\n"""
                         )
+                        unresolved.add(obj.pk)
+                    links[obj.pk] = related_pks
+
+            self.write_many_to_many_links(field, links)
+        return unresolved
 
-                for related_object in related_objects:
-                    getattr(obj, field).add(related_object)
+    def write_many_to_many_links(self, field, links):
+        """
+        Make the through table rows of the many to many field match the links.
+
+        Args:
+            field (str): The many to many field name
+            links (dict): The related primary keys keyed by the object primary key
+        """
+        m2m_field = self.model._meta.get_field(field)
+        through = m2m_field.remote_field.through
+        source = through._meta.get_field(m2m_field.m2m_field_name()).attname
+        target = through._meta.get_field(m2m_field.m2m_reverse_field_name()).attname
+
+        pks = list(links)
+        for start in range(0, len(pks), self.batch_size):
+            end = start + self.batch_size
+            chunk = pks[start:end]
+            with transaction.atomic():
+                existing = through.objects.filter(**{f"{source}__in": chunk})
+                stale = []
+                current = set()
+                for pk, source_pk, target_pk in existing.values_list(
+                    "pk", source, target
+                ):
+                    if target_pk in links[source_pk]:
+                        current.add((source_pk, target_pk))
+                    else:
+                        stale.append(pk)
+
+                if stale:
+                    through.objects.filter(pk__in=stale).delete()
+
+                through.objects.bulk_create(
+                    [
+                        through(**{source: source_pk, target: target_pk})
+                        for source_pk in chunk
+                        for target_pk in links[source_pk]
+                        if (source_pk, target_pk) not in current
+                    ],
+                    ignore_conflicts=True,
+                )
@@ -0,0 +1,74 @@
+import time
+
+from django.apps import apps
+from django.core.management import BaseCommand, CommandError
+
+from wp_connector.export_shards import export_pages
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the wagtail pages of the WordPress posts or pages on a pool of "
+        "processes, each creating the pages of its own subtrees."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "model",
+            type=str,
+            help="The model to create the pages of, e.g. WPPost or WPPage",
+        )
+        parser.add_argument(
+            "--ids",
+            nargs="+",
+            type=int,
+            metavar="ID",
+            help="Only create the pages of these objects, by import id.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            help=(
+                "The number of processes. Defaults to the number of CPUs, "
+                "or 1 with SQLite to avoid database locks."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="The number of pages created in each transaction.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model("wp_connector", options["model"])
+        except LookupError as e:
+            raise CommandError(e)
+        if not hasattr(model, "WAGTAIL_PAGE_MODEL"):
+            raise CommandError(f"{model.__name__} isn't exported to wagtail pages")
+
+        queryset = model.objects.filter(wagtail_page_id=None)
+        if options["ids"]:
+            queryset = queryset.filter(pk__in=options["ids"])
+
+        start = time.perf_counter()
+        reports = export_pages(
+            queryset,
+            processes=options["processes"],
+            batch_size=options["batch_size"],
+        )
+        seconds = time.perf_counter() - start
+
+        for number, report in enumerate(reports, start=1):
+            for result in report["results"]:
+                if result["level"] != "SUCCESS":
+                    self.stdout.write(f"{result['level']}: {result['message']}")
+            self.stdout.write(
+                f"Shard {number}: {report['created']} of {report['objects']} pages "
+                f"created in {report['seconds']:.1f}s"
+            )
+        self.stdout.write(
+            f"Created {sum(report['created'] for report in reports)} "
+            f"{model.__name__} pages in {seconds:.1f}s with {len(reports)} processes"
+        )
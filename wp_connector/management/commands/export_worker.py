@@ -0,0 +1,39 @@
+from django.core.management import BaseCommand
+
+from wp_connector.export_jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the export jobs enqueued by the import admin actions. Start as many "
+        "workers as needed, each job is run by one of them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when there are no jobs left to run instead of waiting for more.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="The number of seconds to wait between checks for new jobs.",
+        )
+        parser.add_argument(
+            "--name",
+            type=str,
+            help="The name of the worker shown on its jobs, defaults to host:pid.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            run_worker(
+                worker=options["name"],
+                once=options["once"],
+                poll_interval=options["poll_interval"],
+                stdout=self.stdout,
+            )
+        except KeyboardInterrupt:
+            self.stdout.write("Worker stopped")
@@ -1,27 +1,69 @@
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
 
 from wp_connector.importer import Importer
+from wp_connector.management.import_options import ImportOptionsMixin
+from wp_connector.models import ImportState
 
 
-class Command(BaseCommand):
+class Command(ImportOptionsMixin, BaseCommand):
     help = "Import WordPress data"
 
     def add_arguments(self, parser):
         parser.add_argument(
             "url",
             type=str,
+            nargs="?",
             help="The url of the WordPress site json API.",
             default="",
         )
         parser.add_argument(
             "model",
             type=str,
+            nargs="?",
             help="The model to import data to.",
         )
+        self.add_import_arguments(parser)
+        parser.add_argument(
+            "--show-watermarks",
+            action="store_true",
+            help="Show the watermarks used by incremental imports and exit.",
+        )
+        parser.add_argument(
+            "--reset-watermarks",
+            nargs="*",
+            metavar="MODEL",
+            help=(
+                "Reset the watermarks of the given models. Without any models the "
+                "model being imported is reset, or all models if nothing is imported."
+            ),
+        )
 
     def handle(self, *args, **options):
+        if options["show_watermarks"]:
+            for state in ImportState.objects.order_by("model_name"):
+                self.stdout.write(
+                    f"{state.model_name}: modified_gmt={state.modified_gmt} "
+                    f"modified_after={state.modified} updated_at={state.updated_at} "
+                    f"checkpoint={state.checkpoint_phase}"
+                )
+            return
+
+        if options["reset_watermarks"] is not None:
+            models = options["reset_watermarks"] or [options["model"]]
+            states = ImportState.objects.all()
+            if any(models):
+                states = states.filter(model_name__in=models)
+            states.update(modified_gmt=None, modified=None)
+            self.stdout.write("Watermarks reset")
+            if not options["url"]:
+                return
+
+        if not options["url"] or not options["model"]:
+            raise CommandError("The url and model arguments are required to import")
+
         importer = Importer(
             url=options["url"],
             model_name=options["model"],
+            **self.get_importer_kwargs(options),
         )
         importer.import_data()
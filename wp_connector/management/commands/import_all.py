@@ -0,0 +1,53 @@
+from django.apps import apps
+from django.core.management import BaseCommand, CommandError
+
+from wp_connector.importer import import_models
+from wp_connector.management.import_options import ImportOptionsMixin
+
+
+class Command(ImportOptionsMixin, BaseCommand):
+    help = (
+        "Import all the WordPress data in a single process. Models that don't "
+        "depend on each other are imported at the same time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "url",
+            type=str,
+            help="The url of the WordPress site e.g. http://localhost:8888",
+        )
+        parser.add_argument(
+            "--models",
+            nargs="+",
+            metavar="MODEL",
+            help="Only import these models, e.g. WPAuthor WPPost",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            help=(
+                "The number of models to import at the same time. Defaults to all "
+                "the models that can be imported together, or 1 with SQLite to "
+                "avoid database locks."
+            ),
+        )
+        self.add_import_arguments(parser)
+
+    def handle(self, *args, **options):
+        models = None
+        if options["models"]:
+            try:
+                models = [
+                    apps.get_model("wp_connector", model_name)
+                    for model_name in options["models"]
+                ]
+            except LookupError as e:
+                raise CommandError(e)
+
+        import_models(
+            options["url"],
+            models=models,
+            jobs=options["jobs"],
+            **self.get_importer_kwargs(options),
+        )
@@ -0,0 +1,113 @@
+from django.conf import settings
+
+from wp_connector.cache import get_response_cache
+
+
+class ImportOptionsMixin:
+    """
+    The options shared by the import and import_all management commands.
+
+    Methods:
+        add_import_arguments: Add the options to the command parser
+        get_importer_kwargs: The Importer keyword arguments for the options
+    """
+
+    def add_import_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="The number of pages to fetch at the same time.",
+            default=1,
+        )
+        parser.add_argument(
+            "--per-page",
+            type=int,
+            help="The number of items to request per page, up to 100.",
+            default=100,
+        )
+        parser.add_argument(
+            "--all-fields",
+            action="store_true",
+            help="Request every field instead of only the fields the model uses.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="The number of items to write to the database in each transaction.",
+            default=100,
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Write every item, even the ones that haven't changed since the last import.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Resume the last import from its checkpoint, if it didn't finish.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            help="The number of processes to rewrite the html with, defaults to WPC_TRANSFORM_WORKERS.",
+        )
+        parser.add_argument(
+            "--cache",
+            action="store_true",
+            help="Cache the responses on disk and revalidate them on the next run.",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Bypass the response cache, even if WPC_CACHE is set.",
+        )
+        parser.add_argument(
+            "--clear-cache",
+            action="store_true",
+            help="Remove all the cached responses before importing.",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only import the items modified since the last import.",
+        )
+        parser.add_argument(
+            "--embed",
+            action="store_true",
+            help="Import the posts' authors, categories and tags embedded with the posts.",
+        )
+        parser.add_argument(
+            "--wxr",
+            metavar="PATH",
+            help="Read the items from a WXR file (a WordPress export) instead of the REST API.",
+        )
+
+    def get_cache(self, options):
+        """Return the response cache to use, clearing it if asked to."""
+        cache = None
+        use_cache = options["cache"] or getattr(settings, "WPC_CACHE", False)
+
+        if options["clear_cache"] or (use_cache and not options["no_cache"]):
+            cache = get_response_cache()
+            if options["clear_cache"]:
+                cache.clear()
+                self.stdout.write("Response cache cleared")
+            if options["no_cache"] or not use_cache:
+                cache = None
+
+        return cache
+
+    def get_importer_kwargs(self, options):
+        return {
+            "workers": options["workers"],
+            "per_page": options["per_page"],
+            "all_fields": options["all_fields"],
+            "cache": self.get_cache(options),
+            "incremental": options["incremental"],
+            "batch_size": options["batch_size"],
+            "processes": options["processes"],
+            "force": options["force"],
+            "resume": options["resume"],
+            "embed": options["embed"],
+            "wxr": options["wxr"],
+        }
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "wp_connector",
+            "0003_wpauthor_wagtail_page_id_wpcategory_wagtail_page_id_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model_name", models.CharField(max_length=255, unique=True)),
+                ("modified_gmt", models.DateTimeField(blank=True, null=True)),
+                (
+                    "modified",
+                    models.CharField(
+                        blank=True,
+                        help_text="The modified value as sent by WordPress, used as modified_after",
+                        max_length=32,
+                        null=True,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Import State",
+                "verbose_name_plural": "Import States",
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wp_connector", "0004_importstate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="wpauthor",
+            name="wp_content_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="wpcategory",
+            name="wp_content_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="wpcomment",
+            name="wp_content_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="wpmedia",
+            name="wp_content_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="wppage",
+            name="wp_content_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="wppost",
+            name="wp_content_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="wptag",
+            name="wp_content_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
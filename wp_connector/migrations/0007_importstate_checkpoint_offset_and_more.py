@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "wp_connector",
+            "0006_wpauthor_wagtail_fingerprint_wpauthor_wp_fingerprint_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importstate",
+            name="checkpoint_offset",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="importstate",
+            name="checkpoint_page",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="importstate",
+            name="checkpoint_phase",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("items", "Importing items"),
+                    ("relations", "Processing foreign keys and many to many keys"),
+                    ("done", "Done"),
+                ],
+                max_length=16,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="importstate",
+            name="checkpoint_pk",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="importstate",
+            name="checkpoint_url",
+            field=models.TextField(
+                blank=True,
+                help_text="The endpoint and parameters the checkpoint is for",
+                null=True,
+            ),
+        ),
+    ]
@@ -1,12 +1,17 @@
 from .author import WPAuthor
 from .category import WPCategory
 from .comment import WPComment
+from .export_job import ExportJob, ExportJobLost
+from .import_state import ImportState
 from .media import WPMedia
 from .page import WPPage
 from .post import WPPost
 from .tag import WPTag
 
 __all__ = [
+    "ExportJob",
+    "ExportJobLost",
+    "ImportState",
     "WPAuthor",
     "WPCategory",
     "WPComment",
@@ -1,6 +1,15 @@
+import hashlib
+import json
+
 from django.db import models
 
 
+def make_fingerprint(value):
+    """Return a sha256 hash of the json serialisable value."""
+    serialised = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(serialised.encode()).hexdigest()
+
+
 class WordpressModel(models.Model):
     """ABSTRACT Base model for the Wordpress models.
 
@@ -27,6 +36,10 @@ class WordpressModel(models.Model):
     wagtail_model = models.JSONField(blank=True, null=True)
     wp_cleaned_content = models.TextField(blank=True, null=True)
     wp_block_content = models.JSONField(blank=True, null=True)
+    wp_content_hash = models.CharField(max_length=64, blank=True, null=True)
+    # the item as imported and the page as exported, to skip unchanged ones
+    wp_fingerprint = models.CharField(max_length=64, blank=True, null=True)
+    wagtail_fingerprint = models.CharField(max_length=64, blank=True, null=True)
     wagtail_page_id = models.IntegerField(blank=True, null=True)
 
     class Meta:
@@ -58,6 +71,33 @@ class WordpressModel(models.Model):
 
         return import_fields
 
+    @classmethod
+    def include_fields_rest_request(cls):
+        """Fields to request from the REST API using the _fields parameter.
+
+        Made up of the concrete fields of the model, the keys used by
+        process_fields and the foreign and many to many keys. The fields
+        defined here on the abstract model are not part of the REST API
+        response, except wp_id which comes from the id field.
+        """
+        local_fields = [f.name for f in WordpressModel._meta.fields]
+
+        request_fields = {"id"}
+
+        for f in cls._meta.concrete_fields:
+            if f.name != "id" and f.name not in local_fields:
+                request_fields.add(f.name)
+
+        # e.g. {"content": "content.rendered"} needs the content field
+        for field in cls.process_fields():
+            for value in field.values():
+                request_fields.add(value.split(".")[0])
+
+        for field in cls.process_foreign_keys() + cls.process_many_to_many_keys():
+            request_fields.update(field.keys())
+
+        return sorted(request_fields)
+
     @staticmethod
     def process_fields():
         """Override this method to process fields."""
@@ -73,6 +113,11 @@ class WordpressModel(models.Model):
         """Override this method to process many to many keys."""
         return []
 
+    @staticmethod
+    def process_embedded_keys():
+        """Override this method to import related objects embedded with _embed."""
+        return []
+
     @staticmethod
     def process_clean_fields():
         """Override this method to process content by cleaning it."""
@@ -83,6 +128,32 @@ class WordpressModel(models.Model):
         """Override this method to process content by building blocks."""
         return []
 
+    @classmethod
+    def get_content_fields(cls):
+        """
+        The (source field, cleaned field, block field) of each field cleaned
+        by process_clean_fields. The block field is None if the cleaned
+        content isn't processed into blocks by process_block_fields.
+        """
+        block_fields = {}
+        for field in cls.process_block_fields():
+            block_fields.update(field)
+
+        return [
+            (source, cleaned, block_fields.get(cleaned))
+            for field in cls.process_clean_fields()
+            for source, cleaned in field.items()
+        ]
+
+    def get_content_hash(self):
+        """A hash of the content the cleaned and block fields are built from."""
+        values = [
+            getattr(self, source) or "" for source, _, _ in self.get_content_fields()
+        ]
+        if not values:
+            return None
+        return hashlib.sha256("\0".join(values).encode()).hexdigest()
+
     def get_source_url(self):
         """Get the source URL for the Wordpress object."""
         return self.SOURCE_URL.strip("/")
@@ -0,0 +1,200 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+def get_export_job_timeout():
+    """
+    Return the number of seconds after which a running job is taken over.
+
+    Settings:
+        WPC_EXPORT_JOB_TIMEOUT: The seconds without progress before a running
+            job counts as abandoned, e.g. its worker was stopped
+    """
+    return getattr(settings, "WPC_EXPORT_JOB_TIMEOUT", 600)
+
+
+class ExportJobLost(Exception):
+    """Raised when the job was taken over by another worker."""
+
+
+class ExportJob(models.Model):
+    """Model definition for an admin export action run by a worker.
+
+    The admin actions that create and update wagtail content enqueue a job
+    with the ids of the selected objects instead of running in the request,
+    see BaseAdmin.enqueue_export_job. A worker (the export_worker command)
+    claims the job and runs the action a chunk of objects at a time, saving
+    the progress counters and messages after each chunk.
+
+    A job is claimed with an update of its status, so any number of workers
+    can poll the table and each job is only run by one of them. A job that
+    makes no progress for WPC_EXPORT_JOB_TIMEOUT seconds can be claimed by
+    another worker, it carries on from the last chunk saved. The worker
+    running a job refreshes its heartbeat while the action runs and only
+    saves the job while it still owns it, see heartbeat.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    ACTION_CHOICES = [
+        ("create_wagtail_page", "Create New Wagtail Pages"),
+        ("update_wagtail_page", "Update Existing Wagtail Pages"),
+        ("update_anchor_links", "Update Anchor Links"),
+        ("create_wagtail_redirects", "Create Wagtail Redirects"),
+    ]
+
+    action = models.CharField(max_length=64, choices=ACTION_CHOICES)
+    model_name = models.CharField(
+        max_length=255, help_text="The label of the wordpress model"
+    )
+    object_ids = models.JSONField(
+        default=list, help_text="The selected objects, in the order they're run"
+    )
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True
+    )
+    worker = models.CharField(max_length=255, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    successes = models.PositiveIntegerField(default=0)
+    warnings = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    messages = models.JSONField(default=list)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+
+    PROGRESS_FIELDS = [
+        "processed",
+        "successes",
+        "warnings",
+        "errors",
+        "messages",
+        "heartbeat_at",
+    ]
+
+    class Meta:
+        verbose_name = "Export Job"
+        verbose_name_plural = "Export Jobs"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.get_action_display()} ({self.model_name}) #{self.pk}"
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_name)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 100 if self.is_finished else 0
+        return int(self.processed * 100 / self.total)
+
+    @classmethod
+    def enqueue(cls, action, model, object_ids):
+        return cls.objects.create(
+            action=action,
+            model_name=model._meta.label,
+            object_ids=list(object_ids),
+            total=len(object_ids),
+        )
+
+    @classmethod
+    def claim(cls, worker):
+        """
+        Return the next job to run, marked as running by the worker, or None.
+
+        The oldest pending job is claimed first, then running jobs that
+        stopped making progress. Another worker may claim the same job in the
+        meantime, the status is only changed if it's still what was read.
+        """
+        now = timezone.now()
+        stale = now - timedelta(seconds=get_export_job_timeout())
+        candidates = cls.objects.filter(
+            models.Q(status=cls.STATUS_PENDING)
+            | models.Q(status=cls.STATUS_RUNNING, heartbeat_at__lt=stale)
+        ).order_by("created_at", "pk")
+
+        for job in candidates.only("pk", "status", "heartbeat_at")[:10]:
+            claimed = cls.objects.filter(
+                pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at
+            ).update(
+                status=cls.STATUS_RUNNING,
+                worker=worker,
+                started_at=now,
+                heartbeat_at=now,
+            )
+            if claimed:
+                return cls.objects.get(pk=job.pk)
+        return None
+
+    def save_if_owned(self, **fields):
+        """Save the fields if this worker still owns the job, raise ExportJobLost if not."""
+        updated = ExportJob.objects.filter(
+            pk=self.pk, worker=self.worker, status=self.STATUS_RUNNING
+        ).update(**fields)
+        if not updated:
+            raise ExportJobLost(f"{self} was taken over by another worker")
+        for field, value in fields.items():
+            setattr(self, field, value)
+
+    def heartbeat(self, force=False):
+        """
+        Show the job is still running, at most every tenth of the timeout.
+
+        Called while the action runs so a long chunk isn't taken over by
+        another worker, raises ExportJobLost if it already was.
+        """
+        now = timezone.now()
+        interval = timedelta(seconds=get_export_job_timeout() / 10)
+        if force or not self.heartbeat_at or now - self.heartbeat_at >= interval:
+            self.save_if_owned(heartbeat_at=now)
+
+    def add_message(self, message, level):
+        """Record a message of the action, saved with the next progress."""
+        self.messages.append({"message": str(message), "level": level})
+        if level == "SUCCESS":
+            self.successes += 1
+        elif level == "WARNING":
+            self.warnings += 1
+        elif level == "ERROR":
+            self.errors += 1
+        self.heartbeat()
+
+    def get_progress_fields(self):
+        return {field: getattr(self, field) for field in self.PROGRESS_FIELDS}
+
+    def save_progress(self, processed):
+        self.processed = processed
+        self.heartbeat_at = timezone.now()
+        self.save_if_owned(**self.get_progress_fields())
+
+    def finish(self, error=""):
+        now = timezone.now()
+        self.heartbeat_at = now
+        self.save_if_owned(
+            **self.get_progress_fields(),
+            status=self.STATUS_FAILED if error else self.STATUS_DONE,
+            error=error,
+            finished_at=now,
+        )
@@ -0,0 +1,84 @@
+from django.db import models
+
+
+class ImportState(models.Model):
+    """Model definition for the import state of a Wordpress model.
+
+    One record is kept for each imported model to record the newest
+    modified_gmt value imported, the high-water mark used by incremental imports.
+    The modified value of the same item is kept because WordPress compares
+    modified_after against the local modified date of the site.
+
+    It also keeps a checkpoint of the last import, saved after each batch,
+    so an import that stopped part way through can be resumed:
+    the phase, the page and number of items of that page imported in the
+    items phase, and the last primary key processed in the relations phase.
+    """
+
+    PHASE_ITEMS = "items"
+    PHASE_RELATIONS = "relations"
+    PHASE_DONE = "done"
+    PHASE_CHOICES = [
+        (PHASE_ITEMS, "Importing items"),
+        (PHASE_RELATIONS, "Processing foreign keys and many to many keys"),
+        (PHASE_DONE, "Done"),
+    ]
+    CHECKPOINT_FIELDS = [
+        "checkpoint_url",
+        "checkpoint_phase",
+        "checkpoint_page",
+        "checkpoint_offset",
+        "checkpoint_pk",
+    ]
+
+    model_name = models.CharField(max_length=255, unique=True)
+    modified_gmt = models.DateTimeField(blank=True, null=True)
+    modified = models.CharField(
+        max_length=32,
+        blank=True,
+        null=True,
+        help_text="The modified value as sent by WordPress, used as modified_after",
+    )
+    checkpoint_url = models.TextField(
+        blank=True,
+        null=True,
+        help_text="The endpoint and parameters the checkpoint is for",
+    )
+    checkpoint_phase = models.CharField(
+        max_length=16, choices=PHASE_CHOICES, blank=True, null=True
+    )
+    checkpoint_page = models.PositiveIntegerField(default=1)
+    checkpoint_offset = models.PositiveIntegerField(default=0)
+    checkpoint_pk = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Import State"
+        verbose_name_plural = "Import States"
+
+    def __str__(self):
+        return self.model_name
+
+    def update_watermark(self, modified_gmt, modified):
+        """Move the watermark forward, it never moves back."""
+        if modified_gmt and (not self.modified_gmt or modified_gmt > self.modified_gmt):
+            self.modified_gmt = modified_gmt
+            self.modified = modified
+
+    def reset_watermark(self):
+        self.modified_gmt = None
+        self.modified = None
+
+    def can_resume(self, checkpoint_url):
+        """Return True if there's a checkpoint for the same endpoint and parameters."""
+        return bool(self.checkpoint_phase) and self.checkpoint_url == checkpoint_url
+
+    def save_checkpoint(self, phase, page=1, offset=0, pk=0, checkpoint_url=None):
+        """Save the checkpoint only, the watermark is saved when the import is done."""
+        self.checkpoint_phase = phase
+        self.checkpoint_page = page
+        self.checkpoint_offset = offset
+        self.checkpoint_pk = pk
+        if checkpoint_url is not None:
+            self.checkpoint_url = checkpoint_url
+        self.save(update_fields=[*self.CHECKPOINT_FIELDS, "updated_at"])
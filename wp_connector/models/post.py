@@ -79,6 +79,18 @@ class WPPost(WordpressModel, ExportableMixin, StreamFieldMixin):
             }
         ]
 
+    @staticmethod
+    def process_embedded_keys():
+        """
+        The related objects requested with _embed, imported with the posts.
+        The terms are a list for each taxonomy so they're told apart by taxonomy.
+        """
+        return [
+            {"author": {"model": "WPAuthor"}},
+            {"wp:term": {"model": "WPCategory", "taxonomy": "category"}},
+            {"wp:term": {"model": "WPTag", "taxonomy": "post_tag"}},
+        ]
+
     @staticmethod
     def process_fields():
         """The value is from other keys of the incoming data."""
@@ -143,6 +143,9 @@ class TestWordpressModel(TestCase):
                 "wagtail_model",
                 "wp_cleaned_content",
                 "wp_block_content",
+                "wp_content_hash",
+                "wp_fingerprint",
+                "wagtail_fingerprint",
                 "wagtail_page_id",
             ],
         )
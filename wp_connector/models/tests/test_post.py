@@ -90,6 +90,35 @@ class TestPost(TestCase):
             ],
         )
 
+    def test_include_fields_rest_request(self):
+        # test the _fields projection sent to the REST API
+        self.assertEqual(
+            WPPost.include_fields_rest_request(),
+            [
+                "author",
+                "categories",
+                "comment_status",
+                "content",
+                "date",
+                "date_gmt",
+                "excerpt",
+                "format",
+                "guid",
+                "id",
+                "link",
+                "modified",
+                "modified_gmt",
+                "ping_status",
+                "slug",
+                "status",
+                "sticky",
+                "tags",
+                "template",
+                "title",
+                "type",
+            ],
+        )
+
     def test_process_fields(self):
         # test the method that processes the fields
         self.assertEqual(
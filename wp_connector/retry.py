@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+
+# Responses that are worth trying again, the host is busy or restarting
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 1.0
+DEFAULT_MAX_BACKOFF = 60.0
+# the longest Retry-After value that is waited for
+DEFAULT_MAX_RETRY_AFTER = 300.0
+
+
+def get_retry_policy():
+    """
+    Return the retry policy for the client.
+
+    Settings:
+        WPC_RETRIES: The number of times a request is retried, 0 to never retry
+        WPC_RETRY_BACKOFF: The base delay in seconds, doubled after each attempt
+        WPC_RETRY_MAX_BACKOFF: The longest delay in seconds between two attempts
+    """
+    return RetryPolicy(
+        retries=getattr(settings, "WPC_RETRIES", DEFAULT_RETRIES),
+        backoff=getattr(settings, "WPC_RETRY_BACKOFF", DEFAULT_BACKOFF),
+        max_backoff=getattr(settings, "WPC_RETRY_MAX_BACKOFF", DEFAULT_MAX_BACKOFF),
+    )
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before a failed request is tried again.
+
+    Responses with a status code in RETRY_STATUS_CODES and connection errors
+    are retried. The delay grows exponentially with "full jitter", a random
+    delay between 0 and backoff * 2 ** attempt, so the workers don't all retry
+    at the same time. A Retry-After header sent by the host is honoured.
+
+    Args:
+        retries (int): The number of times a request is retried
+        backoff (float): The base delay in seconds
+        max_backoff (float): The longest delay in seconds
+        max_retry_after (float): The longest Retry-After delay in seconds
+    """
+
+    def __init__(
+        self,
+        retries=DEFAULT_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+        max_backoff=DEFAULT_MAX_BACKOFF,
+        max_retry_after=DEFAULT_MAX_RETRY_AFTER,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+
+    def should_retry(self, attempt, response=None, error=None):
+        """Return True if the request should be tried again after this attempt (from 0)."""
+        if attempt >= self.retries:
+            return False
+        if error is not None:
+            return True
+        return response is not None and response.status_code in RETRY_STATUS_CODES
+
+    def get_retry_after(self, response):
+        """Return the Retry-After delay of the response in seconds, or None."""
+        if response is None or not (value := response.headers.get("Retry-After")):
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = (
+                    parsedate_to_datetime(value) - datetime.now(timezone.utc)
+                ).total_seconds()
+            except (TypeError, ValueError):
+                return None
+        return min(max(delay, 0.0), self.max_retry_after)
+
+    def get_delay(self, attempt, response=None):
+        """Return the number of seconds to wait before the next attempt."""
+        retry_after = self.get_retry_after(response)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def sleep(self, delay):
+        time.sleep(delay)
+
+
+class AdaptiveLimiter:
+    """
+    Limit the number of requests in flight, adapting to how the host copes.
+
+    The limit is changed with additive increase, multiplicative decrease:
+    it's halved when the host fails a request or is much slower than usual
+    and grows by one after a full limit's worth of requests are answered
+    quickly. So the import backs off when the host is struggling and speeds
+    back up when it recovers.
+
+    Args:
+        max_limit (int): The most requests in flight, e.g. the number of workers
+        min_limit (int): The fewest requests in flight
+        slow_factor (float): A response slower than this many times the
+            average response time counts as the host slowing down
+
+    Usage:
+        with limiter:
+            response = session.get(url)
+        limiter.record(elapsed, failed=False)
+    """
+
+    def __init__(self, max_limit, min_limit=1, slow_factor=3.0):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.slow_factor = slow_factor
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.average = None
+        self.successes = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, *args):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def record(self, elapsed, failed=False):
+        """Record the outcome of a request and adjust the limit."""
+        with self._condition:
+            slow = (
+                self.average is not None and elapsed > self.average * self.slow_factor
+            )
+            # a moving average of the response times of the successful requests
+            if not failed:
+                self.average = (
+                    elapsed
+                    if self.average is None
+                    else self.average * 0.8 + elapsed * 0.2
+                )
+
+            if failed or slow:
+                self.limit = max(self.min_limit, self.limit // 2)
+                self.successes = 0
+            else:
+                self.successes += 1
+                if self.successes >= self.limit:
+                    self.limit = min(self.max_limit, self.limit + 1)
+                    self.successes = 0
+            self._condition.notify_all()
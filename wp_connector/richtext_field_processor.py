@@ -7,12 +7,87 @@ from django.apps import apps
 from wagtail.models import Page
 
 
+def get_page_ids():
+    """Return a {slug: wagtail_page_id} map of the wordpress posts and pages."""
+    wordpress_collection = WordpressModelCollectionUtils(models=["WpPost", "WpPage"])
+    wordpress_collection.update_collection_attrs(["wagtail_page_id"])
+    wordpress_collection.create_collection()
+    return {
+        slug: record["wagtail_page_id"] for slug, record in wordpress_collection.items
+    }
+
+
+def anchor_path(anchor):
+    return urlparse(anchor["href"]).path.strip("/")
+
+
+def anchor_type(anchor):
+    if not anchor.get("href"):
+        # ignore empty links
+        return
+    if anchor.get("href").startswith("http://") or anchor.get("href").startswith(
+        "https://"
+    ):
+
+        if "." in anchor.get("href"):
+            # ignore already absolute links and have a dotted domain
+            return "external"
+
+    return "internal"
+
+
+def get_richtext_anchor(anchor_path, anchor, page_ids):
+    # Find the wagtail page id of the wordpress model with the slug value
+    # and return a richtext anchor to the wagtail page if it exists
+    # otherwise return None
+    if wagtail_page_id := page_ids.get(anchor_path):
+        soup = bs("", "html.parser")
+        newlink = soup.new_tag("a")
+        newlink["linktype"] = "page"
+        newlink["id"] = wagtail_page_id
+        newlink.string = anchor
+        return newlink
+
+
+def rewrite_anchor_links(content, page_ids):
+    """
+    Replace the internal anchors of the html content with richtext anchors.
+
+    Anchors to pages without a wagtail page are replaced with their text.
+    A top level function so it can be run on a TransformPool.
+
+    Args:
+        content (str): The html content
+        page_ids (dict): The {slug: wagtail_page_id} map, see get_page_ids
+
+    Returns:
+        tuple: The content and a list of the paths with no wagtail page
+    """
+    soup = bs(content, "html.parser")
+    missing = []
+    changed = False
+    for a in soup.find_all("a"):
+        if anchor_type(a) == "internal":
+            path = anchor_path(a)
+            richtext_anchor = get_richtext_anchor(path, a.text, page_ids)
+            if richtext_anchor is None:
+                missing.append(path)
+                richtext_anchor = a.text
+            soup.find("a", href=a["href"]).replaceWith(richtext_anchor)
+            changed = True
+
+    return (str(soup) if changed else content), missing
+
+
 @dataclass
 class FieldProcessor:
     """
     A utility class to process richtext fields and stream fields of a Wagtail page
     to alter anchor links as required by the richtext field.
 
+    The anchors are rewritten by rewrite_anchor_links, so the contents can be
+    processed for many pages at once on a TransformPool and passed to process_fields.
+
     Later I'll be adding the methdos to process images too
     """
 
@@ -24,6 +99,9 @@ class FieldProcessor:
     richtext_fields: list = field(default_factory=list)
     stream_fields: list = field(default_factory=list)
 
+    # {slug: wagtail_page_id}, looked up if not given
+    page_ids: dict = None
+
     def __post_init__(self):
         # get fresh instance of the Wordpress model and the Wagtail model
         wordpress_model = apps.get_model("wp_connector", self.obj.__class__.__name__)
@@ -31,6 +109,9 @@ class FieldProcessor:
 
         wagtail_model = apps.get_model(self.wordpress_instance.WAGTAIL_PAGE_MODEL)
 
+        if self.page_ids is None:
+            self.page_ids = get_page_ids()
+
         try:
             self.wagtail_instance = wagtail_model.objects.get(
                 id=self.wordpress_instance.wagtail_page_id
@@ -55,24 +136,13 @@ class FieldProcessor:
             ):
                 self.richtext_fields.append(f.name)
 
-    def process_fields(self):
-        def get_soup(field_value):
-            return bs(field_value, "html.parser")
-
-        print("processing fields for ", self.obj)
+    def get_field_locations(self):
+        # the (container, key) of each html value to process
+        # the richtext field values and the stream field paragraph values
+        locations = []
         for richtext_field in self.richtext_fields:
-            field_value = self.wagtail_instance.__dict__[richtext_field]
-            if not field_value:
-                continue
-            soup = get_soup(field_value)
-            anchors = soup.find_all("a")
-            for a in anchors:
-                if self.anchor_type(a) == "internal":
-                    anchor_path = self.anchor_path(a)
-                    richtext_anchor = self.get_richtext_anchor(anchor_path, a.text)
-                    soup.find("a", href=a["href"]).replaceWith(richtext_anchor)
-                    field_value = str(soup)
-            self.wagtail_instance.__dict__[richtext_field] = field_value
+            if self.wagtail_instance.__dict__[richtext_field]:
+                locations.append((self.wagtail_instance.__dict__, richtext_field))
 
         for stream_field in self.stream_fields:
             stream_blocks = self.wagtail_instance.__dict__[stream_field].__dict__
@@ -81,19 +151,34 @@ class FieldProcessor:
                 continue
             for data in raw_data:
                 if data["type"] == "paragraph":
-                    soup = get_soup(data["value"])
-                    anchors = soup.find_all("a")
-                    for a in anchors:
-                        if self.anchor_type(a) == "internal":
-                            anchor_path = self.anchor_path(a)
-                            richtext_anchor = self.get_richtext_anchor(
-                                anchor_path, a.text
-                            )
-                            soup.find("a", href=a["href"]).replaceWith(richtext_anchor)
-                            data["value"] = str(soup)
-            self.wagtail_instance.__dict__[stream_field].__dict__[
-                "_raw_data"
-            ] = raw_data
+                    locations.append((data, "value"))
+
+        return locations
+
+    def get_field_contents(self):
+        return [container[key] for container, key in self.get_field_locations()]
+
+    def process_fields(self, results=None):
+        """
+        Rewrite the anchors of the fields and publish the page.
+
+        Args:
+            results (list):
+                    The rewrite_anchor_links results for get_field_contents,
+                    they're worked out here if not given
+        """
+        print("processing fields for ", self.obj)
+        locations = self.get_field_locations()
+        if results is None:
+            results = [
+                rewrite_anchor_links(container[key], self.page_ids)
+                for container, key in locations
+            ]
+
+        for (container, key), (content, missing) in zip(locations, results):
+            for path in missing:
+                print(f"No wagtail page found for {path}")
+            container[key] = content
 
         if hasattr(self, "wagtail_instance"):
             revision = self.wagtail_instance.save_revision()
@@ -104,45 +189,17 @@ class FieldProcessor:
             )
 
     def get_richtext_anchor(self, anchor_path, anchor):
-        # Find the wordpress model with the slug value
-        # and update the anchor href attribute with the wagtail page
-        # if it exists
-
-        wordpress_collection = WordpressModelCollectionUtils(
-            models=["WpPost", "WpPage"]
-        )
-        wordpress_collection.update_collection_attrs(["id", "wp_id", "wagtail_page_id"])
-        wordpress_collection.create_collection()
-        list = wordpress_collection.list
-        result = list.get(anchor_path)
-
-        if result and result.get("wagtail_page_id"):
-            soup = bs("", "html.parser")
-            newlink = soup.new_tag("a")
-            newlink["linktype"] = "page"
-            newlink["id"] = result["wagtail_page_id"]
-            newlink.string = anchor
-            return newlink
-        else:
+        richtext_anchor = get_richtext_anchor(anchor_path, anchor, self.page_ids)
+        if richtext_anchor is None:
             print(f"No wagtail page found for {anchor_path}")
             return anchor
+        return richtext_anchor
 
     def anchor_path(self, anchor):
-        return urlparse(anchor["href"]).path.strip("/")
+        return anchor_path(anchor)
 
     def anchor_type(self, anchor):
-        if not anchor.get("href"):
-            # ignore empty links
-            return
-        if anchor.get("href").startswith("http://") or anchor.get("href").startswith(
-            "https://"
-        ):
-
-            if "." in anchor.get("href"):
-                # ignore already absolute links and have a dotted domain
-                return "external"
-
-        return "internal"
+        return anchor_type(anchor)
 
 
 @dataclass
@@ -1,9 +1,13 @@
 import json
+import re
 from dataclasses import dataclass, field
 
 from bs4 import BeautifulSoup as bs
 from django.utils.module_loading import import_string
 
+# e.g. the gutenberg block delimiters <!-- wp:paragraph -->
+HTML_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+
 
 @dataclass
 class StreamFieldable:
@@ -80,6 +84,34 @@ class StreamFieldable:
         return json.dumps(streamdata)
 
 
+def get_streamdata(content):
+    """
+    Return the stream data for the html content.
+
+    A top level function so it can be run on a TransformPool.
+    """
+    return StreamFieldable(content=content).streamdata
+
+
+def clean_content(content):
+    """Return the html content without comments and surrounding whitespace."""
+    if content is None:
+        return None
+    return HTML_COMMENT.sub("", content).strip()
+
+
+def prepare_content(content):
+    """
+    Return the cleaned content and its blocks, see WordpressModel.get_content_fields.
+
+    A top level function so it can be run on a TransformPool.
+    """
+    cleaned = clean_content(content)
+    if cleaned is None:
+        return None, None
+    return cleaned, json.loads(get_streamdata(cleaned))
+
+
 def build_paragraph_block(tag, *args, **kwargs):
     block = {
         "type": "paragraph",
@@ -0,0 +1,168 @@
+from django.test import TestCase
+from wagtail.models import Page, PageLogEntry
+
+from blog.models import BlogIndexPage, BlogPage
+from home.models import HomePage, StandardPage
+from wp_connector.batch_exporter import BatchExporter, order_by_parent
+from wp_connector.exporter import Exporter
+from wp_connector.models.author import WPAuthor
+from wp_connector.models.category import WPCategory
+from wp_connector.models.page import WPPage
+from wp_connector.models.post import WPPost
+from wp_connector.models.tag import WPTag
+
+
+class TestBatchExporter(TestCase):
+    def setUp(self):
+        home_page = HomePage.objects.all().first()
+        blog_index = BlogIndexPage(title="Blog Index", slug="blog")
+        home_page.add_child(instance=blog_index)
+        self.blog_index = blog_index
+
+    def create_post(self, wp_id, title=None, **kwargs):
+        return WPPost.objects.create(
+            wp_id=wp_id,
+            title=title or f"Post {wp_id}",
+            date="2021-01-01",
+            date_gmt="2021-01-01",
+            modified="2021-01-01",
+            modified_gmt="2021-01-01",
+            content="<h1>Heading</h1><p>Test content</p>",
+            excerpt="<p>Test excerpt</p>",
+            **kwargs,
+        )
+
+    def test_create_pages(self):
+        author = WPAuthor.objects.create(
+            wp_id=1, name="Author", link="http://a.com", slug="a"
+        )
+        tag = WPTag.objects.create(wp_id=1, name="Tag", link="http://a.com", slug="tag")
+        category = WPCategory.objects.create(
+            wp_id=1, name="Category", link="http://a.com", slug="category"
+        )
+        posts = [self.create_post(wp_id, author=author) for wp_id in range(1, 6)]
+        for post in posts:
+            post.tags.add(tag)
+            post.categories.add(category)
+        # a page created one at a time before the batch
+        Exporter(admin=None, request=None, obj=posts[0]).do_create_wagtail_page()
+
+        results = BatchExporter(batch_size=2).create_pages(
+            WPPost.objects.order_by("wp_id")
+        )
+
+        self.assertEqual(
+            [result["level"] for result in results],
+            ["WARNING", "SUCCESS", "SUCCESS", "SUCCESS", "SUCCESS"],
+        )
+        self.assertEqual(BlogPage.objects.count(), 5)
+        for post in WPPost.objects.all():
+            page = BlogPage.objects.get(id=post.wagtail_page_id)
+            self.assertEqual(page.title, post.title)
+            self.assertEqual(page.get_parent().id, self.blog_index.id)
+            self.assertTrue(page.live)
+            self.assertEqual(page.live_revision, page.latest_revision)
+            self.assertEqual(page.author.name, "Author")
+            self.assertEqual(list(page.tags.names()), ["Tag"])
+            self.assertEqual(
+                [c.category.slug for c in page.categories.all()], ["category"]
+            )
+            self.assertEqual(post.wagtail_fingerprint is not None, True)
+        self.assertEqual(
+            PageLogEntry.objects.filter(action="wagtail.publish").count(), 5
+        )
+
+        # the tree is consistent with the pages added by add_child
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+        self.blog_index.refresh_from_db()
+        self.assertEqual(self.blog_index.numchild, 5)
+
+    def test_unique_slugs(self):
+        self.create_post(1, title="Same title")
+        self.create_post(2, title="Same title")
+
+        BatchExporter().create_pages(WPPost.objects.order_by("wp_id"))
+
+        self.assertEqual(
+            sorted(BlogPage.objects.values_list("slug", flat=True)),
+            ["same-title", "same-title-2"],
+        )
+        # the page url paths are set as if saved under the parent
+        page = BlogPage.objects.get(slug="same-title-2")
+        self.assertEqual(page.url_path, f"{self.blog_index.url_path}same-title-2/")
+
+    def test_unique_slugs_between_batches(self):
+        posts = [self.create_post(1, title="Same title")]
+        exporter = BatchExporter()
+        exporter.create_pages(posts)
+
+        # another export adds a page under the same parent in the meantime
+        self.blog_index.refresh_from_db()
+        self.blog_index.add_child(
+            instance=BlogPage(
+                title="Same title", slug="same-title-2", date="2021-01-01"
+            )
+        )
+        exporter.create_pages([self.create_post(2, title="Same title")])
+
+        self.assertEqual(
+            sorted(BlogPage.objects.values_list("slug", flat=True)),
+            ["same-title", "same-title-2", "same-title-3"],
+        )
+
+    def create_page(self, wp_id, parent=None):
+        return WPPage.objects.create(
+            wp_id=wp_id,
+            title=f"Page {wp_id}",
+            date="2021-01-01",
+            date_gmt="2021-01-01",
+            modified="2021-01-01",
+            modified_gmt="2021-01-01",
+            content="<p>Test content</p>",
+            excerpt="<p>Test excerpt</p>",
+            parent=parent,
+        )
+
+    def test_create_pages_under_parents(self):
+        exported = self.create_page(1)
+        BatchExporter().create_pages([exported])
+        exported.refresh_from_db()
+
+        # the children are selected before their parents
+        parent = self.create_page(2, parent=exported)
+        child = self.create_page(3, parent=parent)
+        self.create_page(4, parent=child)
+        self.create_page(5, parent=parent)
+        self.create_page(6)
+
+        results = BatchExporter().create_pages(
+            WPPage.objects.filter(wp_id__gt=1).order_by("-wp_id")
+        )
+
+        self.assertEqual({result["level"] for result in results}, {"SUCCESS"})
+        pages = {
+            obj.wp_id: StandardPage.objects.get(id=obj.wagtail_page_id)
+            for obj in WPPage.objects.all()
+        }
+        home_page = HomePage.objects.first()
+        self.assertEqual(pages[1].get_parent().id, home_page.id)
+        self.assertEqual(pages[2].get_parent().id, pages[1].id)
+        self.assertEqual(pages[3].get_parent().id, pages[2].id)
+        self.assertEqual(pages[4].get_parent().id, pages[3].id)
+        self.assertEqual(pages[5].get_parent().id, pages[2].id)
+        self.assertEqual(pages[6].get_parent().id, home_page.id)
+        self.assertEqual(pages[4].url_path, f"{pages[3].url_path}page-4/")
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+    def test_order_by_parent(self):
+        parent = self.create_page(1)
+        child = self.create_page(2, parent=parent)
+        grandchild = self.create_page(3, parent=child)
+        other = self.create_page(4)
+
+        levels = order_by_parent([grandchild, other, child, parent])
+
+        self.assertEqual(
+            [[obj.wp_id for obj in level] for level in levels],
+            [[4, 1], [2], [3]],
+        )
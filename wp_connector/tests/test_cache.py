@@ -0,0 +1,112 @@
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import responses
+from django.test import TestCase
+from responses import matchers
+
+from wp_connector.cache import ResponseCache
+from wp_connector.client import Client
+
+
+class TestResponseCache(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / "cache.sqlite3"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @responses.activate
+    def test_revalidate(self):
+        responses.add(
+            responses.GET,
+            "http://localhost:8888/wp-json",
+            match=[matchers.header_matcher({"If-None-Match": '"abc"'})],
+            status=304,
+        )
+        responses.add(
+            responses.GET,
+            "http://localhost:8888/wp-json",
+            headers={"ETag": '"abc"', "X-WP-TotalPages": "1", "X-WP-Total": "1"},
+            json=[{"id": 1}],
+        )
+        cache = ResponseCache(self.path)
+
+        # first request is stored
+        client = Client("http://localhost:8888/wp-json", cache=cache)
+        self.assertEqual(client.response.status_code, 200)
+        self.assertEqual(cache.count, 1)
+
+        # second request is revalidated
+        client = Client("http://localhost:8888/wp-json", cache=cache)
+        self.assertEqual(responses.calls[1].request.headers["If-None-Match"], '"abc"')
+        self.assertEqual(client.response.status_code, 200)
+        self.assertEqual(client.get_total_pages, 1)
+        self.assertEqual(list(client.iter_items()), [{"id": 1}])
+
+    @responses.activate
+    def test_revalidate_refreshes_the_entry(self):
+        responses.add(
+            responses.GET,
+            "http://localhost:8888/wp-json",
+            match=[matchers.header_matcher({"If-None-Match": '"abc"'})],
+            status=304,
+            headers={"ETag": '"def"'},
+        )
+        responses.add(
+            responses.GET,
+            "http://localhost:8888/wp-json",
+            headers={"ETag": '"abc"', "X-WP-TotalPages": "1", "X-WP-Total": "1"},
+            json=[{"id": 1}],
+        )
+        cache = ResponseCache(self.path, max_age=60)
+        with patch("wp_connector.cache.time.time", return_value=1000):
+            Client("http://localhost:8888/wp-json", cache=cache)
+
+        # revalidated just before the entry would be evicted
+        with patch("wp_connector.cache.time.time", return_value=1050):
+            client = Client("http://localhost:8888/wp-json", cache=cache)
+        self.assertEqual(list(client.iter_items()), [{"id": 1}])
+
+        # the entry's age starts again from the 304 with its new validator
+        with patch("wp_connector.cache.time.time", return_value=1100):
+            cache.evict()
+        entry = cache.get("http://localhost:8888/wp-json")
+        self.assertEqual(entry["headers"]["ETag"], '"def"')
+        self.assertEqual(cache.request_headers(entry), {"If-None-Match": '"def"'})
+
+    @responses.activate
+    def test_not_stored_without_validators(self):
+        responses.add(responses.GET, "http://localhost:8888/wp-json", json=[])
+        cache = ResponseCache(self.path)
+        Client("http://localhost:8888/wp-json", cache=cache)
+        self.assertEqual(cache.count, 0)
+
+    def test_evict_and_clear(self):
+        class FakeResponse:
+            headers = {"ETag": '"abc"'}
+            content = b"0123456789"
+
+        cache = ResponseCache(self.path)
+        for index in range(3):
+            cache.set(f"http://localhost:8888/{index}", FakeResponse())
+        self.assertEqual(cache.count, 3)
+
+        # the least recently used entries are evicted first
+        cache.get("http://localhost:8888/0")
+        cache.max_size = 20
+        cache.evict()
+        self.assertEqual(cache.count, 2)
+        self.assertTrue(cache.get("http://localhost:8888/0"))
+
+        # all the entries are too old
+        cache.max_age = 60
+        with patch("wp_connector.cache.time.time", return_value=10**12):
+            cache.evict()
+        self.assertEqual(cache.count, 0)
+
+        cache.set("http://localhost:8888/0", FakeResponse())
+        cache.clear()
+        self.assertEqual(cache.count, 0)
@@ -1,5 +1,7 @@
+import requests
 import responses
 from django.test import TestCase
+from responses import matchers
 
 from wp_connector.client import Client
 
@@ -49,3 +51,122 @@ class TestClient(TestCase):
         client = Client("http://localhost:8888/wp-json")
 
         self.assertEqual(client.get("http://localhost:8888/wp-json"), {"key": "value"})
+
+    @responses.activate
+    def test_get_pages(self):
+        responses.add(
+            responses.GET,
+            "http://localhost:8888/wp-json",
+            match=[matchers.query_param_matcher({"per_page": "2"})],
+            headers={"X-WP-TotalPages": "3", "X-WP-Total": "5"},
+            json=[{"id": 1}, {"id": 2}],
+        )
+        responses.add(
+            responses.GET,
+            "http://localhost:8888/wp-json",
+            match=[matchers.query_param_matcher({"page": "2", "per_page": "2"})],
+            headers={"X-WP-TotalPages": "3", "X-WP-Total": "5"},
+            json=[{"id": 3}, {"id": 4}],
+        )
+        responses.add(
+            responses.GET,
+            "http://localhost:8888/wp-json",
+            match=[matchers.query_param_matcher({"page": "3", "per_page": "2"})],
+            headers={"X-WP-TotalPages": "3", "X-WP-Total": "5"},
+            json=[{"id": 5}],
+        )
+
+        for workers in (1, 3):
+            client = Client(
+                "http://localhost:8888/wp-json", workers=workers, per_page=2
+            )
+            self.assertEqual(
+                list(client.get_pages()),
+                [[{"id": 1}, {"id": 2}], [{"id": 3}, {"id": 4}], [{"id": 5}]],
+            )
+            self.assertEqual(
+                [item["id"] for item in client.iter_items()], [1, 2, 3, 4, 5]
+            )
+
+            # starting from a later page, e.g. to resume an import
+            client = Client(
+                "http://localhost:8888/wp-json",
+                workers=workers,
+                per_page=2,
+                start_page=2,
+            )
+            pages = [(client.page, json) for json in client.get_pages()]
+            self.assertEqual(pages, [(2, [{"id": 3}, {"id": 4}]), (3, [{"id": 5}])])
+
+    @responses.activate
+    def test_get_pages_follows_link_header(self):
+        # the first page says there is only 1 page but the Link header
+        # says there is a next page, e.g. posts published since
+        responses.add(
+            responses.GET,
+            "http://localhost:8888/wp-json",
+            match=[matchers.query_param_matcher({"per_page": "1"})],
+            headers={
+                "X-WP-TotalPages": "1",
+                "Link": '<http://localhost:8888/wp-json?page=2&per_page=1>; rel="next"',
+            },
+            json=[{"id": 1}],
+        )
+        responses.add(
+            responses.GET,
+            "http://localhost:8888/wp-json",
+            match=[matchers.query_param_matcher({"page": "2", "per_page": "1"})],
+            headers={"X-WP-TotalPages": "2"},
+            json=[],
+        )
+        for workers in (1, 2):
+            client = Client(
+                "http://localhost:8888/wp-json", per_page=1, workers=workers
+            )
+            self.assertEqual(list(client.get_pages()), [[{"id": 1}], []])
+
+    def test_next_page_urls(self):
+        client = Client.__new__(Client)
+        client.url = "http://localhost:8888/wp-json"
+        client.params = {"per_page": 1}
+        response = requests.Response()
+        response.headers["X-WP-TotalPages"] = "4"
+        response.headers["Link"] = '<http://localhost:8888/next>; rel="next"'
+
+        # the next page from the Link header, then the pages ahead up to the total
+        self.assertEqual(
+            client.next_page_urls(response, 1, 2, 2),
+            [
+                (2, "http://localhost:8888/next"),
+                (3, "http://localhost:8888/wp-json?page=3&per_page=1"),
+            ],
+        )
+        # the next page was already requested
+        self.assertEqual(
+            client.next_page_urls(response, 1, 4, 2),
+            [(4, "http://localhost:8888/wp-json?page=4&per_page=1")],
+        )
+        # the last page
+        del response.headers["Link"]
+        self.assertEqual(client.next_page_urls(response, 4, 5, 2), [])
+
+    @responses.activate
+    def test_per_page_and_fields(self):
+        responses.add(
+            responses.GET,
+            "http://localhost:8888/wp-json",
+            match=[
+                matchers.query_param_matcher({"per_page": "100", "_fields": "id,title"})
+            ],
+            headers={"X-WP-TotalPages": "2", "X-WP-Total": "150"},
+        )
+        client = Client(
+            "http://localhost:8888/wp-json", per_page=500, fields=["id", "title"]
+        )
+        self.assertEqual(
+            client.paged_endpoints,
+            [
+                "http://localhost:8888/wp-json?page=1&per_page=100&_fields=id,title",
+                "http://localhost:8888/wp-json?page=2&per_page=100&_fields=id,title",
+            ],
+        )
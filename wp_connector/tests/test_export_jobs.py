@@ -0,0 +1,226 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import BlogIndexPage, BlogPage
+from home.models import HomePage, StandardPage
+from wp_connector.batch_exporter import BatchExporter
+from wp_connector.export_jobs import run_job
+from wp_connector.models import ExportJob, ExportJobLost, WPPage, WPPost
+
+
+class TestExportJobs(TestCase):
+    def setUp(self):
+        home_page = HomePage.objects.all().first()
+        home_page.add_child(instance=BlogIndexPage(title="Blog Index", slug="blog"))
+        self.posts = [
+            WPPost.objects.create(
+                wp_id=wp_id,
+                title=f"Post {wp_id}",
+                date="2021-01-01",
+                date_gmt="2021-01-01",
+                modified="2021-01-01",
+                modified_gmt="2021-01-01",
+                content="<p>Test content</p>",
+                excerpt="<p>Test excerpt</p>",
+            )
+            for wp_id in range(1, 6)
+        ]
+        user = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.client.force_login(user)
+
+    @override_settings(WPC_EXPORT_JOBS=True)
+    def test_enqueue_and_run(self):
+        response = self.client.post(
+            reverse("wordpress-import-admin:wp_connector_wppost_changelist"),
+            {
+                "action": "create_wagtail_page",
+                "_selected_action": [post.pk for post in self.posts],
+            },
+        )
+
+        # the action is queued, not run
+        job = ExportJob.objects.get()
+        self.assertRedirects(
+            response,
+            reverse(
+                "wordpress-import-admin:wp_connector_exportjob_status", args=[job.pk]
+            ),
+        )
+        self.assertEqual(job.status, ExportJob.STATUS_PENDING)
+        self.assertEqual(job.total, 5)
+        self.assertEqual(BlogPage.objects.count(), 0)
+
+        stdout = StringIO()
+        call_command("export_worker", "--once", stdout=stdout)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.STATUS_DONE)
+        self.assertEqual(job.processed, 5)
+        self.assertEqual(job.successes, 5)
+        self.assertEqual(BlogPage.objects.count(), 5)
+        self.assertIn("Done", stdout.getvalue())
+
+        response = self.client.get(
+            reverse(
+                "wordpress-import-admin:wp_connector_exportjob_status", args=[job.pk]
+            ),
+            {"format": "json"},
+        )
+        self.assertEqual(response.json()["percent"], 100)
+        self.assertTrue(response.json()["is_finished"])
+        self.assertEqual(len(response.json()["messages"]), 5)
+
+        response = self.client.get(
+            reverse(
+                "wordpress-import-admin:wp_connector_exportjob_status", args=[job.pk]
+            )
+        )
+        self.assertContains(response, "Created wagtail page ID")
+
+    def test_actions_run_in_the_request(self):
+        self.client.post(
+            reverse("wordpress-import-admin:wp_connector_wppost_changelist"),
+            {
+                "action": "create_wagtail_page",
+                "_selected_action": [post.pk for post in self.posts],
+            },
+        )
+
+        self.assertFalse(ExportJob.objects.exists())
+        self.assertEqual(BlogPage.objects.count(), 5)
+
+    def test_claim(self):
+        job = ExportJob.enqueue("create_wagtail_page", WPPost, [])
+
+        self.assertEqual(ExportJob.claim("worker-1"), job)
+        # each job is only run by one worker
+        self.assertIsNone(ExportJob.claim("worker-2"))
+
+        # unless its worker stopped making progress
+        ExportJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        claimed = ExportJob.claim("worker-2")
+        self.assertEqual(claimed, job)
+        self.assertEqual(claimed.worker, "worker-2")
+
+    def test_job_taken_over(self):
+        job = ExportJob.enqueue(
+            "create_wagtail_page", WPPost, [post.pk for post in self.posts]
+        )
+        stalled = ExportJob.claim("worker-1")
+        ExportJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(ExportJob.claim("worker-2"), job)
+
+        # the first worker stops without running or saving anything
+        run_job(stalled)
+        job.refresh_from_db()
+        self.assertEqual(job.worker, "worker-2")
+        self.assertEqual(job.status, ExportJob.STATUS_RUNNING)
+        self.assertEqual(job.processed, 0)
+        self.assertEqual(BlogPage.objects.count(), 0)
+        with self.assertRaises(ExportJobLost):
+            stalled.save_progress(5)
+
+    def test_job_taken_over_between_batches(self):
+        parent = WPPage.objects.create(
+            wp_id=1,
+            title="Parent",
+            date="2021-01-01",
+            date_gmt="2021-01-01",
+            modified="2021-01-01",
+            modified_gmt="2021-01-01",
+            content="<p>Test content</p>",
+            excerpt="<p>Test excerpt</p>",
+        )
+        child = WPPage.objects.create(
+            wp_id=2,
+            title="Child",
+            date="2021-01-01",
+            date_gmt="2021-01-01",
+            modified="2021-01-01",
+            modified_gmt="2021-01-01",
+            content="<p>Test content</p>",
+            excerpt="<p>Test excerpt</p>",
+            parent=parent,
+        )
+        job = ExportJob.enqueue("create_wagtail_page", WPPage, [parent.pk, child.pk])
+        slow = ExportJob.claim("worker-1")
+        create_batch = BatchExporter.create_batch
+
+        def take_over(exporter, *args):
+            # the first batch took longer than the timeout
+            results = create_batch(exporter, *args)
+            slow.heartbeat_at = timezone.now() - timedelta(hours=1)
+            ExportJob.objects.filter(pk=job.pk).update(heartbeat_at=slow.heartbeat_at)
+            ExportJob.claim("worker-2")
+            return results
+
+        # the parent and the child are created in separate batches
+        with patch.object(BatchExporter, "create_batch", take_over):
+            run_job(slow)
+
+        # the first worker stops before the next batch
+        job.refresh_from_db()
+        self.assertEqual(job.worker, "worker-2")
+        self.assertEqual(job.processed, 0)
+        self.assertEqual(
+            list(StandardPage.objects.values_list("title", flat=True)), ["Parent"]
+        )
+
+    def test_heartbeat(self):
+        ExportJob.enqueue("create_wagtail_page", WPPost, [])
+        job = ExportJob.claim("worker-1")
+        long_ago = timezone.now() - timedelta(hours=1)
+        ExportJob.objects.filter(pk=job.pk).update(heartbeat_at=long_ago)
+        job.heartbeat_at = long_ago
+
+        # the messages of a long chunk keep the job claimed
+        job.add_message("Created wagtail page ID:1", "SUCCESS")
+        self.assertIsNone(ExportJob.claim("worker-2"))
+        job.refresh_from_db()
+        self.assertGreater(job.heartbeat_at, long_ago)
+
+    def test_run_job_in_chunks(self):
+        job = ExportJob.enqueue(
+            "create_wagtail_page", WPPost, [post.pk for post in self.posts]
+        )
+        # the first chunk was run by a worker that stopped
+        run_job(ExportJob.claim("worker-1"), chunk_size=2)
+        job.refresh_from_db()
+        self.assertEqual(job.processed, 5)
+        self.assertEqual(job.successes, 5)
+
+        job = ExportJob.enqueue(
+            "update_anchor_links", WPPost, [post.pk for post in self.posts]
+        )
+        job.processed = 4
+        job.save()
+        run_job(ExportJob.claim("worker-1"), chunk_size=2)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.STATUS_DONE)
+        # only the last chunk was run
+        self.assertEqual(job.successes, 1)
+
+    def test_failed_job(self):
+        # the model was removed after the job was queued
+        job = ExportJob.enqueue("update_anchor_links", WPPage, [1])
+        job.model_name = "wp_connector.WPMissing"
+        job.save()
+
+        run_job(ExportJob.claim("worker-1"))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.STATUS_FAILED)
+        self.assertIn("WPMissing", job.error)
@@ -0,0 +1,187 @@
+import pickle
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from taggit.models import Tag
+from wagtail.models import Page
+
+from blog.models import Author, BlogCategory, BlogIndexPage, BlogPage
+from home.models import HomePage, StandardPage
+from wp_connector.export_shards import export_shard, plan_shards
+from wp_connector.exporter import ExportSession
+from wp_connector.models import WPPage, WPPost
+from wp_connector.models.author import WPAuthor
+from wp_connector.models.category import WPCategory
+from wp_connector.models.tag import WPTag
+
+
+class TestExportShards(TestCase):
+    def setUp(self):
+        self.home_page = HomePage.objects.all().first()
+        self.home_page.add_child(
+            instance=BlogIndexPage(title="Blog Index", slug="blog")
+        )
+
+    def create_page(self, wp_id, parent=None, title=None):
+        return WPPage.objects.create(
+            wp_id=wp_id,
+            title=title or f"Page {wp_id}",
+            date="2021-01-01",
+            date_gmt="2021-01-01",
+            modified="2021-01-01",
+            modified_gmt="2021-01-01",
+            content="<p>Test content</p>",
+            excerpt="<p>Test excerpt</p>",
+            parent=parent,
+        )
+
+    def test_plan_shards(self):
+        first = self.create_page(1)
+        child = self.create_page(2, parent=first)
+        self.create_page(3, parent=child)
+        second = self.create_page(4)
+        self.create_page(5, parent=second)
+        self.create_page(6)
+
+        plan = plan_shards(list(WPPage.objects.all()), 2)
+
+        shards = [sorted(shard["object_ids"]) for shard in plan]
+        pks = {obj.wp_id: obj.pk for obj in WPPage.objects.all()}
+        # each subtree is in a single shard
+        self.assertEqual(shards, [[pks[1], pks[2], pks[3]], [pks[4], pks[5], pks[6]]])
+        # each shard has its own positions under the home page, after the blog index
+        self.assertEqual(
+            [shard["positions"] for shard in plan],
+            [{self.home_page.pk: (1, 2)}, {self.home_page.pk: (2, 4)}],
+        )
+
+    def test_plan_shards_slugs(self):
+        self.create_page(1, title="Foo")
+        self.create_page(2, title="Foo")
+        self.create_page(3, title="Foo 2")
+        self.create_page(4, title="Blog Index")
+
+        plan = plan_shards(list(WPPage.objects.all()), 2)
+
+        # the slugs are unique across the shards and the existing pages,
+        # "Foo 2" can't take the slug the second "Foo" is suffixed with
+        slugs = [slug for shard in plan for slug in shard["reserved_slugs"].values()]
+        self.assertEqual(len(plan), 2)
+        self.assertEqual(len(set(slugs)), 4)
+        self.assertTrue({"foo", "foo-2", "blog-index"} < set(slugs))
+
+        for shard in reversed(plan):
+            export_shard(
+                "wp_connector.WPPage",
+                shard["object_ids"],
+                shard["positions"],
+                shard["reserved_slugs"],
+            )
+        self.assertEqual(
+            sorted(self.home_page.get_children().values_list("slug", flat=True)),
+            sorted(["blog", *slugs]),
+        )
+
+    def test_export_shards(self):
+        first = self.create_page(1)
+        self.create_page(2, parent=first)
+        second = self.create_page(3)
+        self.create_page(4, parent=second)
+        self.create_page(5)
+
+        plan = plan_shards(list(WPPage.objects.all()), 2)
+        # run in reverse, as if the last shard was quicker
+        reports = [
+            export_shard(
+                "wp_connector.WPPage",
+                shard["object_ids"],
+                shard["positions"],
+                shard["reserved_slugs"],
+            )
+            for shard in reversed(plan)
+        ]
+
+        self.assertEqual(sum(report["created"] for report in reports), 5)
+        pages = {
+            obj.wp_id: StandardPage.objects.get(id=obj.wagtail_page_id)
+            for obj in WPPage.objects.all()
+        }
+        self.assertEqual(pages[2].get_parent().id, pages[1].id)
+        self.assertEqual(pages[4].get_parent().id, pages[3].id)
+        for wp_id in (1, 3, 5):
+            self.assertEqual(pages[wp_id].get_parent().id, self.home_page.id)
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+    def test_export_shards_shared_terms(self):
+        author = WPAuthor.objects.create(
+            wp_id=1, name="Author", link="http://a.com", slug="a"
+        )
+        tag = WPTag.objects.create(wp_id=1, name="Tag", link="http://a.com", slug="tag")
+        category = WPCategory.objects.create(
+            wp_id=1, name="Category", link="http://a.com", slug="category"
+        )
+        for wp_id in range(1, 5):
+            post = WPPost.objects.create(
+                wp_id=wp_id,
+                title=f"Post {wp_id}",
+                date="2021-01-01",
+                date_gmt="2021-01-01",
+                modified="2021-01-01",
+                modified_gmt="2021-01-01",
+                content="<p>Test content</p>",
+                excerpt="<p>Test excerpt</p>",
+                author=author,
+            )
+            post.tags.add(tag)
+            post.categories.add(category)
+
+        objects = list(WPPost.objects.all())
+        plan = plan_shards(objects, 2)
+        # the terms are created once, as export_pages does before the shards start
+        session = ExportSession()
+        session.prepare(objects)
+        # each shard process gets its own copy of the session
+        sessions = [pickle.loads(pickle.dumps(session)) for _ in plan]
+        reports = [
+            export_shard(
+                "wp_connector.WPPost",
+                shard["object_ids"],
+                shard["positions"],
+                shard["reserved_slugs"],
+                session=shard_session,
+            )
+            for shard, shard_session in zip(plan, sessions)
+        ]
+
+        self.assertEqual(len(plan), 2)
+        self.assertEqual(sum(report["created"] for report in reports), 4)
+        self.assertEqual(Author.objects.filter(name="Author").count(), 1)
+        self.assertEqual(Tag.objects.filter(name="Tag").count(), 1)
+        self.assertEqual(BlogCategory.objects.filter(slug="category").count(), 1)
+        for page in BlogPage.objects.all():
+            self.assertEqual(page.author.name, "Author")
+            self.assertEqual([t.name for t in page.tags.all()], ["Tag"])
+            self.assertEqual(
+                [c.category.slug for c in page.categories.all()], ["category"]
+            )
+
+    def test_export_pages_command(self):
+        for wp_id in range(1, 4):
+            WPPost.objects.create(
+                wp_id=wp_id,
+                title=f"Post {wp_id}",
+                date="2021-01-01",
+                date_gmt="2021-01-01",
+                modified="2021-01-01",
+                modified_gmt="2021-01-01",
+                content="<p>Test content</p>",
+                excerpt="<p>Test excerpt</p>",
+            )
+
+        stdout = StringIO()
+        call_command("export_pages", "WPPost", "--processes", "1", stdout=stdout)
+
+        self.assertEqual(BlogPage.objects.count(), 3)
+        self.assertIn("Shard 1: 3 of 3 pages created", stdout.getvalue())
+        self.assertIn("Created 3 WPPost pages", stdout.getvalue())
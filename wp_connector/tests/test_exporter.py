@@ -1,8 +1,11 @@
+from unittest.mock import patch
+
 from django.test import TestCase
+from taggit.models import Tag
 
-from blog.models import BlogCategory, BlogIndexPage, BlogPage
+from blog.models import Author, BlogCategory, BlogIndexPage, BlogPage
 from home.models import HomePage
-from wp_connector.exporter import Exporter
+from wp_connector.exporter import Exporter, ExportSession
 from wp_connector.models.author import WPAuthor
 from wp_connector.models.category import WPCategory
 from wp_connector.models.post import WPPost
@@ -49,6 +52,29 @@ class TestExporter(TestCase):
         blog_page = BlogPage.objects.get(id=post.wagtail_page_id)
         self.assertEqual(blog_page.title, post.title)
 
+    def test_do_update_wagtail_page_unchanged(self):
+        post = WPPost.objects.create(**self.post_data)
+
+        exporter = Exporter(admin=object(), request=object(), obj=post)
+        exporter.do_create_wagtail_page()
+        self.assertTrue(post.wagtail_fingerprint)
+        blog_page = BlogPage.objects.get(id=post.wagtail_page_id)
+        revisions = blog_page.revisions.count()
+
+        # nothing has changed so no revision is published
+        result = exporter.do_update_wagtail_page()
+        self.assertEqual(result["level"], "INFO")
+        self.assertEqual(blog_page.revisions.count(), revisions)
+
+        post.title = "New title"
+        post.save()
+        result = exporter.do_update_wagtail_page()
+        self.assertEqual(result["level"], "SUCCESS")
+        self.assertEqual(blog_page.revisions.count(), revisions + 1)
+
+        result = exporter.do_update_wagtail_page()
+        self.assertEqual(result["level"], "INFO")
+
     def test_set_author(self):
         author = WPAuthor(wp_id=1, name="Test Author", slug="test-author")
         author.save()
@@ -99,3 +125,73 @@ class TestExporter(TestCase):
             id=blog_page.categories.first().category_id
         )
         self.assertEqual(blog_category.name, category.name)
+
+    def test_set_fields_uses_cached_blocks(self):
+        post = WPPost.objects.create(**self.post_data)
+        post.wp_block_content = [{"type": "paragraph", "value": "<p>Cached</p>"}]
+        post.wp_content_hash = post.get_content_hash()
+
+        exporter = Exporter(admin=object(), request=object(), obj=post)
+        blog_page = BlogPage()
+        with patch("wp_connector.exporter.StreamFieldable") as mock_streamfieldable:
+            exporter.set_fields(blog_page)
+        mock_streamfieldable.assert_not_called()
+        self.assertEqual(list(blog_page.body.raw_data), post.wp_block_content)
+
+        # the content has changed since the blocks were built
+        post.content = "<p>Changed</p>"
+        exporter.set_fields(blog_page)
+        self.assertEqual(
+            list(blog_page.body.raw_data),
+            [{"type": "paragraph", "value": "<p>Changed</p>"}],
+        )
+
+    def test_export_session(self):
+        Author.objects.create(name="Existing Author")
+        Tag.objects.create(name="Existing Tag")
+        author = WPAuthor.objects.create(wp_id=1, name="Existing Author", slug="a")
+
+        posts = []
+        for wp_id in range(1, 4):
+            post = WPPost.objects.create(
+                **{**self.post_data, "wp_id": wp_id}, author=author
+            )
+            for i in range(wp_id):
+                tag, _ = WPTag.objects.get_or_create(
+                    wp_id=i, defaults={"name": f"Tag {i}", "slug": f"tag-{i}"}
+                )
+                category, _ = WPCategory.objects.get_or_create(
+                    wp_id=i, defaults={"name": f"Category {i}", "slug": f"category-{i}"}
+                )
+                post.tags.add(tag)
+                post.categories.add(category)
+            posts.append(post)
+        posts[0].tags.add(WPTag.objects.create(wp_id=9, name="Existing Tag", slug="e"))
+
+        session = ExportSession()
+        objects = list(WPPost.objects.all())
+        # one query each for the authors, tags and categories of all the posts
+        # and one to create each of the missing tags and categories
+        with self.assertNumQueries(5):
+            session.prepare(objects)
+
+        self.assertEqual(Author.objects.count(), 1)
+        self.assertEqual(Tag.objects.count(), 4)
+        self.assertEqual(BlogCategory.objects.count(), 3)
+
+        # the lookups are made from the session
+        exporter = Exporter(
+            admin=object(), request=object(), obj=posts[2], session=session
+        )
+        blog_page = BlogPage()
+        with self.assertNumQueries(0):
+            exporter.set_author(blog_page)
+        self.assertEqual(blog_page.author.name, "Existing Author")
+
+        exporter.do_create_wagtail_page()
+        blog_page = BlogPage.objects.get(id=posts[2].wagtail_page_id)
+        self.assertEqual(sorted(blog_page.tags.names()), ["Tag 0", "Tag 1", "Tag 2"])
+        self.assertEqual(
+            sorted(c.category.slug for c in blog_page.categories.all()),
+            ["category-0", "category-1", "category-2"],
+        )
@@ -0,0 +1,624 @@
+import re
+from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import responses
+from django.test import TestCase
+from responses import matchers
+
+from wp_connector.import_plan import ImportPlan
+from wp_connector.importer import (
+    Importer,
+    get_import_levels,
+    import_models,
+    make_absolute_links,
+)
+from wp_connector.models import (
+    ImportState,
+    WPAuthor,
+    WPCategory,
+    WPComment,
+    WPMedia,
+    WPPage,
+    WPPost,
+    WPTag,
+)
+from wp_connector.streamfieldable import prepare_content
+from wp_connector.wxr import WXRSource
+
+POSTS_URL = "http://localhost:8888/wp-json/wp/v2/posts"
+CATEGORIES_URL = "http://localhost:8888/wp-json/wp/v2/categories"
+TESTDATA = Path(__file__).resolve().parents[2] / "wordpress.testdata"
+
+
+def category_json(wp_id, parent=0):
+    return {
+        "id": wp_id,
+        "count": 1,
+        "description": "",
+        "link": f"http://localhost:8888/category/{wp_id}/",
+        "name": f"Category {wp_id}",
+        "slug": f"category-{wp_id}",
+        "taxonomy": "category",
+        "parent": parent,
+    }
+
+
+def post_json(wp_id, modified_gmt, **kwargs):
+    post = {
+        "id": wp_id,
+        "date": "2021-01-01T00:00:00",
+        "date_gmt": "2021-01-01T00:00:00",
+        "guid": {"rendered": f"http://localhost:8888/?p={wp_id}"},
+        "modified": modified_gmt,
+        "modified_gmt": modified_gmt,
+        "slug": f"post-{wp_id}",
+        "status": "publish",
+        "type": "post",
+        "link": f"http://localhost:8888/post-{wp_id}/",
+        "title": {"rendered": f"Post {wp_id}"},
+        "content": {"rendered": "<p>Content</p>"},
+        "excerpt": {"rendered": "<p>Excerpt</p>"},
+        "author": 0,
+        "comment_status": "open",
+        "ping_status": "open",
+        "sticky": False,
+        "template": "",
+        "format": "standard",
+        "categories": [],
+        "tags": [],
+    }
+    post.update(kwargs)
+    return post
+
+
+class TestImporter(TestCase):
+    def add_posts(self, posts, params=None):
+        responses.add(
+            responses.GET,
+            POSTS_URL,
+            match=[matchers.query_param_matcher(params or {}, strict_match=False)],
+            headers={"X-WP-TotalPages": "1", "X-WP-Total": str(len(posts))},
+            json=posts,
+        )
+
+    @responses.activate
+    def test_import_data(self):
+        self.add_posts(
+            [
+                post_json(1, "2021-01-01T00:00:00"),
+                post_json(2, "2021-01-02T00:00:00"),
+            ]
+        )
+        Importer(POSTS_URL, "WPPost").import_data()
+
+        self.assertEqual(WPPost.objects.count(), 2)
+        self.assertEqual(WPPost.objects.get(wp_id=1).title, "Post 1")
+        self.assertEqual(WPPost.objects.get(wp_id=2).content, "<p>Content</p>")
+
+    @responses.activate
+    def test_prepare_content(self):
+        content = "<!-- wp:paragraph -->\n<p>Content</p>\n<!-- /wp:paragraph -->"
+        self.add_posts(
+            [post_json(1, "2021-01-01T00:00:00", content={"rendered": content})]
+        )
+        Importer(POSTS_URL, "WPPost").import_data()
+
+        post = WPPost.objects.get(wp_id=1)
+        self.assertEqual(post.wp_cleaned_content, "<p>Content</p>")
+        self.assertEqual(
+            post.wp_block_content, [{"type": "paragraph", "value": "<p>Content</p>"}]
+        )
+        self.assertEqual(post.wp_content_hash, post.get_content_hash())
+
+        # unchanged content isn't processed again
+        with patch(
+            "wp_connector.importer.prepare_content", wraps=prepare_content
+        ) as mock_prepare_content:
+            Importer(POSTS_URL, "WPPost").import_data()
+        mock_prepare_content.assert_not_called()
+        self.assertEqual(
+            WPPost.objects.get(wp_id=1).wp_cleaned_content, "<p>Content</p>"
+        )
+
+    @responses.activate
+    def test_resume(self):
+        def first_page(request):
+            return "page" not in parse_qs(urlparse(request.url).query), "not page 1"
+
+        # two pages of posts
+        self.add_posts([post_json(3, "2021-01-01T00:00:00")], params={"page": "2"})
+        responses.add(
+            responses.GET,
+            POSTS_URL,
+            match=[first_page],
+            headers={"X-WP-TotalPages": "2", "X-WP-Total": "3"},
+            json=[
+                post_json(1, "2021-01-01T00:00:00"),
+                post_json(2, "2021-01-01T00:00:00"),
+            ],
+        )
+
+        # the import stops while writing the third batch
+        importer = Importer(POSTS_URL, "WPPost", per_page=2, batch_size=1)
+        write_batch = importer.write_batch
+
+        def stop_at_post_3(batch):
+            if batch[0][0].wp_id == 3:
+                raise RuntimeError("Stopped")
+            write_batch(batch)
+
+        with patch.object(importer, "write_batch", side_effect=stop_at_post_3):
+            with self.assertRaises(RuntimeError):
+                importer.import_data()
+
+        state = ImportState.objects.get(model_name="WPPost")
+        self.assertEqual(state.checkpoint_phase, ImportState.PHASE_ITEMS)
+        self.assertEqual((state.checkpoint_page, state.checkpoint_offset), (1, 2))
+
+        # the resumed import starts from the first page and skips its two posts
+        importer = Importer(POSTS_URL, "WPPost", per_page=2, batch_size=1, resume=True)
+        with patch.object(
+            importer, "write_batch", wraps=importer.write_batch
+        ) as mock_write_batch:
+            importer.import_data()
+        self.assertEqual(mock_write_batch.call_count, 1)
+        self.assertEqual(WPPost.objects.count(), 3)
+        state.refresh_from_db()
+        self.assertEqual(state.checkpoint_phase, ImportState.PHASE_DONE)
+
+        # a finished import has nothing to resume
+        with patch.object(Importer, "import_items") as mock_import_items:
+            Importer(POSTS_URL, "WPPost", per_page=2, resume=True).import_data()
+        mock_import_items.assert_not_called()
+
+        # the relations phase resumes after the last object processed
+        posts = list(WPPost.objects.order_by("pk"))
+        ImportState.objects.filter(pk=state.pk).update(
+            checkpoint_phase=ImportState.PHASE_RELATIONS, checkpoint_pk=posts[0].pk
+        )
+        importer = Importer(POSTS_URL, "WPPost", per_page=2, resume=True)
+        self.assertIsNone(importer.client)
+        with patch.object(importer, "process_one_to_many") as mock_process:
+            importer.import_data()
+        self.assertEqual(
+            [obj.pk for call in mock_process.call_args_list for obj in call.args[0]],
+            [posts[1].pk, posts[2].pk],
+        )
+
+    @responses.activate
+    def test_embed(self):
+        def term(wp_id, taxonomy):
+            return {
+                "id": wp_id,
+                "link": f"http://localhost:8888/{taxonomy}/{wp_id}/",
+                "name": f"Term {wp_id}",
+                "slug": f"term-{wp_id}",
+                "taxonomy": taxonomy,
+            }
+
+        def embedded_post(wp_id, author_name="Author 5"):
+            return post_json(
+                wp_id,
+                "2021-01-01T00:00:00",
+                author=5,
+                categories=[7],
+                tags=[8],
+                _embedded={
+                    "author": [
+                        {
+                            "id": 5,
+                            "name": author_name,
+                            "link": "http://localhost:8888/author/5/",
+                            "slug": "author-5",
+                        }
+                    ],
+                    "wp:term": [[term(7, "category")], [term(8, "post_tag")]],
+                },
+            )
+
+        self.add_posts([embedded_post(1), embedded_post(2)])
+        with patch.object(Importer, "import_relations") as mock_import_relations:
+            Importer(POSTS_URL, "WPPost", embed=True).import_data()
+        mock_import_relations.assert_not_called()
+
+        query = parse_qs(urlparse(responses.calls[0].request.url).query)
+        self.assertEqual(query["_embed"], ["author,wp:term"])
+        self.assertIn("_embedded", query["_fields"][0].split(","))
+
+        self.assertEqual(WPAuthor.objects.get(wp_id=5).name, "Author 5")
+        category = WPCategory.objects.get(wp_id=7)
+        self.assertEqual((category.name, category.count), ("Term 7", 0))
+        tag = WPTag.objects.get(wp_id=8)
+        for post in WPPost.objects.all():
+            self.assertEqual(post.author.wp_id, 5)
+            self.assertEqual(list(post.categories.all()), [category])
+            self.assertEqual(list(post.tags.all()), [tag])
+
+        # the embedded objects are updated even if the posts are unchanged
+        responses.reset()
+        self.add_posts([embedded_post(1, author_name="Renamed")])
+        Importer(POSTS_URL, "WPPost", embed=True).import_data()
+        self.assertEqual(WPAuthor.objects.get(wp_id=5).name, "Renamed")
+        self.assertEqual(WPAuthor.objects.count(), 1)
+
+    @responses.activate
+    def test_skip_unchanged(self):
+        self.add_posts(
+            [
+                post_json(1, "2021-01-01T00:00:00"),
+                post_json(2, "2021-01-01T00:00:00"),
+            ]
+        )
+        Importer(POSTS_URL, "WPPost").import_data()
+        WPPost.objects.filter(wp_id=1).update(title="Changed in the database")
+
+        responses.reset()
+        self.add_posts(
+            [
+                post_json(1, "2021-01-01T00:00:00"),
+                post_json(2, "2021-01-02T00:00:00", title={"rendered": "New title"}),
+            ]
+        )
+        importer = Importer(POSTS_URL, "WPPost")
+        importer.import_data()
+
+        # only the changed item is written and has its relations processed
+        self.assertEqual(importer.skipped, 1)
+        self.assertEqual(importer.imported_pks, [WPPost.objects.get(wp_id=2).pk])
+        self.assertEqual(WPPost.objects.get(wp_id=1).title, "Changed in the database")
+        self.assertEqual(WPPost.objects.get(wp_id=2).title, "New title")
+
+        importer = Importer(POSTS_URL, "WPPost", force=True)
+        importer.import_data()
+        self.assertEqual(importer.skipped, 0)
+        self.assertEqual(WPPost.objects.get(wp_id=1).title, "Post 1")
+
+    @responses.activate
+    def test_skip_unchanged_after_relations(self):
+        responses.add(
+            responses.GET,
+            CATEGORIES_URL,
+            headers={"X-WP-TotalPages": "1", "X-WP-Total": "1"},
+            json=[category_json(1)],
+        )
+        self.add_posts([post_json(1, "2021-01-01T00:00:00", categories=[1])])
+
+        # the posts are imported before their categories
+        Importer(POSTS_URL, "WPPost").import_data()
+        self.assertIsNone(WPPost.objects.get(wp_id=1).wp_fingerprint)
+        Importer(CATEGORIES_URL, "WPCategory").import_data()
+
+        # the post isn't skipped until it's linked to its category
+        importer = Importer(POSTS_URL, "WPPost")
+        importer.import_data()
+        self.assertEqual(importer.skipped, 0)
+        post = WPPost.objects.get(wp_id=1)
+        self.assertEqual(list(post.categories.values_list("wp_id", flat=True)), [1])
+        self.assertIsNotNone(post.wp_fingerprint)
+
+        importer = Importer(POSTS_URL, "WPPost")
+        importer.import_data()
+        self.assertEqual(importer.skipped, 1)
+
+    @responses.activate
+    def test_skip_unchanged_after_stopping(self):
+        responses.add(
+            responses.GET,
+            CATEGORIES_URL,
+            headers={"X-WP-TotalPages": "1", "X-WP-Total": "1"},
+            json=[category_json(1)],
+        )
+        self.add_posts([post_json(1, "2021-01-01T00:00:00", categories=[1])])
+        Importer(CATEGORIES_URL, "WPCategory").import_data()
+
+        # the import stops before the relations are processed
+        with patch.object(Importer, "import_relations", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                Importer(POSTS_URL, "WPPost").import_data()
+        ImportState.objects.all().delete()
+
+        # a new import writes and links the post again
+        importer = Importer(POSTS_URL, "WPPost")
+        importer.import_data()
+        self.assertEqual(importer.skipped, 0)
+        self.assertEqual(
+            list(
+                WPPost.objects.get(wp_id=1).categories.values_list("wp_id", flat=True)
+            ),
+            [1],
+        )
+
+    @responses.activate
+    def test_skip_unchanged_repeated_item(self):
+        # the item changed while paging, so it's in the batch twice
+        self.add_posts(
+            [
+                post_json(1, "2021-01-01T00:00:00"),
+                post_json(1, "2021-01-02T00:00:00", title={"rendered": "New title"}),
+                post_json(2, "2021-01-01T00:00:00"),
+            ]
+        )
+        Importer(POSTS_URL, "WPPost").import_data()
+        self.assertEqual(WPPost.objects.get(wp_id=1).title, "New title")
+
+        # each item has the fingerprint of the data written for it
+        responses.reset()
+        self.add_posts(
+            [
+                post_json(1, "2021-01-02T00:00:00", title={"rendered": "New title"}),
+                post_json(2, "2021-01-01T00:00:00"),
+            ]
+        )
+        importer = Importer(POSTS_URL, "WPPost")
+        importer.import_data()
+        self.assertEqual(importer.skipped, 2)
+
+    @responses.activate
+    def test_incremental_import(self):
+        self.add_posts([post_json(1, "2021-01-02T00:00:00")])
+        Importer(POSTS_URL, "WPPost", incremental=True).import_data()
+
+        state = ImportState.objects.get(model_name="WPPost")
+        self.assertEqual(state.modified, "2021-01-02T00:00:00")
+        self.assertEqual(state.modified_gmt.day, 2)
+
+        # the next import only requests the posts modified since
+        responses.reset()
+        self.add_posts(
+            [post_json(1, "2021-01-03T00:00:00", title={"rendered": "Updated"})],
+            params={"modified_after": "2021-01-02T00:00:00"},
+        )
+        Importer(POSTS_URL, "WPPost", incremental=True).import_data()
+
+        self.assertEqual(WPPost.objects.get(wp_id=1).title, "Updated")
+        state.refresh_from_db()
+        self.assertEqual(state.modified, "2021-01-03T00:00:00")
+
+        # the watermark never moves back
+        state.update_watermark(state.modified_gmt.replace(day=1), "older")
+        self.assertEqual(state.modified, "2021-01-03T00:00:00")
+
+    @responses.activate
+    def test_import_data_in_batches(self):
+        existing = WPPost.objects.create(
+            **{
+                "wp_id": 2,
+                "title": "Old title",
+                "date": "2021-01-01",
+                "date_gmt": "2021-01-01",
+                "modified": "2021-01-01",
+                "modified_gmt": "2021-01-01",
+                "wagtail_page_id": 5,
+            }
+        )
+        self.add_posts(
+            [
+                post_json(1, "2021-01-01T00:00:00"),
+                post_json(2, "2021-01-01T00:00:00"),
+                post_json(3, "2021-01-01T00:00:00"),
+            ]
+        )
+        importer = Importer(POSTS_URL, "WPPost", batch_size=2)
+        with patch.object(
+            importer, "write_batch", wraps=importer.write_batch
+        ) as write_batch:
+            importer.import_data()
+        self.assertEqual(write_batch.call_count, 2)
+
+        self.assertEqual(WPPost.objects.count(), 3)
+        existing.refresh_from_db()
+        self.assertEqual(existing.title, "Post 2")
+        # fields not in the response are left alone
+        self.assertEqual(existing.wagtail_page_id, 5)
+
+    @responses.activate
+    def test_foreign_keys(self):
+        author = WPAuthor.objects.create(wp_id=7, name="Author", slug="author")
+        self.add_posts(
+            [
+                post_json(1, "2021-01-01T00:00:00", author=7),
+                post_json(2, "2021-01-01T00:00:00", author=8),
+            ]
+        )
+        with patch("sys.stdout") as stdout:
+            Importer(POSTS_URL, "WPPost").import_data()
+
+        self.assertEqual(WPPost.objects.get(wp_id=1).author, author)
+        self.assertIsNone(WPPost.objects.get(wp_id=2).author)
+        # the missing author is reported
+        stdout.write.assert_any_call(
+            f"INFO:    Could not find WPAuthor with wp_id=8. Post 2 with id="
+            f"{WPPost.objects.get(wp_id=2).id}\n"
+        )
+
+    @responses.activate
+    def test_foreign_keys_to_self(self):
+        responses.add(
+            responses.GET,
+            CATEGORIES_URL,
+            headers={"X-WP-TotalPages": "1", "X-WP-Total": "2"},
+            # the child comes before the parent
+            json=[category_json(2, parent=1), category_json(1)],
+        )
+        Importer(CATEGORIES_URL, "WPCategory").import_data()
+
+        self.assertEqual(
+            WPCategory.objects.get(wp_id=2).parent, WPCategory.objects.get(wp_id=1)
+        )
+
+    @responses.activate
+    def test_many_to_many_keys(self):
+        for wp_id in (1, 2, 3):
+            WPCategory.objects.create(wp_id=wp_id, name=f"Category {wp_id}")
+        tag = WPTag.objects.create(wp_id=1, name="Tag")
+
+        self.add_posts(
+            [post_json(1, "2021-01-01T00:00:00", categories=[1, 2], tags=[1])]
+        )
+        Importer(POSTS_URL, "WPPost").import_data()
+
+        post = WPPost.objects.get(wp_id=1)
+        self.assertEqual(
+            sorted(post.categories.values_list("wp_id", flat=True)), [1, 2]
+        )
+        self.assertEqual(list(post.tags.all()), [tag])
+
+        # links no longer in the data are removed, new links are added
+        responses.reset()
+        self.add_posts([post_json(1, "2021-01-01T00:00:00", categories=[2, 3])])
+        Importer(POSTS_URL, "WPPost").import_data()
+
+        self.assertEqual(
+            sorted(post.categories.values_list("wp_id", flat=True)), [2, 3]
+        )
+        self.assertEqual(post.tags.count(), 0)
+
+    @responses.activate
+    def test_iter_imported_objects(self):
+        self.add_posts(
+            [
+                post_json(1, "2021-01-01T00:00:00"),
+                post_json(2, "2021-01-01T00:00:00"),
+                post_json(3, "2021-01-01T00:00:00"),
+            ]
+        )
+        importer = Importer(POSTS_URL, "WPPost", batch_size=2)
+        importer.import_data()
+
+        chunks = list(importer.iter_imported_objects())
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        # only the fields needed for the relations are loaded
+        self.assertEqual(
+            chunks[0][0].get_deferred_fields()
+            & {"content", "wp_foreign_keys", "title"},
+            {"content"},
+        )
+
+    def test_import_plan(self):
+        plan = ImportPlan.for_model(WPPost)
+        self.assertIs(ImportPlan.for_model(WPPost), plan)
+
+        item = post_json(1, "2021-01-02T00:00:00", author=3, categories=[4, 5])
+        item["wp_id"] = item.pop("id")
+        data = plan.get_data(item)
+        self.assertEqual(data["wp_id"], 1)
+        self.assertEqual(data["title"], "Post 1")
+        self.assertEqual(data["content"], "<p>Content</p>")
+        self.assertEqual(
+            plan.get_foreign_key_data(item),
+            [{"author": {"model": "WPAuthor", "where": "wp_id", "value": 3}}],
+        )
+        # empty many to many keys are left out
+        self.assertEqual(
+            plan.get_many_to_many_data(item),
+            [
+                {
+                    "categories": {
+                        "model": "WPCategory",
+                        "where": "wp_id",
+                        "value": [4, 5],
+                    }
+                }
+            ],
+        )
+
+    def test_make_absolute_links(self):
+        netloc = "localhost:8888"
+        content = (
+            "<p><a href=\"/about/\">About</a> <A HREF='contact'>Contact</A> "
+            '<a title="1 > 0" href="http://localhost/page?a=1&amp;b=2">Page</a> '
+            '<a href="">Empty</a> <a href="https://example.com/">Example</a>'
+            '<!-- <a href="/comment/"> --><br></p>'
+        )
+        self.assertEqual(
+            make_absolute_links(content, netloc),
+            '<p><a href="http://localhost:8888/about">About</a> '
+            '<A href="http://localhost:8888/contact">Contact</A> '
+            '<a title="1 > 0" href="http://localhost:8888/localhost/page?a=1&amp;b=2">Page</a> '
+            '<a href="">Empty</a> <a href="https://example.com/">Example</a>'
+            '<!-- <a href="/comment/"> --><br></p>',
+        )
+
+        # nothing to rewrite returns the same string
+        content = '<p><a href="http://localhost:8888/about/">About</a></p>'
+        self.assertIs(make_absolute_links(content, netloc), content)
+        content = "<p>No links</p>"
+        self.assertIs(make_absolute_links(content, netloc), content)
+
+    def test_make_absolute_links_testdata(self):
+        netloc = "localhost:8888"
+        for path in sorted(TESTDATA.glob("*.xml")):
+            for model_name in ["WPPost", "WPPage"]:
+                for item in WXRSource(path, model_name).iter_items():
+                    for field in ["title", "content", "excerpt"]:
+                        content = item[field]["rendered"]
+                        with self.subTest(path=path.name, id=item["id"], field=field):
+                            # the links are all absolute, the stored html is
+                            # the same string, it's never re-serialised
+                            self.assertIs(make_absolute_links(content, netloc), content)
+
+                            # with relative links only the href values change,
+                            # the entities, attributes and void tags are kept
+                            relative = re.sub(
+                                r'href="https?://[^/"]+/', 'href="/', content
+                            )
+                            expected = re.sub(
+                                r'href="/([^"]*)"',
+                                lambda m: f'href="http://{netloc}/{m[1].strip("/")}"',
+                                relative,
+                            )
+                            self.assertEqual(
+                                make_absolute_links(relative, netloc), expected
+                            )
+
+    def test_get_import_levels(self):
+        self.assertEqual(
+            get_import_levels(
+                [WPComment, WPMedia, WPPost, WPPage, WPTag, WPCategory, WPAuthor]
+            ),
+            [[WPTag, WPCategory, WPAuthor], [WPPost, WPPage], [WPComment, WPMedia]],
+        )
+        # only the models being imported are dependencies
+        self.assertEqual(get_import_levels([WPPost, WPTag]), [[WPTag], [WPPost]])
+
+    @responses.activate
+    def test_import_models(self):
+        responses.add(
+            responses.GET,
+            CATEGORIES_URL,
+            headers={"X-WP-TotalPages": "1", "X-WP-Total": "1"},
+            json=[category_json(1)],
+        )
+        self.add_posts([post_json(1, "2021-01-01T00:00:00", categories=[1])])
+
+        import_models("http://localhost:8888/", models=[WPPost, WPCategory], jobs=1)
+
+        # the categories are imported before the posts that link to them
+        self.assertEqual(
+            list(WPPost.objects.get(wp_id=1).categories.all()),
+            [WPCategory.objects.get(wp_id=1)],
+        )
+
+    @responses.activate
+    def test_import_models_one_at_a_time_with_sqlite(self):
+        responses.add(
+            responses.GET,
+            CATEGORIES_URL,
+            headers={"X-WP-TotalPages": "1", "X-WP-Total": "1"},
+            json=[category_json(1)],
+        )
+        responses.add(
+            responses.GET,
+            "http://localhost:8888/wp-json/wp/v2/tags",
+            headers={"X-WP-TotalPages": "1", "X-WP-Total": "0"},
+            json=[],
+        )
+
+        # the test database is SQLite, which locks the database for each write
+        with patch("wp_connector.importer.ThreadPoolExecutor") as executor:
+            import_models("http://localhost:8888/", models=[WPCategory, WPTag])
+
+        executor.assert_not_called()
+        self.assertTrue(WPCategory.objects.filter(wp_id=1).exists())
@@ -0,0 +1,115 @@
+from unittest.mock import patch
+
+import requests
+import responses
+from django.test import TestCase
+from responses import matchers
+
+from wp_connector.client import Client
+from wp_connector.retry import AdaptiveLimiter, RetryPolicy
+
+URL = "http://localhost:8888/wp-json"
+
+
+class TestRetryPolicy(TestCase):
+    def test_should_retry(self):
+        policy = RetryPolicy(retries=2)
+        busy = requests.Response()
+        busy.status_code = 503
+        not_found = requests.Response()
+        not_found.status_code = 404
+
+        self.assertTrue(policy.should_retry(0, busy))
+        self.assertTrue(policy.should_retry(1, error=requests.ConnectionError()))
+        self.assertFalse(policy.should_retry(2, busy))
+        self.assertFalse(policy.should_retry(0, not_found))
+
+    def test_get_delay(self):
+        policy = RetryPolicy(backoff=1, max_backoff=10)
+        with patch("wp_connector.retry.random.uniform", side_effect=lambda a, b: b):
+            self.assertEqual(
+                [policy.get_delay(attempt) for attempt in range(5)], [1, 2, 4, 8, 10]
+            )
+
+        response = requests.Response()
+        response.headers["Retry-After"] = "7"
+        self.assertEqual(policy.get_delay(0, response), 7)
+        response.headers["Retry-After"] = "Wed, 21 Oct 2015 07:28:00 GMT"
+        self.assertEqual(policy.get_delay(0, response), 0)
+        response.headers["Retry-After"] = "3600"
+        self.assertEqual(policy.get_delay(0, response), policy.max_retry_after)
+
+
+class TestAdaptiveLimiter(TestCase):
+    def test_record(self):
+        limiter = AdaptiveLimiter(8, min_limit=2)
+        self.assertEqual(limiter.limit, 8)
+
+        # failures halve the limit, down to the minimum
+        limiter.record(0.1, failed=True)
+        self.assertEqual(limiter.limit, 4)
+        limiter.record(0.1, failed=True)
+        limiter.record(0.1, failed=True)
+        self.assertEqual(limiter.limit, 2)
+
+        # a limit's worth of quick responses adds one
+        limiter.record(0.1)
+        limiter.record(0.1)
+        self.assertEqual(limiter.limit, 3)
+
+        # a much slower response than usual counts as the host slowing down
+        limiter.record(1.0)
+        self.assertEqual(limiter.limit, 2)
+
+        for i in range(100):
+            limiter.record(0.1)
+        self.assertEqual(limiter.limit, 8)
+
+
+@patch("wp_connector.retry.time.sleep")
+class TestClientRetry(TestCase):
+    def add_response(self, status=200, headers=None, json=None):
+        responses.add(
+            responses.GET,
+            URL,
+            match=[matchers.query_param_matcher({})],
+            status=status,
+            headers=headers,
+            json=json if json is not None else {},
+        )
+
+    @responses.activate
+    def test_retry_busy_host(self, mock_sleep):
+        self.add_response(status=502)
+        self.add_response(status=429, headers={"Retry-After": "3"})
+        self.add_response(json={"key": "value"})
+
+        client = Client(URL)
+        self.assertEqual(client.response.json(), {"key": "value"})
+        self.assertEqual(len(responses.calls), 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(mock_sleep.call_args.args, (3.0,))
+
+    @responses.activate
+    def test_retry_connection_error(self, mock_sleep):
+        responses.add(
+            responses.GET,
+            URL,
+            match=[matchers.query_param_matcher({})],
+            body=requests.ConnectionError("Connection refused"),
+        )
+        self.add_response(json={"key": "value"})
+
+        client = Client(URL)
+        self.assertEqual(client.response.json(), {"key": "value"})
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    @responses.activate
+    def test_retries_exhausted(self, mock_sleep):
+        for i in range(3):
+            self.add_response(status=503)
+
+        with self.assertRaises(SystemExit):
+            Client(URL, retry=RetryPolicy(retries=2))
+        self.assertEqual(len(responses.calls), 3)
+        self.assertEqual(mock_sleep.call_count, 2)
@@ -0,0 +1,64 @@
+from functools import partial
+
+from django.test import TestCase
+
+from wp_connector.exporter import get_streamdata_for
+from wp_connector.importer import make_absolute_links
+from wp_connector.models import WPPost
+from wp_connector.richtext_field_processor import rewrite_anchor_links
+from wp_connector.transform import TransformPool
+
+
+class TestTransformPool(TestCase):
+    def setUp(self):
+        self.contents = [
+            f'<p>Post {i} <a href="/post-{i}/">link</a></p><h2>Heading {i}</h2>'
+            for i in range(20)
+        ]
+
+    def test_map(self):
+        func = partial(make_absolute_links, netloc="localhost:8888")
+        expected = [func(content) for content in self.contents]
+
+        with TransformPool(workers=1) as pool:
+            self.assertEqual(pool.map(func, self.contents), expected)
+            self.assertIsNone(pool.executor)
+
+        # the results come back in the same order from the processes
+        with TransformPool(workers=2) as pool:
+            self.assertEqual(pool.map(func, self.contents), expected)
+        self.assertIsNone(pool.executor)
+
+    def test_rewrite_anchor_links(self):
+        page_ids = {"post-1": 10, "post-2": None}
+        with TransformPool(workers=2) as pool:
+            results = pool.map(
+                partial(rewrite_anchor_links, page_ids=page_ids), self.contents[:3]
+            )
+        self.assertEqual(
+            results,
+            [
+                ("<p>Post 0 link</p><h2>Heading 0</h2>", ["post-0"]),
+                (
+                    '<p>Post 1 <a id="10" linktype="page">link</a></p><h2>Heading 1</h2>',
+                    [],
+                ),
+                ("<p>Post 2 link</p><h2>Heading 2</h2>", ["post-2"]),
+            ],
+        )
+
+    def test_get_streamdata_for(self):
+        posts = [
+            WPPost(title=f"Post {i}", content=content)
+            for i, content in enumerate(self.contents)
+        ]
+        with TransformPool(workers=2) as pool:
+            streamdata = get_streamdata_for(posts, pool)
+
+        self.assertEqual(len(streamdata), len(posts))
+        self.assertEqual(list(streamdata[0]), ["content"])
+        self.assertEqual(
+            streamdata[3]["content"],
+            '[{"type": "paragraph", "value": "<p>Post 3 <a href=\\"/post-3/\\">link</a></p>"}, '
+            '{"type": "heading", "value": {"text": "Heading 3", "level": "h2"}}]',
+        )
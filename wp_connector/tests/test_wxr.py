@@ -0,0 +1,98 @@
+from pathlib import Path
+
+from django.test import TestCase
+
+from wp_connector.importer import Importer, import_models
+from wp_connector.models import WPAuthor, WPCategory, WPMedia, WPPage, WPPost
+from wp_connector.wxr import WXRSource, autop, render
+
+TESTDATA = Path(__file__).resolve().parents[2] / "wordpress.testdata"
+GUTENBERG = TESTDATA / "Gutenberg_Test_Data.xml"
+SITE_URL = "https://chrisrunnells.wordpress.com"
+
+
+class TestWXRSource(TestCase):
+    def test_iter_items(self):
+        posts = list(WXRSource(GUTENBERG, "WPPost").iter_items())
+        self.assertEqual(len(posts), 8)
+
+        post = posts[0]
+        self.assertEqual(post["id"], 79)
+        self.assertEqual(post["title"], {"rendered": "Gutenberg: Image Alignment"})
+        self.assertEqual(post["date_gmt"], "2018-10-23T19:31:58")
+        # the export has no author ids, the author isn't made up
+        self.assertEqual(post["author"], 0)
+        self.assertEqual(post["categories"], [420640])
+        # the tag isn't in the channel, so there's no id for it
+        self.assertEqual(post["tags"], [])
+        self.assertTrue(post["content"]["rendered"].startswith("<!-- wp:paragraph -->"))
+
+    def test_authors_without_ids(self):
+        self.assertEqual(list(WXRSource(GUTENBERG, "WPAuthor").iter_items()), [])
+
+        # matched by login to the author imported over the REST API
+        WPAuthor.objects.create(wp_id=12, name="Chris Runnells", slug="chrisrunnells")
+        post = next(WXRSource(GUTENBERG, "WPPost").iter_items())
+        self.assertEqual(post["author"], 12)
+
+    def test_autop(self):
+        self.assertEqual(
+            autop("First line\nsecond line\n\n<ul>\n<li>Item</li>\n</ul>\n\n[gallery]"),
+            "<p>First line<br />\nsecond line</p>\n<ul>\n<li>Item</li>\n</ul>\n"
+            "<p>[gallery]</p>\n",
+        )
+        self.assertEqual(
+            autop("<p>Already a paragraph</p>"), "<p>Already a paragraph</p>\n"
+        )
+        self.assertEqual(autop("<pre>a\n\nb</pre>"), "<pre>a\n\nb</pre>\n")
+        # the block editor content is left as it is
+        content = "<!-- wp:paragraph -->\n<p>Text</p>\n<!-- /wp:paragraph -->"
+        self.assertIs(render(content), content)
+
+    def test_iter_items_by_type(self):
+        path = TESTDATA / "ChatGPT_Wordpress_Data.xml"
+        self.assertEqual(
+            [page["slug"] for page in WXRSource(path, "WPPage").iter_items()],
+            ["about-us"],
+        )
+        self.assertEqual(
+            [
+                category["slug"]
+                for category in WXRSource(path, "WPCategory").iter_items()
+            ],
+            ["sample-category", "news"],
+        )
+        media = list(WXRSource(GUTENBERG, "WPMedia").iter_items())
+        self.assertEqual(len(media), 10)
+        self.assertEqual(media[0]["mime_type"], "image/jpeg")
+
+
+class TestWXRImport(TestCase):
+    def test_import_models(self):
+        # the export has no author ids, the authors are imported over the REST API
+        WPAuthor.objects.create(wp_id=12, name="Chris Runnells", slug="chrisrunnells")
+        import_models(
+            SITE_URL,
+            models=[WPAuthor, WPCategory, WPPost, WPPage, WPMedia],
+            jobs=1,
+            wxr=str(GUTENBERG),
+        )
+
+        self.assertEqual(WPPost.objects.count(), 8)
+        self.assertEqual(WPMedia.objects.count(), 10)
+        self.assertEqual(WPPage.objects.count(), 0)
+
+        post = WPPost.objects.get(wp_id=79)
+        self.assertEqual(post.author.wp_id, 12)
+        self.assertEqual(WPAuthor.objects.count(), 1)
+        self.assertEqual(
+            list(post.categories.values_list("name", flat=True)), ["Gutenberg"]
+        )
+        self.assertEqual(post.wp_cleaned_content[:3], "<p>")
+
+        # the same items aren't written again
+        importer = Importer(
+            f"{SITE_URL}/wp-json/wp/v2/posts", "WPPost", wxr=str(GUTENBERG)
+        )
+        importer.import_data()
+        self.assertEqual(importer.skipped, 8)
@@ -0,0 +1,73 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.conf import settings
+
+
+def get_transform_workers():
+    """
+    Return the number of processes to use for the html transformations.
+
+    Settings:
+        WPC_TRANSFORM_WORKERS: The number of processes, 1 runs them in this process
+    """
+    return getattr(settings, "WPC_TRANSFORM_WORKERS", 1)
+
+
+def setup_worker():
+    # a spawned process starts without django set up
+    if not apps.ready:
+        django.setup()
+
+
+class TransformPool:
+    """
+    Run pure html transformations on a pool of processes.
+
+    The html work (parsing and re-serialising content) is CPU bound so it's
+    shipped to other processes as plain strings, the database is only
+    used by the main process. The results are returned in the same order
+    as the items.
+
+    The functions must be defined at the top level of a module
+    (or be a functools.partial of one) so they can be pickled.
+
+    Args:
+        workers (int):
+                The number of processes, defaults to WPC_TRANSFORM_WORKERS.
+                1 runs the transformations in this process.
+
+    Usage:
+        with TransformPool(workers=4) as pool:
+            results = pool.map(make_absolute_links, contents)
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or get_transform_workers()
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def map(self, func, items):
+        items = list(items)
+        if self.workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=setup_worker
+            )
+        # a few chunks per process keeps them busy without
+        # paying the pickling cost for every item
+        chunksize = max(1, len(items) // (self.workers * 4))
+        return list(self.executor.map(func, items, chunksize=chunksize))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
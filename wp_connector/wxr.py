@@ -0,0 +1,409 @@
+import mimetypes
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from wp_connector.messages import ClientExitException, ClientMessage
+from wp_connector.models import WPAuthor
+
+# the namespace of the wp: elements has the WXR version in it
+# e.g. http://wordpress.org/export/1.2/
+WP_NAMESPACE = "http://wordpress.org/export/"
+NAMESPACE_PREFIXES = {
+    "http://purl.org/rss/1.0/modules/content/": "content",
+    "http://purl.org/dc/elements/1.1/": "dc",
+    "http://wellformedweb.org/CommentAPI/": "wfw",
+}
+
+# the elements of the channel read by the source
+ELEMENTS = {"wp:author", "wp:category", "wp:tag", "wp:term", "item"}
+
+# the post_type of the items of each model
+POST_TYPES = {"WPPost": "post", "WPPage": "page", "WPMedia": "attachment"}
+
+# WordPress leaves the gmt dates of drafts empty
+EMPTY_DATE = "0000-00-00 00:00:00"
+
+# the block elements autop doesn't wrap in paragraphs, as in wpautop
+AUTOP_BLOCKS = (
+    r"(?:table|thead|tfoot|caption|col|colgroup|tbody|tr|td|th|div|dl|dd|dt|ul|ol"
+    r"|li|pre|form|map|area|blockquote|address|style|p|h[1-6]|hr|fieldset|legend"
+    r"|section|article|aside|hgroup|header|footer|nav|figure|figcaption|details"
+    r"|menu|summary)"
+)
+HTML_TAG = re.compile(r"<!--.*?-->|<[^>]*>", re.DOTALL)
+
+
+def get_name(tag):
+    """Return the prefixed name of an element tag, e.g. {http://wordpress.org/export/1.2/}author is wp:author"""
+    if not tag.startswith("{"):
+        return tag
+    namespace, name = tag[1:].split("}", 1)
+    if namespace.startswith(WP_NAMESPACE):
+        prefix = "excerpt" if namespace.endswith("/excerpt/") else "wp"
+    else:
+        prefix = NAMESPACE_PREFIXES.get(namespace, namespace)
+    return f"{prefix}:{name}"
+
+
+def get_values(elem):
+    """Return the text of the children of an element keyed by their prefixed names."""
+    return {get_name(child.tag): child.text or "" for child in elem}
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def to_date(value, default=None):
+    """Return the WXR date as the REST API formats it, e.g. 2021-01-01T00:00:00"""
+    if not value or value == EMPTY_DATE:
+        return default
+    return value.strip().replace(" ", "T")
+
+
+def sub(pattern, replacement, text, flags=0):
+    # like PHP's \s, \s doesn't match the unicode spaces such as &nbsp;
+    return re.sub(pattern, replacement, text, flags=flags | re.ASCII)
+
+
+def autop(text):
+    """
+    Wrap the paragraphs of classic editor content in <p> tags, a port of wpautop.
+
+    WordPress stores the content of the classic editor with blank lines
+    between the paragraphs and adds the <p> and <br /> tags when it's
+    rendered, the REST API returns the rendered content.
+    """
+    if not text.strip():
+        return ""
+    text += "\n"
+
+    # the preformatted text is left as it is
+    pre_tags = {}
+    if "<pre" in text:
+        parts = text.split("</pre>")
+        last_part = parts.pop()
+        text = ""
+        for part in parts:
+            start = part.find("<pre")
+            if start == -1:
+                text += part
+                continue
+            name = f"<pre wp-pre-tag-{len(pre_tags)}></pre>"
+            pre_tags[name] = part[start:] + "</pre>"
+            text += part[:start] + name
+        text += last_part
+
+    text = sub(r"<br\s*/?>\s*<br\s*/?>", "\n\n", text)
+    # a paragraph break around the block elements
+    text = sub(rf"(<{AUTOP_BLOCKS}[\s/>])", r"\n\n\1", text)
+    text = sub(rf"(</{AUTOP_BLOCKS}>)", r"\1\n\n", text)
+    text = sub(r"(<hr\s*?/?>)", r"\1\n\n", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    # the newlines inside the tags aren't line breaks
+    text = HTML_TAG.sub(lambda m: m[0].replace("\n", " <!-- wpnl --> "), text)
+
+    if "<option" in text:
+        text = sub(r"\s*<option", "<option", text)
+        text = sub(r"</option>\s*", "</option>", text)
+    if "</object>" in text:
+        text = sub(r"(<object[^>]*>)\s*", r"\1", text)
+        text = sub(r"\s*</object>", "</object>", text)
+        text = sub(r"\s*(</?(?:param|embed)[^>]*>)\s*", r"\1", text)
+    if "<source" in text or "<track" in text:
+        text = sub(r"([<\[](?:audio|video)[^>\]]*[>\]])\s*", r"\1", text)
+        text = sub(r"\s*([<\[]/(?:audio|video)[>\]])", r"\1", text)
+        text = sub(r"\s*(<(?:source|track)[^>]*>)\s*", r"\1", text)
+    if "<figcaption" in text:
+        text = sub(r"\s*(<figcaption[^>]*>)", r"\1", text)
+        text = sub(r"</figcaption>\s*", "</figcaption>", text)
+
+    text = sub(r"\n\n+", "\n\n", text)
+    paragraphs = re.split(r"\n\s*\n", text, flags=re.ASCII)
+    text = "".join("<p>" + p.strip("\n") + "</p>\n" for p in paragraphs if p)
+
+    # unwrap the empty paragraphs and the block elements
+    text = sub(r"<p>\s*</p>", "", text)
+    text = sub(r"<p>([^<]+)</(div|address|form)>", r"<p>\1</p></\2>", text)
+    text = sub(rf"<p>\s*(</?{AUTOP_BLOCKS}[^>]*>)\s*</p>", r"\1", text)
+    text = sub(r"<p>(<li.+?)</p>", r"\1", text)
+    text = sub(r"<p><blockquote([^>]*)>", r"<blockquote\1><p>", text, re.IGNORECASE)
+    text = text.replace("</blockquote></p>", "</p></blockquote>")
+    text = sub(rf"<p>\s*(</?{AUTOP_BLOCKS}[^>]*>)", r"\1", text)
+    text = sub(rf"(</?{AUTOP_BLOCKS}[^>]*>)\s*</p>", r"\1", text)
+
+    # the single newlines are line breaks, except in scripts and styles
+    text = sub(
+        r"<(script|style|svg|math).*?</\1>",
+        lambda m: m[0].replace("\n", "<WPPreserveNewline />"),
+        text,
+        re.DOTALL,
+    )
+    text = text.replace("<br>", "<br />").replace("<br/>", "<br />")
+    text = sub(r"(?<!<br />)\s*\n", "<br />\n", text)
+    text = text.replace("<WPPreserveNewline />", "\n")
+    text = sub(rf"(</?{AUTOP_BLOCKS}[^>]*>)\s*<br />", r"\1", text)
+    text = sub(
+        r"<br />(\s*</?(?:p|li|div|dl|dd|dt|th|pre|td|ul|ol)[^>]*>)", r"\1", text
+    )
+    text = sub(r"\n</p>$", "</p>", text)
+
+    for name, pre_tag in pre_tags.items():
+        text = text.replace(name, pre_tag)
+    return text.replace(" <!-- wpnl --> ", "\n").replace("<!-- wpnl -->", "\n")
+
+
+def render(content):
+    """
+    Return the content like the REST API renders it, as far as it can be
+    without WordPress.
+
+    The classic editor content is wrapped in paragraphs by autop. The block
+    editor content is already html, WordPress doesn't run wpautop on it.
+    The shortcodes are left as they are, they're rendered by the plugins.
+    """
+    if "<!-- wp:" in content:
+        return content
+    return autop(content)
+
+
+class WXRSource:
+    """
+    Read the items of a model from a WXR file (a WordPress export).
+
+    The file is read with iterparse and each element is cleared once it's
+    read, so a file of any size is read in constant memory. The authors
+    and terms are read from the start of the channel, before the items,
+    and turned into the same json the REST API responds with so the items
+    go through the model's import plan like any other.
+
+    Only the ids of the authors and terms are kept to link the items to
+    them, the items refer to them by login and slug.
+
+    The export has the content as it's stored, the classic editor content
+    and the excerpts are wrapped in paragraphs by autop like the REST API
+    renders them. Unlike the REST API the shortcodes aren't rendered and
+    the quotes and dashes aren't made typographic (wptexturize).
+
+    It's used by the Importer in place of a Client, see iter_items.
+
+    Args:
+        path (str): The path of the WXR file
+        model_name (str): The model to read the items of
+
+    Attributes:
+        url (str): The file url, used for the import checkpoint
+        page (int): Always 1, the file isn't paged
+    """
+
+    page = 1
+
+    def __init__(self, path, model_name):
+        self.client_exception = ClientExitException()
+        self.client_message = ClientMessage()
+        self.path = Path(path)
+        self.model_name = model_name
+        if not self.path.is_file():
+            self.client_exception.error_message(f"Could not find {self.path}")
+        self.url = self.path.resolve().as_uri()
+
+        self.site_url = ""
+        # login: id
+        self.author_ids = {}
+        # (taxonomy, slug): id
+        self.term_ids = {}
+        self.client_message.success_message(f"Reading {self.path}")
+
+    def iter_elements(self):
+        """Yield (name, element) for each element of the channel in ELEMENTS."""
+        depth = 0
+        channel = None
+        for event, elem in ET.iterparse(self.path, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                # rss > channel > item
+                if depth == 2:
+                    channel = elem
+                continue
+
+            depth -= 1
+            if depth != 2:
+                continue
+            name = get_name(elem.tag)
+            if name == "wp:base_blog_url":
+                self.site_url = (elem.text or "").strip().rstrip("/")
+            elif name in ELEMENTS:
+                yield name, elem
+            # drop what's been read so memory stays flat
+            channel.clear()
+
+    def iter_items(self):
+        """Yield the json of each item of the model, like Client.iter_items."""
+        post_type = POST_TYPES.get(self.model_name)
+        for name, elem in self.iter_elements():
+            if name == "wp:author":
+                author = self.get_author(elem)
+                if author and self.model_name == "WPAuthor":
+                    yield author
+            elif name in ("wp:category", "wp:tag", "wp:term"):
+                term = self.get_term(name, elem)
+                if term and self.model_name == self.get_term_model(term):
+                    yield term
+            elif name == "item":
+                if not post_type:
+                    # the items come after the authors and terms
+                    return
+                values = get_values(elem)
+                if values.get("wp:post_type") == post_type:
+                    yield self.get_item(elem, values)
+
+    def get_author(self, elem):
+        """
+        Return the json of an author, or None if the export has no id for it.
+
+        WordPress.com exports leave out the author ids. Those authors are
+        matched by login to the authors imported over the REST API, whose
+        slug is the login, or else their items are left without an author.
+        """
+        values = get_values(elem)
+        login = values.get("wp:author_login", "").strip()
+        wp_id = to_int(values.get("wp:author_id"))
+        if not wp_id:
+            wp_id = (
+                WPAuthor.objects.filter(slug=login)
+                .values_list("wp_id", flat=True)
+                .first()
+            )
+            if wp_id:
+                self.author_ids[login] = wp_id
+            elif self.model_name == "WPAuthor":
+                self.client_message.info_message(
+                    f"Skipping the author {login}, the export has no id for it"
+                )
+            return None
+        self.author_ids[login] = wp_id
+        return {
+            "id": wp_id,
+            "name": values.get("wp:author_display_name") or login,
+            "url": "",
+            "description": "",
+            "link": f"{self.site_url}/author/{login}/",
+            "slug": login,
+        }
+
+    def get_term(self, name, elem):
+        """Return the json of a category or tag, or None for other taxonomies."""
+        values = get_values(elem)
+        if name == "wp:category":
+            taxonomy, slug = "category", values.get("wp:category_nicename")
+            term_name = values.get("wp:cat_name")
+            parent = values.get("wp:category_parent")
+            description = values.get("wp:category_description")
+        elif name == "wp:tag":
+            taxonomy, slug = "post_tag", values.get("wp:tag_slug")
+            term_name = values.get("wp:tag_name")
+            parent, description = None, values.get("wp:tag_description")
+        else:
+            taxonomy, slug = values.get("wp:term_taxonomy"), values.get("wp:term_slug")
+            term_name = values.get("wp:term_name")
+            parent = values.get("wp:term_parent")
+            description = values.get("wp:term_description")
+
+        if taxonomy not in ("category", "post_tag"):
+            return None
+        wp_id = to_int(values.get("wp:term_id"))
+        self.term_ids[(taxonomy, slug)] = wp_id
+        term = {
+            "id": wp_id,
+            "name": term_name or slug,
+            "link": f"{self.site_url}/{'tag' if taxonomy == 'post_tag' else taxonomy}/{slug}/",
+            "slug": slug,
+            "description": description or "",
+            "taxonomy": taxonomy,
+        }
+        if taxonomy == "category":
+            # the parents are exported before their children
+            term["parent"] = self.term_ids.get((taxonomy, parent), 0)
+        return term
+
+    @staticmethod
+    def get_term_model(term):
+        return "WPCategory" if term["taxonomy"] == "category" else "WPTag"
+
+    def get_item(self, elem, values):
+        """Return the json of a post, page or attachment like the REST API."""
+        post_type = values["wp:post_type"]
+        date = to_date(values.get("wp:post_date"))
+        date_gmt = to_date(values.get("wp:post_date_gmt"), date)
+        modified = to_date(values.get("wp:post_modified"), date)
+        item = {
+            "id": to_int(values.get("wp:post_id")),
+            "date": date,
+            "date_gmt": date_gmt,
+            "modified": modified,
+            "modified_gmt": to_date(values.get("wp:post_modified_gmt"), date_gmt),
+            "guid": {"rendered": values.get("guid", "").strip()},
+            "slug": values.get("wp:post_name", "").strip(),
+            "status": values.get("wp:status", "").strip(),
+            "type": post_type,
+            "link": values.get("link", "").strip(),
+            "title": {"rendered": values.get("title", "")},
+            "author": self.author_ids.get(values.get("dc:creator", "").strip(), 0),
+            "comment_status": values.get("wp:comment_status", "open"),
+            "ping_status": values.get("wp:ping_status", "open"),
+        }
+
+        meta = {}
+        for child in elem:
+            if get_name(child.tag) == "wp:postmeta":
+                entry = get_values(child)
+                meta[entry.get("wp:meta_key")] = entry.get("wp:meta_value", "")
+        template = meta.get("_wp_page_template", "")
+        item["template"] = "" if template == "default" else template
+
+        if post_type == "attachment":
+            source_url = values.get("wp:attachment_url", "").strip()
+            mime_type = mimetypes.guess_type(source_url)[0] or ""
+            item.update(
+                {
+                    "description": {
+                        "rendered": render(values.get("content:encoded", ""))
+                    },
+                    "caption": {"rendered": autop(values.get("excerpt:encoded", ""))},
+                    "alt_text": meta.get("_wp_attachment_image_alt", ""),
+                    "media_type": "image" if mime_type.startswith("image/") else "file",
+                    "mime_type": mime_type,
+                    "source_url": source_url,
+                    "post": to_int(values.get("wp:post_parent")),
+                }
+            )
+            return item
+
+        categories, tags, post_format = [], [], "standard"
+        for child in elem:
+            if child.tag != "category":
+                continue
+            domain, slug = child.get("domain"), child.get("nicename")
+            if domain == "post_format":
+                post_format = slug.removeprefix("post-format-")
+            elif (domain, slug) in self.term_ids:
+                ids = categories if domain == "category" else tags
+                ids.append(self.term_ids[(domain, slug)])
+
+        item.update(
+            {
+                "content": {"rendered": render(values.get("content:encoded", ""))},
+                "excerpt": {"rendered": autop(values.get("excerpt:encoded", ""))},
+                "sticky": values.get("wp:is_sticky") == "1",
+                "format": post_format,
+                "categories": categories,
+                "tags": tags,
+                "parent": to_int(values.get("wp:post_parent")),
+                "menu_order": to_int(values.get("wp:menu_order")),
+            }
+        )
+        return item